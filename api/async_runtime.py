@@ -0,0 +1,191 @@
+"""
+Async Runtime
+=============
+One background event loop shared by all Flask routes, with long-lived
+pooled aiohttp sessions per upstream.
+
+Routes used to call asyncio.run() (or build a fresh loop) per request and
+every helper opened its own ClientSession and SSL context, so each request
+paid for certifi loading and new TLS handshakes. Now:
+
+    data = run_sync(fetch_something(...))        # from a Flask view
+    session = get_session("supabase")            # inside a coroutine
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import os
+import ssl
+import threading
+import time
+import weakref
+from typing import Dict, Optional
+
+import aiohttp
+import certifi
+
+# Connection pool settings per upstream. `limit` caps concurrent
+# connections to that host; idle connections are kept alive for reuse.
+# `rate`/`burst` (requests per second / bucket size) feed get_limiter().
+UPSTREAMS = {
+    "supabase": {"limit": 20},
+    "open_meteo": {"limit": 10, "rate": 5.0, "burst": 10},   # free tier allows 600/min
+    "inaturalist": {"limit": 8, "rate": 1.0, "burst": 10},   # iNat asks for <= 60/min
+    "gbif": {"limit": 8, "rate": 3.0, "burst": 10},
+    "nominatim": {"limit": 2, "rate": 1.0, "burst": 1, "headers": {"User-Agent": "UtahPollinatorPath/1.0"}},
+}
+
+DEFAULT_TIMEOUT = 60  # seconds a Flask view waits on run_sync()
+KEEPALIVE_TIMEOUT = 60
+DNS_CACHE_TTL = 300
+
+_lock = threading.Lock()
+_loop = None
+_thread = None
+_pid = None
+_ssl_ctx = None
+
+# loop -> {upstream name: ClientSession}. Sessions are bound to the loop
+# they were created on, so scripts that run their own loop get their own.
+_sessions = weakref.WeakKeyDictionary()
+_limiters = weakref.WeakKeyDictionary()
+
+
+def ssl_context() -> ssl.SSLContext:
+    """Process-wide SSL context (certifi bundle is loaded once)."""
+    global _ssl_ctx
+    if _ssl_ctx is None:
+        _ssl_ctx = ssl.create_default_context(cafile=certifi.where())
+    return _ssl_ctx
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Start (or return) the shared background loop for this process."""
+    global _loop, _thread, _pid
+    with _lock:
+        # After a fork (e.g. gunicorn --preload) the parent's loop thread
+        # does not exist in the child, so start a fresh one.
+        if _loop is None or _pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="async-runtime", daemon=True)
+            _thread.start()
+            _pid = os.getpid()
+        return _loop
+
+
+def run_sync(coro, timeout: float = DEFAULT_TIMEOUT):
+    """Run a coroutine on the shared loop and block until it finishes."""
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+
+def iter_sync(agen, timeout: float = DEFAULT_TIMEOUT):
+    """
+    Drive an async generator on the shared loop from sync code.
+
+    Items are yielded as soon as they are produced, which lets Flask
+    stream upstream pages to the client. `timeout` applies per item.
+    """
+    loop = get_loop()
+    try:
+        while True:
+            future = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop)
+            try:
+                yield future.result(timeout)
+            except StopAsyncIteration:
+                return
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                raise
+    finally:
+        # Client went away or we finished: let the generator clean up
+        try:
+            asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result(5)
+        except Exception:
+            pass
+
+
+def get_session(name: str) -> aiohttp.ClientSession:
+    """
+    Pooled session for an upstream (see UPSTREAMS).
+
+    Must be called from a coroutine. Do not close the returned session;
+    it is reused across requests.
+    """
+    loop = asyncio.get_running_loop()
+    sessions: Dict[str, aiohttp.ClientSession] = _sessions.setdefault(loop, {})
+    session = sessions.get(name)
+    if session is None or session.closed:
+        config = UPSTREAMS.get(name, {})
+        connector = aiohttp.TCPConnector(
+            ssl=ssl_context(),
+            limit=config.get("limit", 10),
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        session = aiohttp.ClientSession(connector=connector, headers=config.get("headers"))
+        sessions[name] = session
+    return session
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` requests per second, bursts up to `burst`.
+    A rate of None never waits.
+
+    Shared by every request on the loop, so concurrent fan-out from many
+    Flask requests still respects the upstream's limit.
+    """
+
+    def __init__(self, rate: Optional[float], burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        if self.rate is None:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def get_limiter(name: str) -> TokenBucket:
+    """Rate limiter for an upstream (unlimited if it has no `rate`)."""
+    loop = asyncio.get_running_loop()
+    limiters: Dict[str, TokenBucket] = _limiters.setdefault(loop, {})
+    limiter = limiters.get(name)
+    if limiter is None:
+        config = UPSTREAMS.get(name, {})
+        limiter = limiters[name] = TokenBucket(config.get("rate"), config.get("burst", 1))
+    return limiter
+
+
+async def close_sessions():
+    """Close every session bound to the running loop."""
+    sessions = _sessions.pop(asyncio.get_running_loop(), {})
+    for session in sessions.values():
+        await session.close()
+
+
+@atexit.register
+def _shutdown():
+    loop = _loop
+    if loop is None or _pid != os.getpid() or not loop.is_running():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(close_sessions(), loop).result(5)
+    except Exception:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
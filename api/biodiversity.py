@@ -0,0 +1,247 @@
+"""
+Biodiversity Analytics
+======================
+Diversity indices over observation-store selections, computed server side
+instead of in AcademicAnalytics.tsx.
+
+Everything starts from an abundance vector (observations per species),
+built with one bincount over the species codes of the selected rows. The
+index functions accept (species,) or (replicates, species) arrays, so a
+bootstrap is a single vectorized pass:
+
+    rows = store.select(bbox=..., year_min=2015, iconic_taxon=["Insecta"])
+    report = analyze(store, rows, bootstrap_replicates=200, seed=0)
+
+Rarefaction/extrapolation follows the q = 0 (richness) curve of Chao et
+al. 2014, the method behind iNEXT.
+"""
+
+from statistics import NormalDist
+from typing import Dict, Optional
+
+import numpy as np
+
+DEFAULT_BOOTSTRAP = 200
+MAX_BOOTSTRAP = 1000
+CURVE_POINTS = 40
+EXTRAPOLATE_FACTOR = 2      # extrapolate richness to 2x the sample size
+HOTSPOT_CELL_DEG = 0.01     # ~1 km cells, as the browser version used
+HOTSPOT_SIGMA = 2
+
+
+# ============ ABUNDANCE ============
+
+def abundance(store, rows: Optional[np.ndarray] = None, column: str = "species") -> np.ndarray:
+    """Observations per species code for the selected rows (species missing -> dropped)."""
+    codes = store.column(column)
+    if rows is not None:
+        codes = codes[rows]
+    codes = codes[codes >= 0]
+    return np.bincount(codes, minlength=len(store.categories[column]))
+
+
+# ============ INDICES ============
+
+def _totals(counts):
+    counts = np.asarray(counts, dtype=np.float64)
+    return counts, counts.sum(axis=-1)
+
+
+def richness(counts) -> np.ndarray:
+    return (np.asarray(counts) > 0).sum(axis=-1)
+
+
+def shannon(counts) -> np.ndarray:
+    """Shannon H' = -sum(p ln p)."""
+    counts, n = _totals(counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = counts / n[..., None]
+        return -np.where(p > 0, p * np.log(np.where(p > 0, p, 1)), 0.0).sum(axis=-1)
+
+
+def simpson(counts) -> np.ndarray:
+    """Simpson's 1 - D with D = sum(n(n-1)) / (N(N-1))."""
+    counts, n = _totals(counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(n > 1, 1 - (counts * (counts - 1)).sum(axis=-1) / (n * (n - 1)), 0.0)
+
+
+def pielou(counts) -> np.ndarray:
+    """Pielou's evenness J' = H' / ln S."""
+    s = richness(counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(s > 1, shannon(counts) / np.log(np.maximum(s, 2)), 0.0)
+
+
+def chao1(counts) -> np.ndarray:
+    """
+    Chao1 richness estimate as iNEXT computes it: f1^2 / 2f2 undetected
+    species, or the bias-corrected f1(f1-1) / 2 when there are no doubletons.
+    The same f0 sets the asymptote of richness_curve.
+    """
+    counts, n = _totals(counts)
+    f1 = (counts == 1).sum(axis=-1)
+    f2 = (counts == 2).sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f0 = np.where(f2 > 0, f1 * f1 / (2 * np.maximum(f2, 1)), f1 * (f1 - 1) / 2)
+        f0 = np.where(n > 0, (n - 1) / n, 0.0) * f0
+    return richness(counts) + f0
+
+
+def coverage(counts) -> np.ndarray:
+    """Estimated sample coverage (Chao & Jost 2012)."""
+    counts, n = _totals(counts)
+    f1 = (counts == 1).sum(axis=-1)
+    f2 = (counts == 2).sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        adj = np.where(f2 > 0, (n - 1) * f1 / ((n - 1) * f1 + 2 * f2), np.where(f1 > 0, (n - 1) * (f1 - 1) / ((n - 1) * (f1 - 1) + 2), 1.0))
+        return np.where(n > 0, 1 - f1 / n * adj, 0.0)
+
+
+INDICES = {
+    "richness": richness,
+    "shannon": shannon,
+    "simpson": simpson,
+    "pielou": pielou,
+    "chao1": chao1,
+    "coverage": coverage,
+}
+
+
+# ============ RAREFACTION / EXTRAPOLATION ============
+
+def _log_factorials(n: int) -> np.ndarray:
+    return np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, n + 1)))])
+
+
+def richness_curve(counts, points: int = CURVE_POINTS, extrapolate: float = EXTRAPOLATE_FACTOR) -> Dict:
+    """
+    Expected richness at sample sizes 1..extrapolate*n.
+    Interpolation: S(m) = sum_i 1 - C(n - X_i, m) / C(n, m).
+    Extrapolation: S(n + m) = S_obs + f0 * (1 - (1 - f1 / (n f0 + f1)) ** m).
+    """
+    x = np.asarray(counts, dtype=np.int64)
+    x = x[x > 0]
+    n = int(x.sum())
+    if n == 0:
+        return {"m": [], "richness": [], "method": []}
+    s_obs = len(x)
+    f1 = int((x == 1).sum())
+    f2 = int((x == 2).sum())
+    f0 = (n - 1) / n * (f1 * f1 / (2 * f2) if f2 else f1 * (f1 - 1) / 2)
+
+    sizes = np.unique(np.linspace(1, n * extrapolate, points).astype(np.int64))
+    sizes = np.unique(np.append(sizes, n))
+    interp = sizes[sizes <= n]
+    extra = sizes[sizes > n]
+
+    lf = _log_factorials(n)
+    # C(n - x, m) / C(n, m), zero where n - x < m; species x sizes
+    a = n - x[:, None]
+    m = interp[None, :]
+    valid = a >= m
+    log_ratio = (lf[np.where(valid, a, 0)] - lf[np.where(valid, a - m, 0)]) - (lf[n] - lf[n - m])
+    s_interp = (1 - np.where(valid, np.exp(log_ratio), 0.0)).sum(axis=0)
+
+    if f0 > 0 and f1 > 0:
+        s_extra = s_obs + f0 * (1 - (1 - f1 / (n * f0 + f1)) ** (extra - n))
+    else:
+        s_extra = np.full(len(extra), float(s_obs))
+
+    return {
+        "m": sizes.tolist(),
+        "richness": np.round(np.concatenate([s_interp, s_extra]), 2).tolist(),
+        "method": ["rarefaction"] * len(interp[interp < n]) + ["observed"] + ["extrapolation"] * len(extra),
+    }
+
+
+# ============ BOOTSTRAP ============
+
+def _bootstrap_assemblage(x: np.ndarray) -> np.ndarray:
+    """
+    Estimated true relative abundances (Chao et al. 2014): detected species
+    shrunk by the sample coverage deficit, plus f0 undetected species
+    sharing what is left. Resampling only the observed proportions would
+    never draw an unseen species and biases richness low.
+    """
+    n = x.sum()
+    f0 = int(np.ceil(chao1(x) - len(x)))
+    c_hat = float(coverage(x))
+    p = x / n
+    if c_hat >= 1 or f0 <= 0:
+        return p
+    weight = (1 - p) ** n
+    lam = (1 - c_hat) / (p * weight).sum()
+    detected = p * (1 - lam * weight)
+    return np.concatenate([detected, np.full(f0, (1 - c_hat) / f0)])
+
+
+def bootstrap(counts, replicates: int = DEFAULT_BOOTSTRAP, seed: int = 0, confidence: float = 0.95) -> Dict:
+    """
+    Confidence intervals for every index: estimate +/- z * bootstrap sd,
+    resampling from the estimated assemblage as iNEXT does. Seeded, so
+    the same request gives the same numbers.
+    """
+    x = np.asarray(counts, dtype=np.int64)
+    x = x[x > 0]
+    n = int(x.sum())
+    if n < 2 or replicates <= 0:
+        return {}
+    rng = np.random.default_rng(seed)
+    p = _bootstrap_assemblage(x)
+    samples = rng.multinomial(n, p / p.sum(), size=replicates)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    out = {}
+    for name, fn in INDICES.items():
+        estimate = float(fn(x))
+        half = z * float(fn(samples).std(ddof=1))
+        out[name] = [round(max(estimate - half, 0.0), 4), round(estimate + half, 4)]
+    return out
+
+
+# ============ SPATIAL ============
+
+def hotspots(store, rows: np.ndarray, cell_deg: float = HOTSPOT_CELL_DEG, sigma: float = HOTSPOT_SIGMA) -> Dict:
+    """Grid cells whose observation count exceeds mean + sigma * sd."""
+    if len(rows) == 0:
+        return {"grid_cells": 0, "hotspots": []}
+    ix = np.floor(store.column("lat")[rows] / cell_deg).astype(np.int64)
+    iy = np.floor(store.column("lng")[rows] / cell_deg).astype(np.int64)
+    cells, counts = np.unique(np.stack([ix, iy], axis=1), axis=0, return_counts=True)
+    threshold = counts.mean() + sigma * counts.std()
+    hot = np.flatnonzero(counts > threshold)
+    hot = hot[np.argsort(-counts[hot])]
+    return {
+        "grid_cells": int(len(cells)),
+        "threshold": round(float(threshold), 2),
+        "hotspots": [
+            {"lat": round(float(cells[i, 0] * cell_deg), 4), "lng": round(float(cells[i, 1] * cell_deg), 4), "count": int(counts[i])}
+            for i in hot
+        ],
+    }
+
+
+# ============ REPORT ============
+
+def analyze(store, rows: np.ndarray, bootstrap_replicates: int = DEFAULT_BOOTSTRAP, seed: int = 0,
+            curve_points: int = CURVE_POINTS) -> Dict:
+    """Everything AcademicAnalytics shows, for one selection."""
+    counts = abundance(store, rows)
+    present = counts[counts > 0]
+    n = int(present.sum())
+    indices = {name: round(float(fn(present)), 4) if n else 0 for name, fn in INDICES.items()}
+    indices["richness"] = int(indices["richness"])
+
+    return {
+        "total_observations": int(len(rows)),
+        "identified_observations": n,
+        "unique_species": int(len(present)),
+        "obs_per_species": round(n / len(present), 2) if len(present) else 0,
+        "singletons": int((present == 1).sum()),
+        "doubletons": int((present == 2).sum()),
+        "indices": indices,
+        "confidence_intervals": bootstrap(present, min(bootstrap_replicates, MAX_BOOTSTRAP), seed),
+        "bootstrap": {"replicates": min(bootstrap_replicates, MAX_BOOTSTRAP), "seed": seed, "confidence": 0.95},
+        "richness_curve": richness_curve(present, curve_points),
+        "spatial": hotspots(store, rows),
+    }
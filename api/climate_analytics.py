@@ -0,0 +1,252 @@
+"""
+Climate Analytics
+=================
+NumPy versions of the climate calculations behind /api/climate/*.
+
+Daily series are float arrays with NaN for missing values. Every function
+takes arrays shaped (..., days), so one call handles a single point or a
+stack of locations:
+
+    dates, tmax, tmin, precip = daily_arrays(data["daily"])
+    gdd = cumulative_gdd(tmax, tmin, bases=(40, 50))        # (2, days)
+    frost = frost_dates(dates, tmin)                         # per year
+    fit = linear_trend(years, avg_high)                      # slope + CI
+"""
+
+import math
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+FROST_F = 32.0
+SPRING_LAST_MONTH = 6  # Jan-Jun is "spring" for last frost, Jul-Dec "fall"
+
+
+def daily_arrays(daily: Dict, keys: Sequence[str] = ("temperature_2m_max", "temperature_2m_min", "precipitation_sum")):
+    """Open-Meteo `daily` block -> (datetime64[D] dates, *float arrays for keys)."""
+    dates = np.array(daily.get("time", []), dtype="datetime64[D]")
+    arrays = []
+    for key in keys:
+        values = daily.get(key) or []
+        out = np.full(len(dates), np.nan)
+        n = min(len(values), len(dates))
+        out[:n] = np.array([np.nan if v is None else v for v in values[:n]], dtype=float)
+        arrays.append(out)
+    return (dates, *arrays)
+
+
+def date_parts(dates: np.ndarray):
+    """(year, month, day-of-year) int arrays for datetime64[D] dates."""
+    years = dates.astype("datetime64[Y]")
+    months = dates.astype("datetime64[M]")
+    return (
+        years.astype(int) + 1970,
+        (months - years.astype("datetime64[M]")).astype(int) + 1,
+        (dates - years.astype("datetime64[D]")).astype(int) + 1,
+    )
+
+
+# ============ GROWING DEGREE DAYS ============
+
+def daily_gdd(tmax: np.ndarray, tmin: np.ndarray, bases: Iterable[float] = (50,)) -> np.ndarray:
+    """
+    Daily GDD = max(0, (Tmax + Tmin) / 2 - base) for each base at once.
+    Shape (len(bases), ...tmax.shape); days with missing data are NaN.
+    """
+    mean = (np.asarray(tmax, dtype=float) + np.asarray(tmin, dtype=float)) / 2
+    bases = np.asarray(list(bases), dtype=float).reshape((-1,) + (1,) * mean.ndim)
+    return np.maximum(mean - bases, 0.0)
+
+
+def cumulative_gdd(tmax: np.ndarray, tmin: np.ndarray, bases: Iterable[float] = (50,)) -> np.ndarray:
+    """Running GDD total along the day axis (missing days add nothing)."""
+    gdd = daily_gdd(tmax, tmin, bases)
+    np.nan_to_num(gdd, copy=False)
+    return np.cumsum(gdd, axis=-1, out=gdd)
+
+
+# ============ FROST ============
+
+def _year_starts(years: np.ndarray):
+    """Distinct years and the index each starts at (dates must be ascending)."""
+    starts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+    return years[starts], starts
+
+
+def frost_dates(dates: np.ndarray, tmin: np.ndarray, threshold: float = FROST_F) -> Dict:
+    """
+    Last spring and first fall frost for every year in the series.
+    tmin is (days,) or (locations, days); returned index arrays match with
+    a trailing year axis and hold -1 where a year had no frost. Dates
+    must be ascending.
+    """
+    tmin = np.asarray(tmin, dtype=float)
+    flat = tmin.reshape(-1, tmin.shape[-1])
+    years, months, doy = date_parts(dates)
+    frost = flat <= threshold  # NaN compares False
+    spring = months <= SPRING_LAST_MONTH
+
+    # Dates are contiguous per year, so each year is one reduceat segment
+    uniq, starts = _year_starts(years)
+    pos = np.arange(len(dates))
+    last_spring = np.maximum.reduceat(np.where(frost & spring, pos, -1), starts, axis=-1)
+    first_fall = np.minimum.reduceat(np.where(frost & ~spring, pos, len(dates)), starts, axis=-1)
+    first_fall[first_fall == len(dates)] = -1
+    shape = tmin.shape[:-1] + (len(uniq),)
+    last_spring, first_fall = last_spring.reshape(shape), first_fall.reshape(shape)
+    last_spring_doy = np.where(last_spring >= 0, doy[last_spring], -1)
+    first_fall_doy = np.where(first_fall >= 0, doy[first_fall], -1)
+    return {
+        "years": uniq,
+        "last_spring": last_spring,
+        "first_fall": first_fall,
+        "last_spring_doy": last_spring_doy,
+        "first_fall_doy": first_fall_doy,
+        # From the calendar, not array positions: series may have missing days
+        "frost_free_days": np.where((last_spring >= 0) & (first_fall >= 0), first_fall_doy - last_spring_doy - 1, -1),
+    }
+
+
+def frost_date_strings(dates: np.ndarray, indices: np.ndarray) -> List[Optional[str]]:
+    """Index array from frost_dates() -> ISO dates (None where -1)."""
+    return [str(dates[i]) if i >= 0 else None for i in np.ravel(indices)]
+
+
+# ============ AGGREGATES ============
+
+def rolling_mean(values: np.ndarray, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """
+    Trailing mean over `window` days, ignoring NaN. Positions with fewer
+    than min_periods (default: window) valid values are NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    min_periods = window if min_periods is None else min_periods
+    valid = ~np.isnan(values)
+    total = np.cumsum(np.where(valid, values, 0.0), axis=-1)
+    count = np.cumsum(valid, axis=-1)
+    total[..., window:] -= total[..., :-window].copy()
+    count[..., window:] -= count[..., :-window].copy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count >= max(min_periods, 1), total / count, np.nan)
+
+
+def annual_stats(dates: np.ndarray, values: np.ndarray, how: str = "mean"):
+    """
+    Per-year mean or sum of a daily series, NaN-aware.
+    Returns (years, stats) with stats shaped (..., years); years with no
+    data are NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    flat = values.reshape(-1, values.shape[-1])
+    years, _, _ = date_parts(dates)
+    uniq, idx = np.unique(years, return_inverse=True)
+    ny = len(uniq)
+    valid = ~np.isnan(flat)
+    keys = (np.arange(flat.shape[0])[:, None] * ny + idx[None, :]).ravel()
+    sums = np.bincount(keys, weights=np.where(valid, flat, 0.0).ravel(), minlength=flat.shape[0] * ny)
+    counts = np.bincount(keys, weights=valid.ravel(), minlength=flat.shape[0] * ny)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = sums / counts if how == "mean" else np.where(counts > 0, sums, np.nan)
+    return uniq, out.reshape(values.shape[:-1] + (ny,))
+
+
+# ============ TRENDS ============
+
+def _t_cdf_small(t: np.ndarray, df: int) -> np.ndarray:
+    """Exact Student-t CDF for df in 1..5 (closed forms in theta = atan(t / sqrt(df)))."""
+    theta = np.arctan(t / np.sqrt(df))
+    s, c = np.sin(theta), np.cos(theta)
+    central = {
+        1: 2 / np.pi * theta,
+        2: s,
+        3: 2 / np.pi * (theta + s * c),
+        4: s * (1 + c ** 2 / 2),
+        5: 2 / np.pi * (theta + s * c * (1 + 2 * c ** 2 / 3)),
+    }[df]
+    return (1 + central) / 2
+
+
+def _t_quantile(p: float, df: np.ndarray) -> np.ndarray:
+    """
+    Student-t quantile. Cornish-Fisher expansion (within ~0.01 for
+    df >= 6); for df <= 5, where it runs too small, it is refined by
+    Newton steps on the exact CDF.
+    """
+    z = NormalDist().inv_cdf(p)
+    df = np.asarray(df, dtype=float)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    t = np.asarray(z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4, dtype=float)
+
+    for k in range(1, 6):
+        small = df == k
+        if not small.any():
+            continue
+        tk = t[small] if t.ndim else t
+        norm = np.exp(math.lgamma((k + 1) / 2) - math.lgamma(k / 2)) / np.sqrt(k * np.pi)
+        for _ in range(50):
+            pdf = norm * (1 + tk ** 2 / k) ** (-(k + 1) / 2)
+            step = (_t_cdf_small(tk, k) - p) / pdf
+            tk = tk - step
+            if np.all(np.abs(step) < 1e-10 * np.maximum(1, np.abs(tk))):
+                break
+        if t.ndim:
+            t[small] = tk
+        else:
+            t = tk
+    return t
+
+
+def linear_trend(x: np.ndarray, y: np.ndarray, confidence: float = 0.95) -> Dict:
+    """
+    Ordinary least squares y = intercept + slope * x along the last axis,
+    skipping NaN. y may be (n,) or (series, n); every field in the result
+    has y's leading shape. Series with fewer than 3 points get NaN.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = ~np.isnan(y) & ~np.isnan(x)
+    n = valid.sum(axis=-1)
+    xv = np.where(valid, x, 0.0)
+    yv = np.where(valid, y, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = xv.sum(axis=-1) / n
+        y_mean = yv.sum(axis=-1) / n
+        dx = np.where(valid, x - x_mean[..., None], 0.0)
+        dy = np.where(valid, y - y_mean[..., None], 0.0)
+        sxx = (dx * dx).sum(axis=-1)
+        slope = (dx * dy).sum(axis=-1) / sxx
+        intercept = y_mean - slope * x_mean
+        resid = np.where(valid, y - (intercept[..., None] + slope[..., None] * x), 0.0)
+        sse = (resid * resid).sum(axis=-1)
+        df = n - 2
+        stderr = np.sqrt(sse / df / sxx)
+        syy = (dy * dy).sum(axis=-1)
+        r2 = np.where(syy > 0, 1 - sse / syy, 0.0)
+        half = _t_quantile(0.5 + confidence / 2, np.maximum(df, 1)) * stderr
+    ok = n >= 3
+    nan = np.nan
+    return {
+        "slope": np.where(ok, slope, nan),
+        "intercept": np.where(ok, intercept, nan),
+        "stderr": np.where(ok, stderr, nan),
+        "ci_low": np.where(ok, slope - half, nan),
+        "ci_high": np.where(ok, slope + half, nan),
+        "r2": np.where(ok, r2, nan),
+        "n": n,
+        "confidence": confidence,
+    }
+
+
+def trend_direction(fit: Dict, min_slope: float = 0.0) -> str:
+    """'warming' / 'cooling' only when the whole confidence interval agrees."""
+    if np.isnan(fit["slope"]):
+        return "insufficient data"
+    if fit["ci_low"] > min_slope:
+        return "warming"
+    if fit["ci_high"] < -min_slope:
+        return "cooling"
+    return "stable"
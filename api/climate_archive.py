@@ -0,0 +1,215 @@
+"""
+Climate Archive
+===============
+Local SQLite copy of Open-Meteo daily history, keyed by (grid cell, date).
+
+The climate routes used to ask Open-Meteo for the same point and years
+over and over: /api/climate/trends made one request per year, and gdd /
+frost refetched years trends had already pulled. Now every route reads
+through the archive. It fetches only the date ranges a cell is missing,
+one ranged request per gap, and keeps them.
+
+    daily = await get_archive().get_daily(lat, lng, "1995-01-01", "2024-12-31")
+    daily["temperature_2m_max"]   # Open-Meteo `daily` layout
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from async_runtime import get_session
+
+OPEN_METEO_BASE = "https://archive-api.open-meteo.com/v1/archive"
+
+CLIMATE_ARCHIVE_PATH = os.environ.get("CLIMATE_ARCHIVE_PATH", "static/climate_archive.sqlite")
+CELL_DEG = 0.1          # ~10 km, the resolution of the archive model
+ARCHIVE_LAG_DAYS = 7    # the newest days are still null upstream; don't keep those
+GAP_MERGE_DAYS = 31     # gaps closer than this are fetched as one request
+FETCH_TIMEOUT = 60
+
+VARIABLES = [
+    "temperature_2m_max", "temperature_2m_min", "temperature_2m_mean",
+    "precipitation_sum", "rain_sum", "snowfall_sum",
+]
+UNITS = {
+    "temperature_2m_max": "°F", "temperature_2m_min": "°F", "temperature_2m_mean": "°F",
+    "precipitation_sum": "inch", "rain_sum": "inch", "snowfall_sum": "inch",
+}
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS daily (
+    cell_lat INTEGER NOT NULL,
+    cell_lng INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    {", ".join(f"{v} REAL" for v in VARIABLES)},
+    PRIMARY KEY (cell_lat, cell_lng, day)
+) WITHOUT ROWID
+"""
+
+
+class ArchiveIncomplete(Exception):
+    """Some of a requested range could not be fetched from Open-Meteo."""
+
+
+def grid_cell(lat: float, lng: float) -> Tuple[int, int]:
+    """Integer grid cell for a coordinate."""
+    return round(lat / CELL_DEG), round(lng / CELL_DEG)
+
+
+def cell_center(cell: Tuple[int, int]) -> Tuple[float, float]:
+    return round(cell[0] * CELL_DEG, 4), round(cell[1] * CELL_DEG, 4)
+
+
+def _gaps(have: List[int], start: int, end: int, merge: int = GAP_MERGE_DAYS) -> List[Tuple[int, int]]:
+    """Missing [first, last] ordinal ranges of start..end given the sorted days present."""
+    gaps = []
+    cursor = start
+    for day in have:
+        if day > cursor:
+            gaps.append([cursor, day - 1])
+        cursor = max(cursor, day + 1)
+    if cursor <= end:
+        gaps.append([cursor, end])
+
+    merged = []
+    for gap in gaps:
+        if merged and gap[0] - merged[-1][1] <= merge:
+            merged[-1][1] = gap[1]
+        else:
+            merged.append(gap)
+    return [tuple(g) for g in merged]
+
+
+class ClimateArchive:
+    """SQLite-backed daily climate cache. Safe to share between threads."""
+
+    def __init__(self, path: str = CLIMATE_ARCHIVE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._cell_locks = {}  # cell -> asyncio.Lock, so one caller fills a cell's gaps at a time
+        self.fetches = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    # ---- storage (blocking; called through asyncio.to_thread) ----
+
+    def _days_present(self, cell, start: int, end: int) -> List[int]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT day FROM daily WHERE cell_lat=? AND cell_lng=? AND day BETWEEN ? AND ? ORDER BY day",
+                (cell[0], cell[1], start, end),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def _read(self, cell, start: int, end: int) -> Dict:
+        with self._lock:
+            rows = self._db().execute(
+                f"SELECT day, {', '.join(VARIABLES)} FROM daily "
+                "WHERE cell_lat=? AND cell_lng=? AND day BETWEEN ? AND ? ORDER BY day",
+                (cell[0], cell[1], start, end),
+            ).fetchall()
+        daily = {"time": [date.fromordinal(r[0]).isoformat() for r in rows]}
+        for i, var in enumerate(VARIABLES, 1):
+            daily[var] = [r[i] for r in rows]
+        return daily
+
+    def _write(self, cell, daily: Dict, keep_until: int):
+        columns = [daily.get(var) or [] for var in VARIABLES]
+        rows = []
+        for i, day in enumerate(daily.get("time", [])):
+            ordinal = date.fromisoformat(day).toordinal()
+            values = [col[i] if i < len(col) else None for col in columns]
+            # Recent days come back null until the archive catches up
+            if ordinal > keep_until and all(v is None for v in values):
+                continue
+            rows.append((cell[0], cell[1], ordinal, *values))
+        with self._lock:
+            conn = self._db()
+            conn.executemany(f"INSERT OR REPLACE INTO daily VALUES ({', '.join('?' * (3 + len(VARIABLES)))})", rows)
+            conn.commit()
+
+    # ---- fetching ----
+
+    async def _fetch(self, cell, first: date, last: date) -> Optional[Dict]:
+        lat, lng = cell_center(cell)
+        params = {
+            "latitude": lat,
+            "longitude": lng,
+            "start_date": first.isoformat(),
+            "end_date": last.isoformat(),
+            "daily": ",".join(VARIABLES),
+            "temperature_unit": "fahrenheit",
+            "precipitation_unit": "inch",
+            "timezone": "America/Denver"
+        }
+        self.fetches += 1
+        try:
+            session = get_session("open_meteo")
+            async with session.get(OPEN_METEO_BASE, params=params, timeout=FETCH_TIMEOUT) as resp:
+                if resp.status == 200:
+                    return (await resp.json()).get("daily")
+                print(f"Climate archive fetch {cell} {first}..{last}: HTTP {resp.status}")
+        except Exception as e:
+            print(f"Climate archive fetch error: {e}")
+        return None
+
+    async def get_daily(self, lat: float, lng: float, start_date: str, end_date: str) -> Dict:
+        """
+        Daily values for start_date..end_date (inclusive, ISO dates), fetching
+        whatever this cell is missing first. Dates after today are dropped.
+        Raises ArchiveIncomplete if a missing range could not be fetched
+        (the ranges that could are still kept).
+        """
+        cell = grid_cell(lat, lng)
+        today = date.today()
+        start = date.fromisoformat(start_date).toordinal()
+        end = min(date.fromisoformat(end_date), today).toordinal()
+        if end < start:
+            return {"time": [], **{v: [] for v in VARIABLES}}
+
+        keep_until = (today - timedelta(days=ARCHIVE_LAG_DAYS)).toordinal()
+        async with self._cell_locks.setdefault(cell, asyncio.Lock()):
+            # Checked under the lock: a concurrent caller may just have filled the gap
+            have = await asyncio.to_thread(self._days_present, cell, start, end)
+            failed = []
+            for first, last in _gaps(have, start, end):
+                daily = await self._fetch(cell, date.fromordinal(first), date.fromordinal(last))
+                if daily:
+                    await asyncio.to_thread(self._write, cell, daily, keep_until)
+                else:
+                    failed.append(f"{date.fromordinal(first)}..{date.fromordinal(last)}")
+        if failed:
+            raise ArchiveIncomplete(f"cell {cell}: could not fetch {', '.join(failed)}")
+        return await asyncio.to_thread(self._read, cell, start, end)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            cells, days = self._db().execute(
+                "SELECT COUNT(DISTINCT cell_lat || ',' || cell_lng), COUNT(*) FROM daily"
+            ).fetchone()
+        return {"cells": cells, "days": days, "upstream_fetches": self.fetches}
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive() -> ClimateArchive:
+    """Process-wide archive at CLIMATE_ARCHIVE_PATH."""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = ClimateArchive()
+        return _archive
@@ -4,42 +4,80 @@ Climate Data API
 Historical and current climate data from Open-Meteo (free, no API key).
 """
 
-import aiohttp
-import asyncio
-import ssl
-import certifi
 from flask import request, jsonify
-from datetime import datetime, timedelta
+import calendar
+from datetime import date, datetime, timedelta
+import numpy as np
+from async_runtime import DEFAULT_TIMEOUT, get_session, run_sync
+from climate_archive import UNITS, cell_center, get_archive, grid_cell
+from pollinator_activity import (DAILY_REASONS, FORECAST_HOURS, LEVELS, WASATCH_FRONT, activity_grid,
+                                 condition_notes, daily_activity, grid_geojson, score_conditions)
+from wildlife_cache import ResultCache
+from climate_analytics import (annual_stats, daily_arrays, daily_gdd, frost_date_strings,
+                               frost_dates, linear_trend, trend_direction)
 
-OPEN_METEO_BASE = "https://archive-api.open-meteo.com/v1/archive"
 OPEN_METEO_CURRENT = "https://api.open-meteo.com/v1/forecast"
 
+# Memo TTLs per kind of data (seconds)
+CURRENT_TTL = 600                 # current conditions / 7-day forecast
+RECENT_TTL = 3600                 # history reaching into the current year
+CLOSED_TTL = 30 * 24 * 3600       # closed years never change
+FAILED_TTL = 0                    # don't keep failures, but share them with waiting callers
+
+FIRST_ARCHIVE_YEAR = 1940         # start of the Open-Meteo historical archive
+
+# Results are keyed on the snapped grid cell, so nearby gardens share entries
+_climate_cache = ResultCache(max_entries=4096, max_bytes=128 * 1024 * 1024)
+
+
+# ============ CACHING ============
+
+def snap(lat, lng):
+    """Snap a coordinate to the ~10 km archive grid cell center."""
+    return cell_center(grid_cell(lat, lng))
+
+
+def history_ttl(end_date):
+    """Forever-ish for ranges ending before this year, an hour otherwise."""
+    return CLOSED_TTL if int(str(end_date)[:4]) < datetime.now().year else RECENT_TTL
+
+
+def memoized(route, ttl, coro_fn, *args, timeout=DEFAULT_TIMEOUT):
+    """
+    run_sync(coro_fn(*args)) through the climate cache. Concurrent identical
+    requests wait for the first one instead of each calling upstream.
+    """
+    key = f"{route}:" + ":".join(str(a) for a in args)
+    return _climate_cache.get_or_set(
+        key,
+        lambda: run_sync(coro_fn(*args), timeout=timeout),
+        ttl=lambda value: ttl if value else FAILED_TTL,
+    )
+
+
 
 async def fetch_historical_climate(lat, lng, start_date, end_date):
     """
     Fetch historical daily climate data.
-    Available: 1940-present
+    Available: 1940-present. Served from the local climate archive, which
+    only goes upstream for dates it doesn't have yet. None if any part of
+    the range could not be fetched, so partial history is never memoized.
     """
-    params = {
-        "latitude": lat,
-        "longitude": lng,
-        "start_date": start_date,
-        "end_date": end_date,
-        "daily": "temperature_2m_max,temperature_2m_min,temperature_2m_mean,precipitation_sum,rain_sum,snowfall_sum",
-        "temperature_unit": "fahrenheit",
-        "precipitation_unit": "inch",
-        "timezone": "America/Denver"
-    }
-    
-    ssl_ctx = ssl.create_default_context(cafile=certifi.where())
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(OPEN_METEO_BASE, params=params, ssl=ssl_ctx, timeout=30) as resp:
-                if resp.status == 200:
-                    return await resp.json()
+        daily = await get_archive().get_daily(lat, lng, start_date, end_date)
     except Exception as e:
         print(f"Climate API error: {e}")
-    return None
+        return None
+    if not daily["time"]:
+        return None
+    center_lat, center_lng = cell_center(grid_cell(lat, lng))
+    return {
+        "latitude": center_lat,
+        "longitude": center_lng,
+        "timezone": "America/Denver",
+        "daily_units": dict(UNITS, time="iso8601"),
+        "daily": daily,
+    }
 
 
 async def fetch_current_weather(lat, lng):
@@ -50,17 +88,17 @@ async def fetch_current_weather(lat, lng):
         "current": "temperature_2m,relative_humidity_2m,precipitation,weather_code,wind_speed_10m",
         "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum,weather_code",
         "temperature_unit": "fahrenheit",
+        "wind_speed_unit": "mph",
         "precipitation_unit": "inch",
         "timezone": "America/Denver",
         "forecast_days": 7
     }
     
-    ssl_ctx = ssl.create_default_context(cafile=certifi.where())
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(OPEN_METEO_CURRENT, params=params, ssl=ssl_ctx, timeout=15) as resp:
-                if resp.status == 200:
-                    return await resp.json()
+        session = get_session("open_meteo")
+        async with session.get(OPEN_METEO_CURRENT, params=params, timeout=15) as resp:
+            if resp.status == 200:
+                return await resp.json()
     except Exception as e:
         print(f"Weather API error: {e}")
     return None
@@ -72,28 +110,27 @@ def calculate_growing_degree_days(daily_data, base_temp=50):
     GDD = ((Tmax + Tmin) / 2) - base_temp
     Used to predict plant/insect development.
     """
+    return calculate_gdd_bases(daily_data, [base_temp]).get(base_temp, [])
+
+
+def calculate_gdd_bases(daily_data, bases):
+    """GDD series for several base temperatures in one pass: {base: [...]}."""
     if not daily_data:
-        return []
-    
-    gdd_values = []
-    cumulative = 0
-    
-    dates = daily_data.get("time", [])
-    tmax = daily_data.get("temperature_2m_max", [])
-    tmin = daily_data.get("temperature_2m_min", [])
+        return {}
     
-    for i, date in enumerate(dates):
-        if i < len(tmax) and i < len(tmin) and tmax[i] and tmin[i]:
-            avg = (tmax[i] + tmin[i]) / 2
-            gdd = max(0, avg - base_temp)
-            cumulative += gdd
-            gdd_values.append({
-                "date": date,
-                "daily_gdd": round(gdd, 1),
-                "cumulative_gdd": round(cumulative, 1)
-            })
+    dates, tmax, tmin = daily_arrays(daily_data, ("temperature_2m_max", "temperature_2m_min"))
+    daily = daily_gdd(tmax, tmin, bases)
+    cumulative = np.cumsum(np.nan_to_num(daily), axis=-1)
+    keep = ~np.isnan(tmax) & ~np.isnan(tmin)
+    days = dates[keep].astype(str).tolist()
     
-    return gdd_values
+    result = {}
+    for i, base in enumerate(bases):
+        result[base] = [
+            {"date": d, "daily_gdd": g, "cumulative_gdd": c}
+            for d, g, c in zip(days, np.round(daily[i][keep], 1).tolist(), np.round(cumulative[i][keep], 1).tolist())
+        ]
+    return result
 
 
 def analyze_frost_dates(daily_data):
@@ -101,29 +138,14 @@ def analyze_frost_dates(daily_data):
     if not daily_data:
         return None
     
-    dates = daily_data.get("time", [])
-    tmin = daily_data.get("temperature_2m_min", [])
-    
-    last_spring_frost = None
-    first_fall_frost = None
-    
-    for i, date in enumerate(dates):
-        if i >= len(tmin) or tmin[i] is None:
-            continue
-            
-        month = int(date[5:7])
-        
-        # Spring: Jan-Jun, find last frost
-        if month <= 6 and tmin[i] <= 32:
-            last_spring_frost = date
-        
-        # Fall: Jul-Dec, find first frost
-        if month >= 7 and tmin[i] <= 32 and first_fall_frost is None:
-            first_fall_frost = date
+    dates, tmin = daily_arrays(daily_data, ("temperature_2m_min",))
+    frost = frost_dates(dates, tmin)
+    spring = [d for d in frost_date_strings(dates, frost["last_spring"]) if d]
+    fall = [d for d in frost_date_strings(dates, frost["first_fall"]) if d]
     
     return {
-        "last_spring_frost": last_spring_frost,
-        "first_fall_frost": first_fall_frost,
+        "last_spring_frost": spring[-1] if spring else None,
+        "first_fall_frost": fall[0] if fall else None,
     }
 
 
@@ -138,53 +160,14 @@ def get_pollinator_conditions(current_data):
     wind = current.get("wind_speed_10m", 0)
     precip = current.get("precipitation", 0)
     
-    # Pollinator activity scoring
-    score = 100
-    notes = []
-    
-    # Temperature (optimal: 60-85°F)
-    if temp < 50:
-        score -= 40
-        notes.append("Too cold for most pollinators")
-    elif temp < 60:
-        score -= 20
-        notes.append("Cool - reduced activity")
-    elif temp > 95:
-        score -= 30
-        notes.append("Too hot - pollinators seeking shade")
-    elif temp > 85:
-        score -= 10
-        notes.append("Warm - peak afternoon activity reduced")
-    else:
-        notes.append("Ideal temperature for pollinators")
-    
-    # Wind (optimal: < 10 mph)
-    if wind > 20:
-        score -= 30
-        notes.append("High winds - bees grounded")
-    elif wind > 15:
-        score -= 15
-        notes.append("Windy - reduced flight activity")
-    elif wind > 10:
-        score -= 5
-    
-    # Precipitation
-    if precip > 0:
-        score -= 25
-        notes.append("Rain - pollinators sheltering")
+    score, level = score_conditions(temp, humidity, wind, precip)
+    score = int(score)
+    notes = condition_notes(temp, humidity, wind, precip)
     
-    # Humidity (optimal: 40-70%)
-    if humidity > 85:
-        score -= 10
-        notes.append("High humidity")
-    elif humidity < 20:
-        score -= 10
-        notes.append("Very dry conditions")
-    
-    activity_level = "High" if score >= 80 else "Moderate" if score >= 50 else "Low"
+    activity_level = LEVELS[int(level)]
     
     return {
-        "score": max(0, score),
+        "score": score,
         "activity_level": activity_level,
         "conditions": {
             "temperature_f": temp,
@@ -200,63 +183,65 @@ async def get_climate_trends(lat, lng, years=10):
     """
     Analyze climate trends over multiple years.
     Shows changes in temperature, frost dates, etc.
+    Returns None unless every day of every requested year has a high, so an
+    outage or a partly filled archive is not cached as a finished analysis.
     """
     current_year = datetime.now().year
+    first_year = current_year - years
+    data = await fetch_historical_climate(lat, lng, f"{first_year}-01-01", f"{current_year - 1}-12-31")
+    if not data or "daily" not in data:
+        return None
+    if not _complete_years(data["daily"], range(first_year, current_year)):
+        return None
+    return summarize_trends(data["daily"], lat, lng, years)
+
+
+def _complete_years(daily, years):
+    """True if each of `years` has a non-null daily high on every calendar day."""
+    dates, tmax = daily_arrays(daily, ("temperature_2m_max",))
+    have, counts = annual_stats(dates, ~np.isnan(tmax), "sum")
+    days = dict(zip(have.tolist(), counts.tolist()))
+    return all(days.get(y, 0) >= 365 + calendar.isleap(y) for y in years)
+
+
+def summarize_trends(daily, lat, lng, years):
+    """Yearly summaries plus a least-squares trend of the average high."""
+    dates, tmax, tmin, precip = daily_arrays(daily)
     yearly_data = []
+    fit = linear_trend([], [])
     
-    ssl_ctx = ssl.create_default_context(cafile=certifi.where())
-    
-    async with aiohttp.ClientSession() as session:
-        for year in range(current_year - years, current_year):
-            params = {
-                "latitude": lat,
-                "longitude": lng,
-                "start_date": f"{year}-01-01",
-                "end_date": f"{year}-12-31",
-                "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum",
-                "temperature_unit": "fahrenheit",
-                "precipitation_unit": "inch",
-                "timezone": "America/Denver"
-            }
-            
-            try:
-                async with session.get(OPEN_METEO_BASE, params=params, ssl=ssl_ctx, timeout=30) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        daily = data.get("daily", {})
-                        
-                        tmax = [t for t in daily.get("temperature_2m_max", []) if t is not None]
-                        tmin = [t for t in daily.get("temperature_2m_min", []) if t is not None]
-                        precip = [p for p in daily.get("precipitation_sum", []) if p is not None]
-                        
-                        frost_info = analyze_frost_dates(daily)
-                        
-                        yearly_data.append({
-                            "year": year,
-                            "avg_high": round(sum(tmax) / len(tmax), 1) if tmax else None,
-                            "avg_low": round(sum(tmin) / len(tmin), 1) if tmin else None,
-                            "total_precip": round(sum(precip), 1) if precip else None,
-                            "last_spring_frost": frost_info.get("last_spring_frost") if frost_info else None,
-                            "first_fall_frost": frost_info.get("first_fall_frost") if frost_info else None,
-                        })
-            except Exception as e:
-                print(f"Error fetching {year}: {e}")
+    if len(dates):
+        year_list, stats = annual_stats(dates, np.stack([tmax, tmin]), "mean")
+        _, total_precip = annual_stats(dates, precip, "sum")
+        frost = frost_dates(dates, tmin)
+        spring = frost_date_strings(dates, frost["last_spring"])
+        fall = frost_date_strings(dates, frost["first_fall"])
+        
+        def rounded(v):
+            return None if np.isnan(v) else round(float(v), 1)
+        
+        for i, year in enumerate(year_list.tolist()):
+            yearly_data.append({
+                "year": year,
+                "avg_high": rounded(stats[0, i]),
+                "avg_low": rounded(stats[1, i]),
+                "total_precip": rounded(total_precip[i]),
+                "last_spring_frost": spring[i],
+                "first_fall_frost": fall[i],
+                "frost_free_days": int(frost["frost_free_days"][i]) if frost["frost_free_days"][i] >= 0 else None,
+            })
+        fit = linear_trend(year_list, stats[0])
     
-    # Calculate trends
-    if len(yearly_data) >= 3:
-        temps = [y["avg_high"] for y in yearly_data if y["avg_high"]]
-        if len(temps) >= 3:
-            trend = (temps[-1] - temps[0]) / len(temps)
-            trend_direction = "warming" if trend > 0.1 else "cooling" if trend < -0.1 else "stable"
-        else:
-            trend_direction = "insufficient data"
-    else:
-        trend_direction = "insufficient data"
+    # Warming/cooling only when the 95% interval of the slope excludes zero
+    trend = {k: float(v) for k, v in fit.items() if k in ("slope", "ci_low", "ci_high", "r2")}
     
     return {
         "location": {"lat": lat, "lng": lng},
         "years_analyzed": years,
-        "trend": trend_direction,
+        "trend": trend_direction(fit),
+        "trend_per_decade_f": None if np.isnan(trend["slope"]) else round(trend["slope"] * 10, 2),
+        "trend_ci_per_decade_f": None if np.isnan(trend["slope"]) else [round(trend["ci_low"] * 10, 2), round(trend["ci_high"] * 10, 2)],
+        "trend_r2": None if np.isnan(trend["r2"]) else round(trend["r2"], 3),
         "yearly_data": yearly_data,
     }
 
@@ -272,8 +257,9 @@ def register_climate_routes(app):
         lng = request.args.get('lng', type=float)
         if not lat or not lng:
             return jsonify({"error": "lat and lng required"}), 400
+        lat, lng = snap(lat, lng)
         
-        data = asyncio.run(fetch_current_weather(lat, lng))
+        data = memoized("forecast", CURRENT_TTL, fetch_current_weather, lat, lng)
         if not data:
             return jsonify({"error": "Failed to fetch weather"}), 500
         
@@ -291,15 +277,21 @@ def register_climate_routes(app):
         lng = request.args.get('lng', type=float)
         if not lat or not lng:
             return jsonify({"error": "lat and lng required"}), 400
+        lat, lng = snap(lat, lng)
         
         # Default to last 365 days
         end = datetime.now()
         start = end - timedelta(days=365)
         
-        start_date = request.args.get('start', start.strftime("%Y-%m-%d"))
-        end_date = request.args.get('end', end.strftime("%Y-%m-%d"))
+        try:
+            start_date = date.fromisoformat(request.args.get('start', start.strftime("%Y-%m-%d"))).isoformat()
+            end_date = date.fromisoformat(request.args.get('end', end.strftime("%Y-%m-%d"))).isoformat()
+        except ValueError:
+            return jsonify({"error": "start and end must be YYYY-MM-DD dates"}), 400
+        if start_date > end_date:
+            return jsonify({"error": "start must not be after end"}), 400
         
-        data = asyncio.run(fetch_historical_climate(lat, lng, start_date, end_date))
+        data = memoized("history", history_ttl(end_date), fetch_historical_climate, lat, lng, start_date, end_date)
         if not data:
             return jsonify({"error": "Failed to fetch climate data"}), 500
         
@@ -312,27 +304,38 @@ def register_climate_routes(app):
         lng = request.args.get('lng', type=float)
         if not lat or not lng:
             return jsonify({"error": "lat and lng required"}), 400
+        lat, lng = snap(lat, lng)
         
         year = request.args.get('year', datetime.now().year, type=int)
         base = request.args.get('base', 50, type=int)
+        if not FIRST_ARCHIVE_YEAR <= year <= datetime.now().year:
+            return jsonify({"error": f"year must be {FIRST_ARCHIVE_YEAR}-{datetime.now().year}"}), 400
         
         start_date = f"{year}-01-01"
         end_date = f"{year}-12-31" if year < datetime.now().year else datetime.now().strftime("%Y-%m-%d")
         
-        data = asyncio.run(fetch_historical_climate(lat, lng, start_date, end_date))
+        data = memoized("history", history_ttl(end_date), fetch_historical_climate, lat, lng, start_date, end_date)
         if not data or "daily" not in data:
             return jsonify({"error": "Failed to fetch climate data"}), 500
         
-        gdd = calculate_growing_degree_days(data["daily"], base)
+        # ?bases=40,50,55 adds series for extra base temperatures in the same pass
+        extra = [int(b) for b in request.args.get('bases', '').split(',') if b.strip().lstrip('-').isdigit()]
+        by_base = calculate_gdd_bases(data["daily"], [base] + [b for b in extra if b != base])
+        gdd = by_base[base]
         
-        return jsonify({
+        result = {
             "year": year,
             "base_temp_f": base,
             "location": {"lat": lat, "lng": lng},
             "gdd_data": gdd,
             "current_cumulative": gdd[-1]["cumulative_gdd"] if gdd else 0,
             "note": "GDD helps predict plant/insect development stages"
-        })
+        }
+        if extra:
+            result["cumulative_by_base"] = {
+                str(b): series[-1]["cumulative_gdd"] if series else 0 for b, series in by_base.items()
+            }
+        return jsonify(result)
     
     @app.route('/api/climate/frost', methods=['GET'])
     def frost_analysis():
@@ -341,10 +344,13 @@ def register_climate_routes(app):
         lng = request.args.get('lng', type=float)
         if not lat or not lng:
             return jsonify({"error": "lat and lng required"}), 400
+        lat, lng = snap(lat, lng)
         
         year = request.args.get('year', datetime.now().year, type=int)
+        if not FIRST_ARCHIVE_YEAR <= year <= datetime.now().year:
+            return jsonify({"error": f"year must be {FIRST_ARCHIVE_YEAR}-{datetime.now().year}"}), 400
         
-        data = asyncio.run(fetch_historical_climate(lat, lng, f"{year}-01-01", f"{year}-12-31"))
+        data = memoized("history", history_ttl(year), fetch_historical_climate, lat, lng, f"{year}-01-01", f"{year}-12-31")
         if not data or "daily" not in data:
             return jsonify({"error": "Failed to fetch climate data"}), 500
         
@@ -363,12 +369,24 @@ def register_climate_routes(app):
         lng = request.args.get('lng', type=float)
         if not lat or not lng:
             return jsonify({"error": "lat and lng required"}), 400
+        lat, lng = snap(lat, lng)
         
         years = request.args.get('years', 10, type=int)
-        years = min(years, 30)  # Cap at 30 years
+        years = max(1, min(years, 30))  # 1 to 30 years
         
-        data = asyncio.run(get_climate_trends(lat, lng, years))
-        return jsonify(data)
+        # Trends cover closed years only; the key rolls over with the calendar year
+        data = memoized(f"trends-{datetime.now().year}", CLOSED_TTL, get_climate_trends, lat, lng, years, timeout=180)
+        if not data:
+            return jsonify({"error": "Failed to fetch climate data"}), 500
+        response = jsonify(data)
+        # Only closed years are analyzed, so browsers can reuse this across page loads
+        response.headers["Cache-Control"] = "public, max-age=86400"
+        return response
+    
+    @app.route('/api/climate/archive/stats', methods=['GET'])
+    def climate_archive_stats():
+        """Size of the local climate archive, upstream fetches and memo stats."""
+        return jsonify(dict(get_archive().stats(), cache=_climate_cache.stats()))
     
     @app.route('/api/climate/pollinator-forecast', methods=['GET'])
     def pollinator_forecast():
@@ -377,46 +395,26 @@ def register_climate_routes(app):
         lng = request.args.get('lng', type=float)
         if not lat or not lng:
             return jsonify({"error": "lat and lng required"}), 400
+        lat, lng = snap(lat, lng)
         
-        data = asyncio.run(fetch_current_weather(lat, lng))
+        data = memoized("forecast", CURRENT_TTL, fetch_current_weather, lat, lng)
         if not data or "daily" not in data:
             return jsonify({"error": "Failed to fetch forecast"}), 500
         
         daily = data["daily"]
+        dates, tmax, tmin, precip = daily_arrays(daily, ("temperature_2m_max", "temperature_2m_min", "precipitation_sum"))
+        level, reason = daily_activity(tmax, tmin, precip)
         forecast = []
         
-        for i, date in enumerate(daily.get("time", [])):
-            tmax = daily["temperature_2m_max"][i] if i < len(daily.get("temperature_2m_max", [])) else None
-            tmin = daily["temperature_2m_min"][i] if i < len(daily.get("temperature_2m_min", [])) else None
-            precip = daily["precipitation_sum"][i] if i < len(daily.get("precipitation_sum", [])) else 0
-            
-            if tmax and tmin:
-                avg_temp = (tmax + tmin) / 2
-                
-                # Simple activity prediction
-                if precip > 0.1:
-                    activity = "Low"
-                    reason = "Rain expected"
-                elif avg_temp < 55:
-                    activity = "Low"
-                    reason = "Too cool"
-                elif avg_temp > 90:
-                    activity = "Moderate"
-                    reason = "Hot - morning/evening best"
-                elif 65 <= avg_temp <= 85:
-                    activity = "High"
-                    reason = "Ideal conditions"
-                else:
-                    activity = "Moderate"
-                    reason = "Fair conditions"
-                
+        for i, date in enumerate(dates.astype(str).tolist()):
+            if tmax[i] and tmin[i] and not np.isnan(tmax[i] + tmin[i]):
                 forecast.append({
                     "date": date,
-                    "high_f": tmax,
-                    "low_f": tmin,
-                    "precip_in": precip,
-                    "activity": activity,
-                    "reason": reason,
+                    "high_f": float(tmax[i]),
+                    "low_f": float(tmin[i]),
+                    "precip_in": 0 if np.isnan(precip[i]) else float(precip[i]),
+                    "activity": LEVELS[level[i]],
+                    "reason": DAILY_REASONS[reason[i]],
                 })
         
         return jsonify({
@@ -424,3 +422,28 @@ def register_climate_routes(app):
             "forecast": forecast,
             "best_days": [f["date"] for f in forecast if f["activity"] == "High"],
         })
+    
+    @app.route('/api/climate/pollinator-activity-grid', methods=['GET'])
+    def pollinator_activity_grid():
+        """
+        Hourly pollinator activity raster for the Wasatch Front.
+        ?hours=N (<= 48) for the raster, or ?format=geojson&hour=i for one
+        hour as weighted points for a heatmap layer.
+        """
+        hours = max(1, min(request.args.get('hours', 24, type=int), FORECAST_HOURS))
+        grid = memoized("activity-grid", CURRENT_TTL, activity_grid, WASATCH_FRONT, FORECAST_HOURS, timeout=120)
+        if not grid:
+            return jsonify({"error": "Failed to fetch forecast grid"}), 500
+        
+        if request.args.get('format') == 'geojson':
+            hour = request.args.get('hour', 0, type=int)
+            if not 0 <= hour < len(grid["times"]):
+                return jsonify({"error": f"hour must be 0-{len(grid['times']) - 1}"}), 400
+            return jsonify(grid_geojson(grid, hour))
+        
+        return jsonify(dict(
+            grid,
+            times=grid["times"][:hours],
+            scores=grid["scores"][:hours],
+            mean_score_by_hour=grid["mean_score_by_hour"][:hours],
+        ))
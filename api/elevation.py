@@ -0,0 +1,121 @@
+"""
+Elevation
+=========
+Ground elevation per geohash cell, from the Open-Meteo elevation API
+(90 m Copernicus DEM), cached in a local SQLite file so every cell is
+fetched once:
+
+    cache = get_elevation_cache()
+    meters = cache.lookup(lat_array, lng_array)              # NaN where unknown
+    meters = cache.lookup(lat_array, lng_array, fetch=False) # cache only, no network
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+import geohash
+from async_runtime import get_limiter, get_session, run_sync
+
+OPEN_METEO_ELEVATION = "https://api.open-meteo.com/v1/elevation"
+
+ELEVATION_CACHE_PATH = os.environ.get("ELEVATION_CACHE_PATH", "static/elevation_cells.sqlite")
+CELL_PRECISION = 6      # ~1.2 x 0.6 km: fine enough for Wasatch slopes
+BATCH_SIZE = 100        # coordinates per Open-Meteo request
+READ_BATCH = 500        # cells per SELECT (SQLite caps bound parameters)
+FETCH_TIMEOUT = 30
+
+
+class ElevationCache:
+    """Cell -> meters, backed by SQLite. Safe to share between threads."""
+
+    def __init__(self, path: str = ELEVATION_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self.fetches = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cells (cell INTEGER PRIMARY KEY, meters REAL)")
+            self._conn = conn
+        return self._conn
+
+    def _read(self, cells: np.ndarray) -> np.ndarray:
+        """Cached meters for unique cells (NaN if missing)."""
+        cells = [int(c) for c in cells]
+        known = {}
+        with self._lock:
+            conn = self._db()
+            for i in range(0, len(cells), READ_BATCH):
+                batch = cells[i:i + READ_BATCH]
+                known.update(conn.execute(
+                    f"SELECT cell, meters FROM cells WHERE cell IN ({','.join('?' * len(batch))})", batch
+                ).fetchall())
+        return np.array([known.get(c, np.nan) for c in cells], dtype=np.float64)
+
+    def _write(self, cells: List[int], meters: List[Optional[float]]):
+        with self._lock:
+            conn = self._db()
+            conn.executemany("INSERT OR REPLACE INTO cells VALUES (?, ?)", zip(cells, meters))
+            conn.commit()
+
+    async def _fetch(self, cells: np.ndarray) -> List[Optional[float]]:
+        lat, lng = geohash.decode_array(cells, CELL_PRECISION)
+        params = {
+            "latitude": ",".join(f"{v:.5f}" for v in lat),
+            "longitude": ",".join(f"{v:.5f}" for v in lng),
+        }
+        self.fetches += 1
+        try:
+            await get_limiter("open_meteo").acquire()
+            session = get_session("open_meteo")
+            async with session.get(OPEN_METEO_ELEVATION, params=params, timeout=FETCH_TIMEOUT) as resp:
+                if resp.status == 200:
+                    return (await resp.json()).get("elevation") or []
+                print(f"Elevation fetch: HTTP {resp.status}")
+        except Exception as e:
+            print(f"Elevation fetch error: {e}")
+        return []
+
+    async def _fill(self, cells: np.ndarray):
+        for i in range(0, len(cells), BATCH_SIZE):
+            batch = cells[i:i + BATCH_SIZE]
+            meters = await self._fetch(batch)
+            if len(meters) != len(batch):
+                # Upstream is down or refusing us; the rest stay missing until the next lookup
+                print(f"Elevation: stopped after a failed batch, {len(cells) - i:,} cells unfetched")
+                return
+            await asyncio.to_thread(self._write, batch.tolist(), meters)
+
+    def lookup(self, lat, lng, fetch: bool = True) -> np.ndarray:
+        """Elevation in meters for arrays of points; fetches missing cells unless fetch=False."""
+        cells = geohash.encode_array(lat, lng, CELL_PRECISION)
+        uniq, inverse = np.unique(cells, return_inverse=True)
+        meters = self._read(uniq)
+        unknown = np.isnan(meters)
+        if fetch and unknown.any():
+            missing = uniq[unknown]
+            run_sync(self._fill(missing), timeout=FETCH_TIMEOUT * (len(missing) // BATCH_SIZE + 1))
+            meters[unknown] = self._read(missing)
+        return meters[inverse]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_elevation_cache() -> ElevationCache:
+    """Process-wide cache at ELEVATION_CACHE_PATH."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ElevationCache()
+        return _cache
@@ -0,0 +1,157 @@
+"""
+Geohash
+=======
+Encode lat/lng to geohash strings and find neighbouring cells.
+
+Precision guide (cell size at Utah latitudes):
+    4  ~ 39 x 20 km
+    5  ~ 4.9 x 4.9 km
+    6  ~ 1.2 x 0.6 km
+    7  ~ 150 x 150 m
+
+encode_array / decode_array work on NumPy arrays of points, with cells
+as integers (5 bits per character) rather than strings.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+
+def encode(lat: float, lng: float, precision: int = 6) -> str:
+    """Geohash of a point."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # even bits refine longitude
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                value = value * 2 + 1
+                lng_lo = mid
+            else:
+                value *= 2
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = value * 2 + 1
+                lat_lo = mid
+            else:
+                value *= 2
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(min_lng, min_lat, max_lng, max_lat) of a cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for c in geohash:
+        value = _DECODE[c]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if bit:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lng_lo, lat_lo, lng_hi, lat_hi
+
+
+def decode(geohash: str) -> Tuple[float, float]:
+    """Center (lat, lng) of a cell."""
+    min_lng, min_lat, max_lng, max_lat = bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+
+
+def neighbors(geohash: str) -> List[str]:
+    """The 8 cells surrounding a cell (fewer at the poles)."""
+    min_lng, min_lat, max_lng, max_lat = bounds(geohash)
+    lat, lng = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+    dlat, dlng = max_lat - min_lat, max_lng - min_lng
+    cells = []
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if not dx and not dy:
+                continue
+            nlat = lat + dy * dlat
+            if not -90 < nlat < 90:
+                continue
+            nlng = (lng + dx * dlng + 180) % 360 - 180
+            cells.append(encode(nlat, nlng, len(geohash)))
+    return cells
+
+
+# ============ VECTORIZED ============
+
+def _split_bits(precision: int) -> Tuple[int, int]:
+    """(longitude bits, latitude bits) of a precision; longitude takes the odd one."""
+    bits = 5 * precision
+    return (bits + 1) // 2, bits // 2
+
+
+def encode_array(lat, lng, precision: int = 6) -> np.ndarray:
+    """Integer geohashes for arrays of points (same cells as encode())."""
+    nlng, nlat = _split_bits(precision)
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    lng_i = np.clip(np.floor((lng + 180) / 360 * 2 ** nlng), 0, 2 ** nlng - 1).astype(np.int64)
+    lat_i = np.clip(np.floor((lat + 90) / 180 * 2 ** nlat), 0, 2 ** nlat - 1).astype(np.int64)
+    out = np.zeros(np.broadcast(lat, lng).shape, dtype=np.int64)
+    for k in range(5 * precision):
+        if k % 2 == 0:
+            bit = (lng_i >> (nlng - 1 - k // 2)) & 1
+        else:
+            bit = (lat_i >> (nlat - 1 - k // 2)) & 1
+        out = (out << 1) | bit
+    return out
+
+
+def decode_array(cells, precision: int = 6):
+    """Center (lat, lng) arrays of integer geohashes."""
+    nlng, nlat = _split_bits(precision)
+    cells = np.asarray(cells, dtype=np.int64)
+    lng_i = np.zeros(cells.shape, dtype=np.int64)
+    lat_i = np.zeros(cells.shape, dtype=np.int64)
+    bits = 5 * precision
+    for k in range(bits):
+        bit = (cells >> (bits - 1 - k)) & 1
+        if k % 2 == 0:
+            lng_i = (lng_i << 1) | bit
+        else:
+            lat_i = (lat_i << 1) | bit
+    return (lat_i + 0.5) * 180 / 2 ** nlat - 90, (lng_i + 0.5) * 360 / 2 ** nlng - 180
+
+
+def to_string(cell: int, precision: int = 6) -> str:
+    """Integer geohash -> geohash string."""
+    return "".join(_BASE32[(int(cell) >> (5 * (precision - 1 - i))) & 31] for i in range(precision))
+
+
+def from_string(geohash: str) -> int:
+    """Geohash string -> integer geohash."""
+    value = 0
+    for c in geohash:
+        value = value * 32 + _DECODE[c]
+    return value
@@ -0,0 +1,292 @@
+"""
+Observation Cube
+================
+Materialized aggregates of an observation store build. Dashboard
+histograms become rollups over cube rows instead of scans over every
+observation.
+
+The base table has one row per distinct (geohash cell, year, month,
+iconic_taxon, source, species) with its observation count, at the
+finest precision. Dropping species and shifting cells to a coarser
+precision gives the count tables, one per precision in PRECISIONS:
+
+    cube/meta.json
+    cube/base.<col>.npy    cell, year, month, iconic_taxon, source, species, count
+    cube/p<n>.<col>.npy    cell, year, month, iconic_taxon, source, count, species
+
+In the p<n> tables `species` is the number of distinct species in the
+row. Any rollup of distinct species uses the base table, since per-row
+counts don't add up. Categorical columns hold the build's dictionary
+codes (-1 = null); year and month 0 mean unknown.
+
+ObservationStoreWriter folds rows in every CHUNK_ROWS appends. Each chunk
+is reduced on its own and kept as a pending run; runs are merged into the
+base only once they outgrow it (and on first read), so a build sorts
+each row O(log n) times rather than once per chunk. The cube is complete
+when close() publishes the build, and nobody has to rescan the
+observations:
+
+    cube = store.cube()
+    cube.histogram("year")                                   # {2019: 1234, ...}
+    cube.histogram("year", measure="species", iconic_taxon=["Insecta"])
+    cube.rollup(("cell", "year"), precision=5, bbox=bbox)
+"""
+
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+import geohash
+
+PRECISIONS = (4, 5, 6)
+CHUNK_ROWS = 100000        # writer rows per fold
+CUBE_DIR = "cube"
+
+DIMENSIONS = ("cell", "year", "month", "iconic_taxon", "source")
+CATEGORICAL = ("iconic_taxon", "source", "species")
+_DTYPES = {
+    "cell": np.int64,
+    "year": np.int16,
+    "month": np.int8,
+    "iconic_taxon": np.int32,
+    "source": np.int32,
+    "species": np.int32,
+    "count": np.int64,
+}
+BASE_COLUMNS = DIMENSIONS + ("species", "count")
+LEVEL_COLUMNS = DIMENSIONS + ("count", "species")
+
+
+def _empty(columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    return {c: np.zeros(0, dtype=_DTYPES[c]) for c in columns}
+
+
+def _group(table: Dict[str, np.ndarray], keys: Sequence[str]):
+    """(sort order, start of each distinct key run) for table rows grouped by keys."""
+    n = len(table["count"])
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    order = np.lexsort([table[k] for k in reversed(keys)])
+    changed = np.zeros(n, dtype=bool)
+    changed[0] = True
+    for k in keys:
+        col = table[k][order]
+        changed[1:] |= col[1:] != col[:-1]
+    return order, np.flatnonzero(changed)
+
+
+def _reduce(table: Dict[str, np.ndarray], keys: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Sum counts over rows sharing keys (rows come back sorted by keys)."""
+    order, starts = _group(table, keys)
+    out = {k: table[k][order][starts] for k in keys}
+    out["count"] = np.add.reduceat(table["count"][order], starts) if len(starts) else np.zeros(0, dtype=np.int64)
+    return out
+
+
+def _concat(*tables: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {c: np.concatenate([t[c] for t in tables]).astype(_DTYPES[c], copy=False) for c in tables[0]}
+
+
+class AggregateCube:
+    """Count and species aggregates of one store build."""
+
+    def __init__(self, base: Optional[Dict[str, np.ndarray]] = None, categories: Optional[Dict] = None,
+                 precisions: Sequence[int] = PRECISIONS):
+        self.precisions = tuple(sorted(precisions))
+        self.precision = self.precisions[-1]
+        self._base = base if base is not None else _empty(BASE_COLUMNS)
+        self._pending: List[Dict[str, np.ndarray]] = []  # reduced chunks not yet merged into _base
+        self._pending_rows = 0
+        self.categories = categories or {}  # column -> StringTable, for label decoding and filters
+        self._levels: Dict[int, Dict[str, np.ndarray]] = {}
+
+    @property
+    def base(self) -> Dict[str, np.ndarray]:
+        """The base table, with any pending runs merged in."""
+        if self._pending:
+            self._merge_pending()
+        return self._base
+
+    @base.setter
+    def base(self, table: Dict[str, np.ndarray]):
+        self._base = table
+        self._pending = []
+        self._pending_rows = 0
+
+    def _merge_pending(self):
+        self.base = _reduce(_concat(self._base, *self._pending), BASE_COLUMNS[:-1])
+
+    def __len__(self):
+        return len(self.base["count"])
+
+    @property
+    def total(self) -> int:
+        return int(self.base["count"].sum())
+
+    # ---------- building ----------
+
+    def add(self, lat, lng, year, month, iconic_taxon, source, species):
+        """Fold a chunk of observations (parallel arrays) into the cube."""
+        chunk = {
+            "cell": geohash.encode_array(lat, lng, self.precision),
+            "year": np.asarray(year, dtype=np.int16),
+            "month": np.asarray(month, dtype=np.int8),
+            "iconic_taxon": np.asarray(iconic_taxon, dtype=np.int32),
+            "source": np.asarray(source, dtype=np.int32),
+            "species": np.asarray(species, dtype=np.int32),
+            "count": np.ones(len(lat), dtype=np.int64),
+        }
+        run = _reduce(chunk, BASE_COLUMNS[:-1])
+        self._pending.append(run)
+        self._pending_rows += len(run["count"])
+        # Merging only once the runs outgrow the base bounds both the
+        # re-sorting of the base and the memory held in runs
+        if self._pending_rows >= len(self._base["count"]):
+            self._merge_pending()
+        self._levels = {}
+
+    def add_rows(self, store, rows: Optional[np.ndarray] = None):
+        """Fold store rows (default: all) into the cube."""
+        def col(name):
+            values = store.column(name)
+            return values if rows is None else values[rows]
+        self.add(col("lat"), col("lng"), col("year"), col("month"), col("iconic_taxon"), col("source"), col("species"))
+
+    def merge(self, other: "AggregateCube"):
+        """Add another cube's aggregates (same dictionary codes) into this one."""
+        self._pending.append(other.base)
+        self._pending_rows += len(other)
+        self._levels = {}
+
+    def recode(self, column: str, remap: np.ndarray):
+        """Rewrite a categorical column's codes; remap[-1] must be -1 (null)."""
+        self.base[column] = remap[self.base[column]].astype(np.int32)
+        self.base = _reduce(self.base, BASE_COLUMNS[:-1])
+        self._levels = {}
+
+    @classmethod
+    def from_store(cls, store, precisions: Sequence[int] = PRECISIONS) -> "AggregateCube":
+        cube = cls(categories=store.categories, precisions=precisions)
+        cube.add_rows(store)
+        return cube
+
+    # ---------- levels ----------
+
+    def _coarsen(self, table: Dict[str, np.ndarray], precision: int) -> Dict[str, np.ndarray]:
+        shift = 5 * (self.precision - precision)
+        return dict(table, cell=table["cell"] >> shift) if shift else table
+
+    def level(self, precision: int) -> Dict[str, np.ndarray]:
+        """Count table at a precision, species dropped (materialized on first use)."""
+        if precision not in self._levels:
+            if not 1 <= precision <= self.precision:
+                raise ValueError(f"precision must be 1-{self.precision}")
+            coarse = self._coarsen(self.base, precision)
+            table = _reduce(coarse, DIMENSIONS)
+            # Distinct species per row: rows of (dims, species), counted per dims
+            pairs = _reduce(coarse, DIMENSIONS + ("species",))
+            pairs["count"] = (pairs["species"] >= 0).astype(np.int64)
+            table["species"] = _reduce(pairs, DIMENSIONS)["count"]
+            self._levels[precision] = table
+        return self._levels[precision]
+
+    # ---------- persistence ----------
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for col, values in self.base.items():
+            np.save(os.path.join(directory, f"base.{col}.npy"), values)
+        for p in self.precisions:
+            for col, values in self.level(p).items():
+                np.save(os.path.join(directory, f"p{p}.{col}.npy"), values)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"precisions": list(self.precisions), "rows": len(self), "total": self.total}, f)
+
+    @classmethod
+    def load(cls, directory: str, categories: Optional[Dict] = None) -> Optional["AggregateCube"]:
+        """Open a saved cube with mmap, or None if the directory has none."""
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        def read(prefix, columns):
+            return {c: np.load(os.path.join(directory, f"{prefix}.{c}.npy"), mmap_mode="r") for c in columns}
+
+        cube = cls(read("base", BASE_COLUMNS), categories, meta["precisions"])
+        cube._levels = {p: read(f"p{p}", LEVEL_COLUMNS) for p in cube.precisions}
+        return cube
+
+    # ---------- queries ----------
+
+    def _codes(self, column: str, values: Iterable[str]) -> List[int]:
+        table = self.categories.get(column)
+        codes = []
+        for v in values:
+            code = table.find(v) if table is not None else -1
+            codes.append(code if code >= 0 else -2)
+        return codes
+
+    def _mask(self, table, precision, bbox=None, year_min=None, year_max=None, iconic_taxon=None, source=None):
+        mask = np.ones(len(table["count"]), dtype=bool)
+        if bbox:
+            # A cell counts as inside when its center is: cube answers are cell-resolution
+            min_lng, min_lat, max_lng, max_lat = bbox
+            lat, lng = geohash.decode_array(table["cell"], precision)
+            mask &= (lat >= min_lat) & (lat <= max_lat) & (lng >= min_lng) & (lng <= max_lng)
+        if year_min is not None:
+            mask &= table["year"] >= year_min
+        if year_max is not None:
+            mask &= (table["year"] <= year_max) & (table["year"] > 0)
+        for name, values in (("iconic_taxon", iconic_taxon), ("source", source)):
+            if values:
+                mask &= np.isin(table[name], self._codes(name, values))
+        return mask
+
+    def _label(self, column: str, value, precision: int):
+        if column == "cell":
+            return geohash.to_string(value, precision)
+        if column in CATEGORICAL:
+            # Nulls are "Other", as in ObservationStore.distribution
+            return self.categories[column][int(value)] if value >= 0 and column in self.categories else "Other"
+        return int(value)
+
+    def rollup(self, by: Sequence[str] = ("year",), measure: str = "count",
+               precision: Optional[int] = None, **filters) -> List[Dict]:
+        """
+        Aggregate over `by` (any of DIMENSIONS) for rows passing the
+        store.select-style filters. measure is "count" (observations) or
+        "species" (distinct species). Returns one dict per group.
+        """
+        by = tuple(by)
+        unknown = set(by) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown dimension(s): {', '.join(sorted(unknown))}")
+        if measure not in ("count", "species"):
+            raise ValueError("measure must be 'count' or 'species'")
+        precision = precision or self.precision
+        if not 1 <= precision <= self.precision:
+            raise ValueError(f"precision must be 1-{self.precision}")
+
+        if measure == "count":
+            table = self.level(precision) if precision in self.precisions else self._coarsen(self.base, precision)
+            table = {c: np.asarray(v)[self._mask(table, precision, **filters)] for c, v in table.items() if c != "species"}
+            table = _reduce(table, by) if by else {"count": np.array([table["count"].sum()])}
+        else:
+            table = self._coarsen(self.base, precision)
+            table = {c: np.asarray(v)[self._mask(table, precision, **filters)] for c, v in table.items()}
+            table = _reduce(table, by + ("species",))
+            table["count"] = (table["species"] >= 0).astype(np.int64)
+            table = _reduce(table, by) if by else {"count": np.array([table["count"].sum()])}
+
+        values = table["count"].tolist()
+        labels = [[self._label(c, v, precision) for v in table[c].tolist()] for c in by]
+        return [dict(zip(by, group), **{measure: value}) for *group, value in zip(*labels, values)]
+
+    def histogram(self, column: str, measure: str = "count", **filters) -> Dict:
+        """{value: count} over one dimension, like ObservationStore.distribution (unknown dates dropped)."""
+        rows = self.rollup((column,), measure, **filters)
+        return {row[column]: row[measure] for row in rows if row[column] != 0 or column not in ("year", "month")}
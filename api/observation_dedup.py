@@ -0,0 +1,388 @@
+"""
+Observation Dedup
+=================
+Cross-source duplicate removal for collector output.
+
+iNaturalist research-grade records are mirrored in GBIF, and museum
+specimens show up in both iDigBio and GBIF, so concatenating collectors
+double-counts them. The old per-collector dedup keys (exact id, or exact
+coordinates + date) never match across sources.
+
+Records are blocked by year + normalized scientific name and spilled to
+on-disk partitions, so memory is bounded by the largest partition rather
+than the input. Within a block, candidates come from the same or a
+neighbouring geohash cell with a compatible date, and each pair is
+scored:
+
+    shared id (e.g. "gbif-1" / "gbif_1", iNat id in a GBIF catalogNumber)   1.0
+    same institution + catalog number                                       1.0
+    same source, different ids                                              0.0
+    otherwise  DISTANCE_WEIGHT * (1 - d / MAX_DISTANCE_M) + date agreement
+
+Pairs at or above MATCH_THRESHOLD are merged, except that a fuzzy match
+never chains two distinct records of the same source into one cluster.
+The most complete record of each cluster is kept and gaps in it are
+filled from the others.
+
+    engine = DedupEngine()
+    unique = list(engine.run(features))
+    print(engine.stats)
+"""
+
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import tempfile
+import zlib
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import geohash
+
+CELL_PRECISION = 6          # ~1.2 x 0.6 km cells
+DEFAULT_PARTITIONS = 256
+MAX_DISTANCE_M = 250.0
+DISTANCE_WEIGHT = 0.6
+DATE_WEIGHT = 0.4           # full dates agree; half for a compatible partial date
+MATCH_THRESHOLD = 0.7
+
+# Canonical id prefixes. Several collectors store the same GBIF record as
+# "gbif-<key>" or "gbif_<key>", and iNat ids appear bare or as "inat-<id>".
+_ID_PREFIXES = {"gbif": "gbif", "inat": "inaturalist", "idigbio": "idigbio"}
+_SOURCE_FAMILY = {"gbif_specimen": "gbif", "inat": "inaturalist"}
+
+# Kept record preference when completeness ties
+SOURCE_PRIORITY = ["inaturalist", "gbif", "idigbio"]
+
+_ID_RE = re.compile(r"^([a-z]+)[-_](.+)$")
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z-]*")
+
+
+def _props(record: Dict) -> Dict:
+    if record.get("type") == "Feature":
+        return record.get("properties") or {}
+    return record
+
+
+def _coords(record: Dict):
+    if record.get("type") == "Feature":
+        coords = (record.get("geometry") or {}).get("coordinates") or [None, None]
+        lng, lat = coords[0], coords[1]
+    else:
+        lat, lng = record.get("lat"), record.get("lng")
+    try:
+        return float(lat), float(lng)
+    except (TypeError, ValueError):
+        return None
+
+
+def source_family(props: Dict) -> str:
+    source = str(props.get("source") or "").lower()
+    return _SOURCE_FAMILY.get(source, source)
+
+
+def normalize_name(name) -> Optional[str]:
+    """
+    "Apis mellifera Linnaeus, 1758" -> "apis mellifera".
+    Authorship, ranks and hybrid markers are dropped; genus-only names
+    stay one word.
+    """
+    if not name:
+        return None
+    words = [w for w in _WORD_RE.findall(str(name)) if w.lower() not in ("x", "var", "subsp", "ssp", "sp", "spp")]
+    if not words:
+        return None
+    parts = [words[0].lower()]
+    # Epithets are lowercase; a capitalized second word is an author
+    if len(words) > 1 and words[1].islower():
+        parts.append(words[1])
+    return " ".join(parts)
+
+
+def date_key(props: Dict) -> Optional[str]:
+    """Best available date as "YYYY-MM-DD", "YYYY-MM" or "YYYY"."""
+    observed = str(props.get("observed_on") or "")[:10]
+    parts = [p for p in observed.split("-") if p.isdigit()] if observed else []
+    if not parts and props.get("year"):
+        parts = [str(props.get(k)) for k in ("year", "month", "day") if props.get(k)]
+    try:
+        nums = [int(p) for p in parts[:3]]
+    except ValueError:
+        return None
+    if not nums or not 1000 <= nums[0] <= 9999:
+        return None
+    return "-".join([f"{nums[0]:04d}"] + [f"{n:02d}" for n in nums[1:]])
+
+
+def canonical_ids(props: Dict) -> List[str]:
+    """Source-qualified ids a record is known by."""
+    ids = []
+    raw = props.get("id")
+    if raw not in (None, ""):
+        m = _ID_RE.match(str(raw))
+        if m and m.group(1) in _ID_PREFIXES:
+            ids.append(f"{_ID_PREFIXES[m.group(1)]}:{m.group(2)}")
+        else:
+            ids.append(f"{source_family(props)}:{raw}")
+    # GBIF mirrors of iNat observations carry the iNat id as catalog number
+    catalog = props.get("catalog_number")
+    if catalog and str(props.get("institution") or "").lower() == "inaturalist":
+        ids.append(f"inaturalist:{catalog}")
+    return ids
+
+
+def _specimen_key(props: Dict) -> Optional[str]:
+    institution, catalog = props.get("institution"), props.get("catalog_number")
+    if institution and catalog:
+        return f"{str(institution).lower()}:{str(catalog).lower()}"
+    return None
+
+
+def _distance_m(lat1, lng1, lat2, lng2) -> float:
+    """Equirectangular distance - exact enough below a kilometre."""
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return 6371000.0 * math.hypot(x, y)
+
+
+@lru_cache(maxsize=1 << 16)
+def _cells_around(cell: str):
+    return (cell, *geohash.neighbors(cell))
+
+
+def _coarser_dates(date: str):
+    """The date itself plus its month and year prefixes."""
+    keys = [date]
+    if len(date) >= 7:
+        keys.append(date[:7])
+    if len(date) >= 10:
+        keys.append(date[:4])
+    return keys
+
+
+class _Candidate:
+    __slots__ = ("lat", "lng", "cell", "date", "ids", "family", "specimen", "record")
+
+    def __init__(self, lat, lng, cell, date, ids, family, specimen, record):
+        self.lat, self.lng, self.cell, self.date = lat, lng, cell, date
+        self.ids, self.family, self.specimen, self.record = ids, family, specimen, record
+
+
+def _identical(a: _Candidate, b: _Candidate) -> bool:
+    """Same record by id or by institution + catalog number."""
+    return bool(set(a.ids) & set(b.ids)) or bool(a.specimen and a.specimen == b.specimen)
+
+
+def score(a: _Candidate, b: _Candidate, max_distance_m: float = MAX_DISTANCE_M) -> float:
+    """Likelihood in [0, 1] that two blocked records describe one observation."""
+    if _identical(a, b):
+        return 1.0
+    if a.specimen and b.specimen:
+        return 0.0
+    if a.family == b.family:
+        return 0.0
+    d = _distance_m(a.lat, a.lng, b.lat, b.lng)
+    if d >= max_distance_m:
+        return 0.0
+    s = DISTANCE_WEIGHT * (1 - d / max_distance_m)
+    if a.date == b.date and len(a.date) == 10:
+        s += DATE_WEIGHT
+    elif a.date.startswith(b.date) or b.date.startswith(a.date):
+        s += DATE_WEIGHT / 2
+    return s
+
+
+# ============ ENGINE ============
+
+class DedupEngine:
+    """
+    Two-pass, disk-partitioned dedup.
+
+    Pass 1 streams records into `partitions` JSONL files by block; pass 2
+    loads one partition at a time, clusters duplicates and yields the
+    survivors. Partition files live in `work_dir` (a temp dir by default)
+    and are removed when run() finishes.
+    """
+
+    def __init__(self, work_dir: Optional[str] = None, partitions: int = DEFAULT_PARTITIONS,
+                 threshold: float = MATCH_THRESHOLD, max_distance_m: float = MAX_DISTANCE_M):
+        self.work_dir = work_dir
+        self.partitions = partitions
+        self.threshold = threshold
+        self.max_distance_m = max_distance_m
+        self.stats = {}
+
+    def run(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield deduplicated records (same shape as the input)."""
+        self.stats = {"input": 0, "output": 0, "unblocked": 0, "duplicates": 0, "pairs": {}}
+        work = tempfile.mkdtemp(prefix="dedup-", dir=self.work_dir)
+        try:
+            self._partition(records, work)
+            for i in range(self.partitions):
+                path = os.path.join(work, f"{i:04d}.jsonl")
+                if os.path.exists(path):
+                    yield from self._resolve(path)
+                    os.remove(path)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+    def _partition(self, records: Iterable[Dict], work: str):
+        files = {}
+        try:
+            for record in records:
+                self.stats["input"] += 1
+                props = _props(record)
+                coords = _coords(record)
+                date = date_key(props)
+                name = normalize_name(props.get("scientific_name"))
+                ids = canonical_ids(props)
+                if coords and date and name:
+                    block = f"{date[:4]}|{name}"
+                    row = [block, coords[0], coords[1], date, record]
+                else:
+                    # Unblockable: only exact id matches are possible
+                    self.stats["unblocked"] += 1
+                    block = f"id|{ids[0] if ids else ''}"
+                    row = [block, None, None, None, record]
+                part = zlib.crc32(block.encode("utf-8")) % self.partitions
+                f = files.get(part)
+                if f is None:
+                    f = files[part] = open(os.path.join(work, f"{part:04d}.jsonl"), "w")
+                f.write(json.dumps(row))
+                f.write("\n")
+        finally:
+            for f in files.values():
+                f.close()
+
+    def _resolve(self, path: str) -> Iterator[Dict]:
+        blocks: Dict[str, List] = {}
+        with open(path) as f:
+            for line in f:
+                block, lat, lng, date, record = json.loads(line)
+                blocks.setdefault(block, []).append((lat, lng, date, record))
+        for block, rows in blocks.items():
+            if block.startswith("id|"):
+                yield from self._exact(block, rows)
+            else:
+                yield from self._cluster(rows)
+
+    def _exact(self, block: str, rows: List) -> Iterator[Dict]:
+        if block == "id|" or len(rows) == 1:
+            for row in rows:
+                self.stats["output"] += 1
+                yield row[3]
+            return
+        self.stats["duplicates"] += len(rows) - 1
+        self.stats["output"] += 1
+        yield _merge([row[3] for row in rows])
+
+    def _cluster(self, rows: List) -> Iterator[Dict]:
+        cands = []
+        for lat, lng, date, record in rows:
+            props = _props(record)
+            cands.append(_Candidate(
+                lat, lng, geohash.encode(lat, lng, CELL_PRECISION), date,
+                canonical_ids(props), source_family(props), _specimen_key(props), record,
+            ))
+
+        parent = list(range(len(cands)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        if len(cands) > 1:
+            families = [{c.family} for c in cands]
+            index: Dict[tuple, List[int]] = {}
+            for i, c in enumerate(cands):
+                index.setdefault((c.cell, c.date), []).append(i)
+            for i, a in enumerate(cands):
+                for cell in _cells_around(a.cell):
+                    for d in _coarser_dates(a.date):
+                        for j in index.get((cell, d), ()):
+                            # Same-date pairs are seen from both sides
+                            if (d == a.date and j >= i) or find(i) == find(j):
+                                continue
+                            b = cands[j]
+                            s = score(a, b, self.max_distance_m)
+                            if s < self.threshold:
+                                continue
+                            ri, rj = find(i), find(j)
+                            # A fuzzy match must not chain two distinct
+                            # records of one source into a cluster
+                            if families[ri] & families[rj] and not _identical(a, b):
+                                continue
+                            parent[rj] = ri
+                            families[ri] |= families[rj]
+                            pair = "+".join(sorted((a.family, b.family)))
+                            self.stats["pairs"][pair] = self.stats["pairs"].get(pair, 0) + 1
+
+        clusters: Dict[int, List[Dict]] = {}
+        for i, c in enumerate(cands):
+            clusters.setdefault(find(i), []).append(c.record)
+        for members in clusters.values():
+            self.stats["output"] += 1
+            if len(members) == 1:
+                yield members[0]
+            else:
+                self.stats["duplicates"] += len(members) - 1
+                yield _merge(members)
+
+
+def _completeness(record: Dict):
+    props = _props(record)
+    filled = sum(1 for v in props.values() if v not in (None, "", []))
+    family = source_family(props)
+    rank = SOURCE_PRIORITY.index(family) if family in SOURCE_PRIORITY else len(SOURCE_PRIORITY)
+    return filled, -rank
+
+
+def _merge(records: List[Dict]) -> Dict:
+    """Keep the most complete record, filling its gaps from the others."""
+    records = sorted(records, key=_completeness, reverse=True)
+    keep = json.loads(json.dumps(records[0]))
+    props = _props(keep)
+    for other in records[1:]:
+        for k, v in _props(other).items():
+            if props.get(k) in (None, "") and v not in (None, ""):
+                props[k] = v
+    props["duplicates"] = [_props(r).get("id") for r in records[1:]]
+    return keep
+
+
+def deduplicate(records: Iterable[Dict], **kwargs) -> List[Dict]:
+    """Deduplicate in one call; kwargs go to DedupEngine."""
+    engine = DedupEngine(**kwargs)
+    unique = list(engine.run(records))
+    print(f"Dedup: {engine.stats['input']:,} -> {engine.stats['output']:,} "
+          f"({engine.stats['duplicates']:,} duplicates, pairs {engine.stats['pairs']})")
+    return unique
+
+
+if __name__ == "__main__":
+    # Merge collector outputs into one deduplicated store:
+    #   python observation_dedup.py OUT_STORE cache1.json cache2.json ...
+    from observation_store import ObservationStoreWriter
+
+    if len(sys.argv) < 3:
+        print("usage: observation_dedup.py OUT_STORE GEOJSON [GEOJSON ...]")
+        sys.exit(1)
+
+    def features():
+        for path in sys.argv[2:]:
+            with open(path) as f:
+                data = json.load(f)
+            print(f"{path}: {len(data.get('features', [])):,} features")
+            yield from data.get("features", [])
+
+    engine = DedupEngine()
+    writer = ObservationStoreWriter(sys.argv[1])
+    for feat in engine.run(features()):
+        writer.append_feature(feat)
+    writer.close(stats={"dedup": engine.stats})
+    print(json.dumps(engine.stats, indent=2))
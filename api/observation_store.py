@@ -0,0 +1,564 @@
+"""
+Observation Store
+=================
+Columnar on-disk store for cached wildlife observations.
+
+Replaces the monolithic GeoJSON caches written by the collectors. Each
+build is a directory of flat column files that are opened with mmap, so
+serving a request never has to parse the whole cache and every worker
+process shares the same page-cache copy instead of holding its own:
+
+    meta.json                row count, schema, build stats
+    <col>.npy                numeric columns (lat, lng, year, month, day)
+    <col>.npy                int32 codes for categorical columns (-1 = null)
+    <col>.dict.offsets.npy   categorical columns: sorted string table
+    <col>.dict.bin
+    <col>.offsets.npy        text columns: int64 offsets into <col>.bin
+    <col>.bin                text columns: concatenated UTF-8 bytes
+    cube/                    aggregate cube (see observation_cube.py)
+    sketch/                  species richness sketches (see richness_sketch.py)
+    tiles/, phenology/,      derived artifacts written by build_derived()
+    effort/                  before the build is published
+
+A store root holds several builds plus a CURRENT file naming the live
+one. Writers publish by replacing CURRENT atomically; readers use
+StoreWatcher to pick up a new build without restarting:
+
+    <root>/CURRENT
+    <root>/build-20240601-120000-4242-0001/
+"""
+
+import bisect
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+from observation_cube import CHUNK_ROWS, CUBE_DIR, AggregateCube
+from richness_sketch import SKETCH_DIR, RichnessSketches, hash_names
+
+FORMAT_VERSION = 2
+
+CURRENT = "CURRENT"
+BUILD_PREFIX = "build-"
+KEEP_BUILDS = 2            # live build plus the one before it
+CHECK_INTERVAL = 5.0       # seconds between StoreWatcher checks of CURRENT
+
+_build_seq = itertools.count(1)  # tells apart builds closed in the same second
+
+# column -> kind. Numeric kinds are numpy dtypes; 0 means "unknown" for
+# the integer date parts.
+SCHEMA = {
+    "id": "text",
+    "lat": "float32",
+    "lng": "float32",
+    "year": "int16",
+    "month": "int8",
+    "day": "int8",
+    "species": "category",
+    "scientific_name": "category",
+    "iconic_taxon": "category",
+    "source": "category",
+    "observer": "category",
+    "photo_url": "text",
+}
+
+# array.array typecodes used while buffering numeric columns
+_TYPECODES = {"float32": "f", "int16": "h", "int8": "b"}
+
+# Collectors disagree on a few property names
+_ALIASES = {
+    "iconic_taxon": ("iconic_taxon", "taxon"),
+    "observer": ("observer", "user_id", "recorded_by", "user_login"),
+}
+
+
+def _as_int(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _as_str(value) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    return str(value)
+
+
+def record_from_feature(feature: Dict) -> Dict:
+    """Flatten a GeoJSON feature into a store record."""
+    props = dict(feature.get("properties") or {})
+    coords = (feature.get("geometry") or {}).get("coordinates") or [None, None]
+    props.setdefault("lng", coords[0])
+    props.setdefault("lat", coords[1])
+    return props
+
+
+def _date_parts(record: Dict):
+    year = _as_int(record.get("year"))
+    month = _as_int(record.get("month"))
+    day = _as_int(record.get("day"))
+    observed = record.get("observed_on") or ""
+    if observed and not (year and month and day):
+        parts = str(observed)[:10].split("-")
+        year = year or (_as_int(parts[0]) if len(parts) > 0 else 0)
+        month = month or (_as_int(parts[1]) if len(parts) > 1 else 0)
+        day = day or (_as_int(parts[2]) if len(parts) > 2 else 0)
+    return year, month, day
+
+
+# ============ STRING TABLES ============
+
+def _write_strings(directory: str, name: str, blob, offsets):
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), np.frombuffer(offsets, dtype=np.int64))
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        f.write(blob)
+
+
+def _open_strings(directory: str, name: str):
+    offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r")
+    blob_path = os.path.join(directory, f"{name}.bin")
+    blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if os.path.getsize(blob_path) else np.zeros(0, np.uint8)
+    return offsets, blob
+
+
+class StringTable:
+    """
+    Read-only list of strings backed by mmap'd offsets + UTF-8 blob.
+
+    Category tables are written sorted, so lookups are a binary search
+    over the mapped data rather than a per-process dict.
+    """
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def find(self, value: str) -> int:
+        """Index of value, or -1 if absent."""
+        i = bisect.bisect_left(self, value)
+        return i if i < len(self) and self[i] == value else -1
+
+
+# ============ WRITER ============
+
+class ObservationStoreWriter:
+    """
+    Buffer records column by column and write a store directory.
+
+    Buffers are compact (array.array / bytearray), so even multi-million
+    row builds stay far below the size of the equivalent list of dicts.
+    close() writes a new build directory under the store root and then
+    publishes it, so readers never see a half-written build. Artifacts
+    derived from the build (see build_derived) are written by a `derive`
+    callback before publishing, for the same reason.
+    """
+
+    def __init__(self, path: str):
+        self.path = path  # store root
+        self.count = 0
+        self._numeric = {c: array(_TYPECODES[k]) for c, k in SCHEMA.items() if k in _TYPECODES}
+        self._codes = {c: array("i") for c, k in SCHEMA.items() if k == "category"}
+        self._lookup = {c: {} for c in self._codes}
+        self._text = {c: (bytearray(), array("q", [0])) for c, k in SCHEMA.items() if k == "text"}
+        self.cube = AggregateCube()
+        self._folded = 0  # rows already folded into the cube
+
+    def _fold(self):
+        """Fold rows appended since the last fold into the cube (codes are renumbered in close())."""
+        if self._folded == self.count:
+            return
+        def tail(buf, dtype):
+            return np.frombuffer(buf, dtype=dtype)[self._folded:].copy()
+        num = {c: tail(self._numeric[c], SCHEMA[c]) for c in ("lat", "lng", "year", "month", "day")}
+        codes = {c: tail(self._codes[c], np.int32) for c in ("iconic_taxon", "source", "species")}
+        self.cube.add(num["lat"], num["lng"], num["year"], num["month"],
+                      codes["iconic_taxon"], codes["source"], codes["species"])
+        self._folded = self.count
+
+    def append(self, record: Dict) -> bool:
+        """Add one flat observation record. Returns False if it has no coordinates."""
+        try:
+            lat = float(record.get("lat"))
+            lng = float(record.get("lng"))
+        except (TypeError, ValueError):
+            return False
+        if not lat or not lng:
+            return False
+
+        year, month, day = _date_parts(record)
+        self._numeric["lat"].append(lat)
+        self._numeric["lng"].append(lng)
+        self._numeric["year"].append(year if 0 < year < 32768 else 0)
+        self._numeric["month"].append(month if 0 < month <= 12 else 0)
+        self._numeric["day"].append(day if 0 < day <= 31 else 0)
+
+        for col, codes in self._codes.items():
+            value = None
+            for key in _ALIASES.get(col, (col,)):
+                value = _as_str(record.get(key))
+                if value is not None:
+                    break
+            if value is None:
+                codes.append(-1)
+                continue
+            lookup = self._lookup[col]
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(lookup)
+            codes.append(code)
+
+        for col, (blob, offsets) in self._text.items():
+            value = _as_str(record.get(col))
+            if value is not None:
+                blob.extend(value.encode("utf-8"))
+            offsets.append(len(blob))
+
+        self.count += 1
+        if self.count - self._folded >= CHUNK_ROWS:
+            self._fold()
+        return True
+
+    def append_feature(self, feature: Dict) -> bool:
+        """Add one GeoJSON feature."""
+        return self.append(record_from_feature(feature))
+
+    def extend(self, records: Iterable[Dict]) -> int:
+        """Add many records (flat dicts or GeoJSON features)."""
+        added = 0
+        for r in records:
+            if r.get("type") == "Feature":
+                added += self.append_feature(r)
+            else:
+                added += self.append(r)
+        return added
+
+    def close(self, stats: Optional[Dict] = None, derive: Optional[Callable] = None) -> str:
+        """
+        Write a new build, publish it and return the build path.
+        derive(store) runs on the finished build while it is still
+        unpublished; whatever it writes under store.path ships with it.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        name, tmp = _new_build(self.path)
+
+        for col, values in self._numeric.items():
+            np.save(os.path.join(tmp, f"{col}.npy"), np.frombuffer(values, dtype=SCHEMA[col]))
+        self._fold()
+        for col, codes in self._codes.items():
+            # Renumber codes so the string table is sorted
+            lookup = self._lookup[col]
+            values = sorted(lookup)
+            remap = np.empty(len(values) + 1, dtype=np.int32)
+            remap[[lookup[v] for v in values]] = np.arange(len(values), dtype=np.int32)
+            remap[-1] = -1  # null code stays null
+            np.save(os.path.join(tmp, f"{col}.npy"), remap[np.frombuffer(codes, dtype=np.int32)])
+            if col in self.cube.base:
+                self.cube.recode(col, remap)
+            if col == "species":
+                species_names = values
+
+            blob, offsets = bytearray(), array("q", [0])
+            for v in values:
+                blob.extend(v.encode("utf-8"))
+                offsets.append(len(blob))
+            _write_strings(tmp, f"{col}.dict", blob, offsets)
+        for col, (blob, offsets) in self._text.items():
+            _write_strings(tmp, col, blob, offsets)
+        self.cube.save(os.path.join(tmp, CUBE_DIR))
+        RichnessSketches.from_cube(self.cube, hash_names(species_names)).save(os.path.join(tmp, SKETCH_DIR))
+
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "rows": self.count,
+            "schema": SCHEMA,
+            "stats": stats or {},
+        }
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        if derive is not None:
+            derive(ObservationStore(tmp))
+
+        build = os.path.join(self.path, name)
+        os.replace(tmp, build)
+        publish(self.path, name)
+        return build
+
+
+def _new_build(root: str):
+    """(name, tmp dir) of a build no other build or writer uses; the tmp dir is created."""
+    stamp = f"{BUILD_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    while True:
+        name = f"{stamp}-{next(_build_seq):04d}"
+        tmp = os.path.join(root, f".tmp-{name}")
+        if not os.path.exists(os.path.join(root, name)) and not os.path.exists(tmp):
+            os.makedirs(tmp)
+            return name, tmp
+
+
+def write_features(features: Iterable[Dict], path: str, stats: Optional[Dict] = None,
+                   derive: Optional[Callable] = None) -> int:
+    """Write GeoJSON features (or flat records) to a store. Returns rows written."""
+    writer = ObservationStoreWriter(path)
+    writer.extend(features)
+    writer.close(stats, derive)
+    return writer.count
+
+
+def build_derived(store):
+    """
+    Tile pyramid, phenology curves and effort tables of a build. Pass as
+    `derive` so they exist before the build goes live; the servers only
+    compute them in process for builds that predate them.
+    """
+    from observation_tiles import build_tile_pyramid
+    from observer_effort import build_effort
+    from phenology import build_phenology
+
+    build_tile_pyramid(store)
+    build_phenology(store)
+    build_effort(store)
+
+
+def publish(root: str, name: str):
+    """Point CURRENT at a build atomically and prune old builds."""
+    tmp = os.path.join(root, f".{CURRENT}.tmp-{os.getpid()}")
+    with open(tmp, "w") as f:
+        f.write(name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, CURRENT))
+
+    # Workers that have not reopened yet may still be attaching to the
+    # previous build, so keep it around.
+    builds = sorted(d for d in os.listdir(root) if d.startswith(BUILD_PREFIX) and d != name)
+    live = os.path.basename(current_build(root) or "")
+    for old in builds[:max(0, len(builds) - (KEEP_BUILDS - 1))]:
+        if old == live:
+            continue  # another writer published it since
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+def current_build(root: str) -> Optional[str]:
+    """Path of the published build under root (or root itself if it is a build)."""
+    try:
+        with open(os.path.join(root, CURRENT)) as f:
+            build = os.path.join(root, f.read().strip())
+    except FileNotFoundError:
+        build = root
+    return build if os.path.exists(os.path.join(build, "meta.json")) else None
+
+
+# ============ READER ============
+
+class ObservationStore:
+    """Read-only, memory-mapped view of a store directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported store format: {self.meta.get('format_version')}")
+
+        self.schema = self.meta["schema"]
+        self.categories: Dict[str, StringTable] = {}
+        self._columns = {}
+        self._text = {}
+        self._cube = None
+        self._sketches = None
+        for col, kind in self.schema.items():
+            if kind == "text":
+                self._text[col] = _open_strings(path, col)
+                continue
+            self._columns[col] = np.load(os.path.join(path, f"{col}.npy"), mmap_mode="r")
+            if kind == "category":
+                self.categories[col] = StringTable(*_open_strings(path, f"{col}.dict"))
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    @property
+    def stats(self) -> Dict:
+        return self.meta.get("stats", {})
+
+    def column(self, name: str) -> np.ndarray:
+        """Raw column array (codes for categorical columns)."""
+        return self._columns[name]
+
+    def code(self, name: str, value: str) -> int:
+        """Dictionary code for a categorical value, -2 if absent."""
+        code = self.categories[name].find(value)
+        return code if code >= 0 else -2
+
+    def cube(self) -> AggregateCube:
+        """Aggregate cube of this build (built in memory for builds written before cubes existed)."""
+        if self._cube is None:
+            self._cube = AggregateCube.load(os.path.join(self.path, CUBE_DIR), self.categories)
+            if self._cube is None:
+                self._cube = AggregateCube.from_store(self)
+        return self._cube
+
+    def sketches(self) -> RichnessSketches:
+        """Species richness sketches of this build (built from the cube if the build has none)."""
+        if self._sketches is None:
+            self._sketches = RichnessSketches.load(os.path.join(self.path, SKETCH_DIR))
+            if self._sketches is None:
+                self._sketches = RichnessSketches.from_cube(self.cube(), hash_names(list(self.categories["species"])))
+        return self._sketches
+
+    def value(self, name: str, row: int) -> Optional[str]:
+        """Decoded value of a categorical or text column for one row."""
+        if name in self._text:
+            offsets, blob = self._text[name]
+            start, end = int(offsets[row]), int(offsets[row + 1])
+            return bytes(blob[start:end]).decode("utf-8") if end > start else None
+        code = int(self._columns[name][row])
+        return self.categories[name][code] if code >= 0 else None
+
+    # ---------- filtering ----------
+
+    def select(
+        self,
+        bbox=None,
+        year_min: Optional[int] = None,
+        year_max: Optional[int] = None,
+        iconic_taxon: Optional[Iterable[str]] = None,
+        source: Optional[Iterable[str]] = None,
+    ) -> np.ndarray:
+        """
+        Row indices matching the filters.
+
+        bbox is (min_lng, min_lat, max_lng, max_lat). Categorical filters
+        accept any iterable of values.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if bbox:
+            min_lng, min_lat, max_lng, max_lat = bbox
+            lat, lng = self._columns["lat"], self._columns["lng"]
+            mask &= (lat >= min_lat) & (lat <= max_lat) & (lng >= min_lng) & (lng <= max_lng)
+        if year_min is not None:
+            mask &= self._columns["year"] >= year_min
+        if year_max is not None:
+            year = self._columns["year"]
+            mask &= (year <= year_max) & (year > 0)
+        for name, values in (("iconic_taxon", iconic_taxon), ("source", source)):
+            if values:
+                codes = [self.code(name, v) for v in values]
+                mask &= np.isin(self._columns[name], codes)
+        return np.flatnonzero(mask)
+
+    def distribution(self, name: str, rows: Optional[np.ndarray] = None) -> Dict:
+        """Value counts for a column, e.g. year_distribution."""
+        col = self._columns[name]
+        values = col if rows is None else col[rows]
+        if self.schema[name] == "category":
+            counts = np.bincount(values[values >= 0], minlength=len(self.categories[name]))
+            labels = self.categories[name]
+            result = {labels[i]: int(c) for i, c in enumerate(counts) if c}
+            missing = int((values < 0).sum())
+            if missing:
+                result["Other"] = result.get("Other", 0) + missing
+            return dict(sorted(result.items(), key=lambda x: -x[1]))
+        values = values[values > 0].astype(np.int64)
+        counts = np.bincount(values)
+        return {int(v): int(counts[v]) for v in np.flatnonzero(counts)}
+
+    # ---------- materialization ----------
+
+    def record(self, row: int) -> Dict:
+        """Decode one row back into a flat observation record."""
+        year = int(self._columns["year"][row]) or None
+        month = int(self._columns["month"][row]) or None
+        day = int(self._columns["day"][row]) or None
+        observed_on = None
+        if year:
+            observed_on = f"{year}"
+            if month:
+                observed_on += f"-{month:02d}"
+                if day:
+                    observed_on += f"-{day:02d}"
+        return {
+            "id": self.value("id", row),
+            "species": self.value("species", row),
+            "scientific_name": self.value("scientific_name", row),
+            "iconic_taxon": self.value("iconic_taxon", row),
+            "lat": round(float(self._columns["lat"][row]), 5),
+            "lng": round(float(self._columns["lng"][row]), 5),
+            "observed_on": observed_on,
+            "year": year,
+            "month": month,
+            "day": day,
+            "photo_url": self.value("photo_url", row),
+            "source": self.value("source", row),
+        }
+
+    def iter_features(self, rows: Optional[Iterable[int]] = None) -> Iterator[Dict]:
+        """Yield GeoJSON features for the given rows (default: all)."""
+        if rows is None:
+            rows = range(len(self))
+        for row in rows:
+            rec = self.record(int(row))
+            yield {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [rec["lng"], rec["lat"]]},
+                "properties": rec,
+            }
+
+
+def open_store(path: str) -> Optional[ObservationStore]:
+    """Open the published build of a store root, or None if it has not been built yet."""
+    build = current_build(path)
+    return ObservationStore(build) if build else None
+
+
+class StoreWatcher:
+    """
+    Keep the latest published build of a store root open.
+
+    get() re-reads CURRENT at most every `check_interval` seconds and
+    opens the new build when a collector has published one. Requests
+    already holding the old store keep using it until they finish.
+    """
+
+    def __init__(self, root: str, check_interval: float = CHECK_INTERVAL):
+        self.root = root
+        self.check_interval = check_interval
+        self._store: Optional[ObservationStore] = None
+        self._build = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[ObservationStore]:
+        now = time.monotonic()
+        if self._store is not None and now - self._checked < self.check_interval:
+            return self._store
+        with self._lock:
+            self._checked = now
+            build = current_build(self.root)
+            if build != self._build:
+                self._store = ObservationStore(build) if build else None
+                self._build = build
+            return self._store
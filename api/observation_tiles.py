@@ -0,0 +1,166 @@
+"""
+Observation Tiles
+=================
+Pre-clustered, quantized map tiles cut from the observation store.
+
+Tiles use the standard XYZ Web Mercator scheme. Coordinates inside a tile
+are integers in [0, EXTENT). Below POINT_ZOOM observations are merged into
+clusters on a CLUSTER_GRID x CLUSTER_GRID grid per tile; from POINT_ZOOM
+up, and at any zoom when a tile holds at most SPARSE_TILE_POINTS
+observations, individual points are sent instead.
+
+    {"z": 9, "x": 98, "y": 193, "extent": 4096, "total": 5120,
+     "taxa": ["Aves", "Insecta", ...],
+     "clusters": [[qx, qy, count, taxon_index], ...],
+     "points": [[qx, qy, id, species, year, taxon_index], ...]}
+
+Unfiltered tiles up to PYRAMID_MAX_ZOOM are written as gzip files when
+the cache is built. Filtered or deeper tiles are rendered on demand and
+kept in an LRU.
+"""
+
+import gzip
+import json
+import math
+import os
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+EXTENT = 4096
+CLUSTER_GRID = 64              # clusters per tile side
+POINT_ZOOM = 13                # zoom at which raw points are sent
+MAX_POINTS_PER_TILE = 1500     # above this a tile is clustered at any zoom
+SPARSE_TILE_POINTS = 250       # at or below this a tile sends points at any zoom
+PYRAMID_MIN_ZOOM = 4
+PYRAMID_MAX_ZOOM = 12
+TILE_CACHE_SIZE = 2048
+
+
+# ============ TILE MATH ============
+
+def tile_bbox(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(min_lng, min_lat, max_lng, max_lat) covered by a tile."""
+    n = 2 ** z
+
+    def lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def world_coords(lng: np.ndarray, lat: np.ndarray, z: int):
+    """Fractional tile coordinates (x, y) at zoom z."""
+    n = 2 ** z
+    lat_rad = np.radians(np.clip(lat.astype(np.float64), -85.0511, 85.0511))
+    wx = (lng.astype(np.float64) + 180.0) / 360.0 * n
+    wy = (1.0 - np.arcsinh(np.tan(lat_rad)) / math.pi) / 2.0 * n
+    return wx, wy
+
+
+# ============ RENDERING ============
+
+def _render(store, rows: np.ndarray, z: int, x: int, y: int) -> Dict:
+    """Build the tile dict for the given store rows (all inside the tile)."""
+    taxa = list(store.categories["iconic_taxon"])
+    tile = {"z": z, "x": x, "y": y, "extent": EXTENT, "total": int(len(rows)), "taxa": taxa}
+    if not len(rows):
+        tile["clusters"] = []
+        return tile
+
+    wx, wy = world_coords(store.column("lng")[rows], store.column("lat")[rows], z)
+    qx = np.clip(((wx - x) * EXTENT).astype(np.int32), 0, EXTENT - 1)
+    qy = np.clip(((wy - y) * EXTENT).astype(np.int32), 0, EXTENT - 1)
+    taxon = store.column("iconic_taxon")[rows]
+
+    point_limit = MAX_POINTS_PER_TILE if z >= POINT_ZOOM else SPARSE_TILE_POINTS
+    if len(rows) <= point_limit:
+        years = store.column("year")[rows]
+        tile["points"] = [
+            [int(qx[i]), int(qy[i]), store.value("id", int(r)), store.value("species", int(r)),
+             int(years[i]) or None, int(taxon[i])]
+            for i, r in enumerate(rows)
+        ]
+        return tile
+
+    cell_size = EXTENT // CLUSTER_GRID
+    key = (qy // cell_size) * CLUSTER_GRID + (qx // cell_size)
+    _, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+    cx = np.bincount(inverse, weights=qx) / counts
+    cy = np.bincount(inverse, weights=qy) / counts
+
+    # Dominant taxon per cluster; -1 (unknown) goes in the last slot
+    n_taxa = len(taxa) + 1
+    taxon_slot = np.where(taxon < 0, n_taxa - 1, taxon)
+    by_taxon = np.bincount(inverse * n_taxa + taxon_slot, minlength=len(counts) * n_taxa)
+    dominant = by_taxon.reshape(len(counts), n_taxa).argmax(axis=1)
+    dominant = np.where(dominant == n_taxa - 1, -1, dominant)
+
+    tile["clusters"] = [
+        [int(round(cx[i])), int(round(cy[i])), int(counts[i]), int(dominant[i])]
+        for i in range(len(counts))
+    ]
+    return tile
+
+
+def encode_tile(tile: Dict) -> bytes:
+    """Gzipped compact JSON."""
+    return gzip.compress(json.dumps(tile, separators=(",", ":")).encode("utf-8"), compresslevel=6)
+
+
+def build_tile_pyramid(store, out_dir: Optional[str] = None,
+                       min_zoom: int = PYRAMID_MIN_ZOOM, max_zoom: int = PYRAMID_MAX_ZOOM) -> int:
+    """
+    Write unfiltered tiles for every non-empty tile in [min_zoom, max_zoom].
+    Returns the number of tiles written.
+    """
+    out_dir = out_dir or os.path.join(store.path, "tiles")
+    lng, lat = store.column("lng"), store.column("lat")
+    written = 0
+    for z in range(min_zoom, max_zoom + 1):
+        wx, wy = world_coords(lng, lat, z)
+        tx, ty = wx.astype(np.int64), wy.astype(np.int64)
+        tile_key = tx * (2 ** z) + ty
+        order = np.argsort(tile_key, kind="stable")
+        keys, starts = np.unique(tile_key[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for key, start, end in zip(keys, starts, ends):
+            x, y = divmod(int(key), 2 ** z)
+            rows = order[start:end]
+            path = os.path.join(out_dir, str(z), str(x), f"{y}.json.gz")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(encode_tile(_render(store, rows, z, x, y)))
+            written += 1
+    return written
+
+
+# ============ SERVING ============
+
+class TileServer:
+    """Serve tiles for one store build, with an LRU of rendered tiles."""
+
+    def __init__(self, store, cache_size: int = TILE_CACHE_SIZE):
+        self.store = store
+        self.pyramid_dir = os.path.join(store.path, "tiles")
+        self.tile = lru_cache(maxsize=cache_size)(self._tile)
+
+    def _tile(self, z: int, x: int, y: int, year_min=None, year_max=None,
+              iconic_taxon: Tuple[str, ...] = (), source: Tuple[str, ...] = ()) -> bytes:
+        unfiltered = year_min is None and year_max is None and not iconic_taxon and not source
+        if unfiltered and PYRAMID_MIN_ZOOM <= z <= PYRAMID_MAX_ZOOM:
+            path = os.path.join(self.pyramid_dir, str(z), str(x), f"{y}.json.gz")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return f.read()
+
+        rows = self.store.select(
+            bbox=tile_bbox(z, x, y),
+            year_min=year_min, year_max=year_max,
+            iconic_taxon=iconic_taxon or None, source=source or None,
+        )
+        return encode_tile(_render(self.store, rows, z, x, y))
+
+    def cache_info(self):
+        return self.tile.cache_info()
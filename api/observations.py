@@ -4,13 +4,11 @@ Utah Pollinator Path - Photo Observations API
 Zero-friction photo uploads for pollinator sightings.
 """
 
-import aiohttp
-import ssl
-import certifi
 import base64
 import uuid
 from datetime import datetime
 from typing import Dict, Optional
+from async_runtime import get_limiter, get_session
 
 # Supabase credentials
 SUPABASE_URL = "https://gqexnqmqwhpcrleksrkb.supabase.co"
@@ -29,10 +27,6 @@ def _headers():
     }
 
 
-def _ssl_context():
-    return ssl.create_default_context(cafile=certifi.where())
-
-
 async def upload_photo(photo_base64: str, filename: str) -> Dict:
     """Upload photo to Supabase Storage."""
     
@@ -52,16 +46,15 @@ async def upload_photo(photo_base64: str, filename: str) -> Dict:
         "Content-Type": "image/jpeg",
     }
     
-    connector = aiohttp.TCPConnector(ssl=_ssl_context())
-    async with aiohttp.ClientSession(connector=connector) as session:
-        async with session.post(url, data=photo_bytes, headers=headers) as resp:
-            if resp.status in (200, 201):
-                # Return public URL
-                public_url = f"{SUPABASE_URL}/storage/v1/object/public/{STORAGE_BUCKET}/{filename}"
-                return {"success": True, "url": public_url, "path": filename}
-            else:
-                error = await resp.text()
-                return {"success": False, "error": error, "status": resp.status}
+    session = get_session("supabase")
+    async with session.post(url, data=photo_bytes, headers=headers) as resp:
+        if resp.status in (200, 201):
+            # Return public URL
+            public_url = f"{SUPABASE_URL}/storage/v1/object/public/{STORAGE_BUCKET}/{filename}"
+            return {"success": True, "url": public_url, "path": filename}
+        else:
+            error = await resp.text()
+            return {"success": False, "error": error, "status": resp.status}
 
 
 async def save_observation(
@@ -102,15 +95,14 @@ async def save_observation(
     
     url = f"{SUPABASE_URL}/rest/v1/{TABLE}"
     
-    connector = aiohttp.TCPConnector(ssl=_ssl_context())
-    async with aiohttp.ClientSession(connector=connector) as session:
-        async with session.post(url, json=data, headers=_headers()) as resp:
-            if resp.status in (200, 201):
-                result = await resp.json()
-                return result[0] if result else {}
-            else:
-                error = await resp.text()
-                return {"error": error, "status": resp.status}
+    session = get_session("supabase")
+    async with session.post(url, json=data, headers=_headers()) as resp:
+        if resp.status in (200, 201):
+            result = await resp.json()
+            return result[0] if result else {}
+        else:
+            error = await resp.text()
+            return {"error": error, "status": resp.status}
 
 
 async def submit_observation(
@@ -194,10 +186,9 @@ async def get_observations(
     if grid_hash:
         url += f"&grid_hash=eq.{grid_hash}"
     
-    connector = aiohttp.TCPConnector(ssl=_ssl_context())
-    async with aiohttp.ClientSession(connector=connector) as session:
-        async with session.get(url, headers=_headers()) as resp:
-            observations = await resp.json() if resp.status == 200 else []
+    session = get_session("supabase")
+    async with session.get(url, headers=_headers()) as resp:
+        observations = await resp.json() if resp.status == 200 else []
     
     return {
         "total": len(observations),
@@ -210,10 +201,9 @@ async def get_my_observations(observer_email: str) -> Dict:
     
     url = f"{SUPABASE_URL}/rest/v1/{TABLE}?observer_email=eq.{observer_email}&order=created_at.desc"
     
-    connector = aiohttp.TCPConnector(ssl=_ssl_context())
-    async with aiohttp.ClientSession(connector=connector) as session:
-        async with session.get(url, headers=_headers()) as resp:
-            observations = await resp.json() if resp.status == 200 else []
+    session = get_session("supabase")
+    async with session.get(url, headers=_headers()) as resp:
+        observations = await resp.json() if resp.status == 200 else []
     
     # Stats
     statuses = [o.get("status") for o in observations]
@@ -235,13 +225,14 @@ async def _get_city(lat: float, lng: float) -> Optional[str]:
     headers = {"User-Agent": "UtahPollinatorPath/1.0"}
     
     try:
-        connector = aiohttp.TCPConnector(ssl=_ssl_context())
-        async with aiohttp.ClientSession(connector=connector) as session:
-            async with session.get(url, params=params, headers=headers) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    address = data.get("address", {})
-                    return address.get("city") or address.get("town") or address.get("village")
+        # Nominatim's usage policy allows one request per second
+        await get_limiter("nominatim").acquire()
+        session = get_session("nominatim")
+        async with session.get(url, params=params, headers=headers) as resp:
+            if resp.status == 200:
+                data = await resp.json()
+                address = data.get("address", {})
+                return address.get("city") or address.get("town") or address.get("village")
     except:
         pass
     return None
@@ -252,7 +243,7 @@ async def _get_city(lat: float, lng: float) -> Optional[str]:
 # =============================================================================
 
 if __name__ == "__main__":
-    import asyncio
+    from async_runtime import run_sync
     
     async def test():
         print("Testing observations API...")
@@ -282,4 +273,4 @@ if __name__ == "__main__":
         obs = await get_observations(limit=5)
         print(f"\nTotal observations: {obs['total']}")
         
-    asyncio.run(test())
+    run_sync(test())
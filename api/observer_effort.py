@@ -0,0 +1,329 @@
+"""
+Observer Effort
+===============
+Per-cell, per-period observer effort and effort-normalized indices for an
+observation store build.
+
+Raw counts mostly track where people look: a cell next to a trailhead
+outside SLC logs more of everything than an equally rich cell nobody
+visits. This batch step measures effort per (geohash cell, year) and
+(geohash cell, year, month):
+
+    observations    records in the cell and period
+    observers       distinct (source, observer) pairs
+    checklists      distinct visits: one observer, one day, one geohash-6 cell
+                    (eBird-style sampling events; iNat has none, so they are inferred)
+    density         observations per km^2
+
+For every (cell, year, iconic_taxon) it then writes indices that divide
+the effort back out:
+
+    checklists      checklists that recorded the taxon
+    cell_checklists all checklists in the cell that year (the denominator below)
+    reporting_rate  share of the cell's checklists that recorded the taxon
+    per_checklist   observations of the taxon per checklist
+    relative        reporting_rate / the taxon's reporting rate over all cells that year
+                    (> 1: reported more often here than effort alone explains)
+
+min_checklists always filters on effort, the cell's checklists of every
+taxon in the row's period (`checklists` in the year and month tables,
+`cell_checklists` in the index tables), so a rarely reported taxon in a
+well-sampled cell is kept.
+
+Tables are saved next to the cube in the build:
+
+    effort/meta.json
+    effort/<table>.<col>.npy     tables: year, month, index
+
+    build_effort(store)                           # at build time
+    get_effort(store).table("year", bbox=bbox)
+    species_index(store, "Western Honey Bee", year_min=2015)
+
+Builds written before the store had an observer column count each
+(source, day, geohash-6 cell) as one visit and report no observer totals.
+"""
+
+import json
+import os
+import sys
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import geohash
+
+EFFORT_PRECISION = 5        # ~4.9 x 4.9 km, the sketch grid
+VISIT_PRECISION = 6         # checklist locality
+EFFORT_DIR = "effort"
+KM_PER_DEG = 111.32
+
+TABLES = {
+    "year": ("cell", "year"),
+    "month": ("cell", "year", "month"),
+    "index": ("cell", "year", "iconic_taxon"),
+}
+MEASURES = {
+    "year": ("observations", "observers", "checklists", "density"),
+    "month": ("observations", "observers", "checklists", "density"),
+    "index": ("observations", "checklists", "cell_checklists", "reporting_rate", "per_checklist", "relative"),
+}
+# Column min_checklists compares against: total checklists in the cell and period
+EFFORT_COLUMN = {"year": "checklists", "month": "checklists", "index": "cell_checklists"}
+
+
+def cell_area_km2(cells: np.ndarray, precision: int = EFFORT_PRECISION) -> np.ndarray:
+    """Area of geohash cells, shrinking with latitude."""
+    nlng = (5 * precision + 1) // 2
+    nlat = 5 * precision // 2
+    lat, _ = geohash.decode_array(cells, precision)
+    return (180 / 2 ** nlat * KM_PER_DEG) * (360 / 2 ** nlng * KM_PER_DEG * np.cos(np.radians(lat)))
+
+
+def _ids(*columns) -> np.ndarray:
+    """Dense id per distinct combination of int columns (row-aligned)."""
+    ids = np.zeros(len(columns[0]), dtype=np.int64)
+    for col in columns:
+        _, col_ids = np.unique(np.asarray(col, dtype=np.int64), return_inverse=True)
+        ids = ids * (int(col_ids.max()) + 1 if len(col_ids) else 1) + col_ids
+        _, ids = np.unique(ids, return_inverse=True)
+    return ids
+
+
+def _first_per(ids: np.ndarray, n: int) -> np.ndarray:
+    """Index of one row per id 0..n-1."""
+    first = np.full(n, -1, dtype=np.int64)
+    first[ids[::-1]] = np.arange(len(ids))[::-1]
+    return first
+
+
+def _distinct_per(groups: np.ndarray, members: np.ndarray, n_groups: int) -> np.ndarray:
+    """Distinct members per group (members < 0 ignored)."""
+    keep = members >= 0
+    if not keep.any():
+        return np.zeros(n_groups, dtype=np.int64)
+    span = int(members.max()) + 1
+    pairs = np.unique(groups[keep].astype(np.int64) * span + members[keep])
+    return np.bincount(pairs // span, minlength=n_groups)
+
+
+class _Rows:
+    """Per-row keys shared by every table."""
+
+    def __init__(self, store, precision: int, rows: Optional[np.ndarray] = None):
+        def col(name):
+            values = np.asarray(store.column(name))
+            return values if rows is None else values[rows]
+
+        fine = geohash.encode_array(col("lat"), col("lng"), VISIT_PRECISION)
+        self.cell = fine >> (5 * (VISIT_PRECISION - precision))
+        self.year = col("year").astype(np.int64)
+        self.month = col("month").astype(np.int64)
+        self.iconic_taxon = col("iconic_taxon").astype(np.int64)
+        self.species = col("species").astype(np.int64)
+        source = col("source").astype(np.int64)
+
+        if "observer" in store.schema:
+            observer = col("observer").astype(np.int64)
+            self.person = np.where(observer >= 0, _ids(source, observer), -1)
+        else:
+            observer = np.full(len(fine), -1)
+            self.person = np.full(len(fine), -1)
+        date = (self.year * 13 + self.month) * 32 + col("day").astype(np.int64)
+        self.visit = _ids(source, observer, date, fine)
+
+
+def _unit_table(rows: _Rows, keys, precision: int) -> Dict[str, np.ndarray]:
+    unit = _ids(*(getattr(rows, k) for k in keys))
+    n = int(unit.max()) + 1 if len(unit) else 0
+    first = _first_per(unit, n)
+    table = {k: getattr(rows, k)[first] for k in keys}
+    table["observations"] = np.bincount(unit, minlength=n)
+    table["observers"] = _distinct_per(unit, rows.person, n)
+    table["checklists"] = _distinct_per(unit, rows.visit, n)
+    table["density"] = table["observations"] / cell_area_km2(table["cell"], precision)
+    return table
+
+
+def _index_table(rows: _Rows, taxon: np.ndarray, label: str) -> Dict[str, np.ndarray]:
+    """Indices per (cell, year, taxon-like code); taxon < 0 rows are skipped."""
+    cell_year = _ids(rows.cell, rows.year)
+    n_cy = int(cell_year.max()) + 1 if len(cell_year) else 0
+    checklists = _distinct_per(cell_year, rows.visit, n_cy)
+    year_ids = _ids(rows.year)
+    n_years = int(year_ids.max()) + 1 if len(year_ids) else 0
+    year_checklists = _distinct_per(year_ids, rows.visit, n_years)
+
+    keep = taxon >= 0
+    unit = _ids(cell_year[keep], taxon[keep])
+    n = int(unit.max()) + 1 if len(unit) else 0
+    first = np.flatnonzero(keep)[_first_per(unit, n)] if n else np.zeros(0, dtype=np.int64)
+    with_taxon = _distinct_per(unit, rows.visit[keep], n)
+
+    # Regional rate: checklists reporting the taxon / all checklists, per year
+    yt = _ids(year_ids[keep], taxon[keep])
+    n_yt = int(yt.max()) + 1 if len(yt) else 0
+    yt_with = _distinct_per(yt, rows.visit[keep], n_yt)
+    yt_of_unit = yt[_first_per(unit, n)] if n else np.zeros(0, dtype=np.int64)
+    regional = yt_with[yt_of_unit] / year_checklists[year_ids[first]]
+
+    table = {
+        "cell": rows.cell[first],
+        "year": rows.year[first],
+        label: taxon[first],
+        "observations": np.bincount(unit, minlength=n),
+        "checklists": with_taxon,
+    }
+    total = checklists[cell_year[first]]
+    table["cell_checklists"] = total
+    table["reporting_rate"] = with_taxon / total
+    table["per_checklist"] = table["observations"] / total
+    table["relative"] = table["reporting_rate"] / regional
+    return table
+
+
+class EffortTables:
+    """Effort and index tables of one build."""
+
+    def __init__(self, tables: Dict[str, Dict[str, np.ndarray]], categories: Dict, meta: Dict):
+        self.tables = tables
+        self.categories = categories
+        self.meta = meta
+        self.precision = meta["precision"]
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name, table in self.tables.items():
+            for col, values in table.items():
+                np.save(os.path.join(directory, f"{name}.{col}.npy"), values)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+
+    @classmethod
+    def load(cls, directory: str, categories: Dict) -> Optional["EffortTables"]:
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+            tables = {
+                name: {c: np.load(os.path.join(directory, f"{name}.{c}.npy"), mmap_mode="r") for c in keys + MEASURES[name]}
+                for name, keys in TABLES.items()
+            }
+        except FileNotFoundError:
+            return None  # no tables, or saved before a column was added
+        return cls(tables, categories, meta)
+
+    def table(self, name: str = "year", bbox=None, year_min: Optional[int] = None, year_max: Optional[int] = None,
+              iconic_taxon=None, min_checklists: int = 0) -> List[Dict]:
+        """
+        Rows of a table for cells (by center) and years in range, dropping
+        rows whose cell has fewer than min_checklists checklists in total.
+        """
+        if name not in TABLES:
+            raise ValueError(f"table must be one of {', '.join(TABLES)}")
+        t = self.tables[name]
+        mask = np.ones(len(t["cell"]), dtype=bool)
+        if bbox:
+            min_lng, min_lat, max_lng, max_lat = bbox
+            lat, lng = geohash.decode_array(t["cell"], self.precision)
+            mask &= (lat >= min_lat) & (lat <= max_lat) & (lng >= min_lng) & (lng <= max_lng)
+        if year_min is not None:
+            mask &= t["year"] >= year_min
+        if year_max is not None:
+            mask &= (t["year"] <= year_max) & (t["year"] > 0)
+        if iconic_taxon and name == "index":
+            codes = [self.categories["iconic_taxon"].find(v) for v in iconic_taxon]
+            mask &= np.isin(t["iconic_taxon"], codes)
+        if min_checklists:
+            mask &= t[EFFORT_COLUMN[name]] >= min_checklists
+        return _records(t, np.flatnonzero(mask), TABLES[name], MEASURES[name], self.precision, self.categories)
+
+
+def _records(table, rows, keys, measures, precision, categories) -> List[Dict]:
+    out = []
+    for i in rows:
+        rec = {}
+        for k in keys:
+            v = int(table[k][i])
+            if k == "cell":
+                rec[k] = geohash.to_string(v, precision)
+            elif k in categories:
+                rec[k] = categories[k][v] if v >= 0 else "Other"
+            else:
+                rec[k] = v
+        for m in measures:
+            v = table[m][i]
+            rec[m] = int(v) if np.issubdtype(np.asarray(v).dtype, np.integer) else round(float(v), 4)
+        out.append(rec)
+    return out
+
+
+# ============ BUILD ============
+
+def build_effort_tables(store, precision: int = EFFORT_PRECISION) -> EffortTables:
+    rows = _Rows(store, precision)
+    tables = {
+        "year": _unit_table(rows, TABLES["year"], precision),
+        "month": _unit_table(rows, TABLES["month"], precision),
+        "index": _index_table(rows, rows.iconic_taxon, "iconic_taxon"),
+    }
+    meta = {
+        "precision": precision,
+        "observers": "observer" in store.schema,
+        "checklists": int(rows.visit.max()) + 1 if len(rows.visit) else 0,
+    }
+    return EffortTables(tables, store.categories, meta)
+
+
+def build_effort(store, precision: int = EFFORT_PRECISION) -> int:
+    """Compute effort tables into the build directory. Returns the number of checklists."""
+    effort = build_effort_tables(store, precision)
+    effort.save(os.path.join(store.path, EFFORT_DIR))
+    return effort.meta["checklists"]
+
+
+_effort = None
+_effort_store = None
+_lock = threading.Lock()
+
+
+def get_effort(store) -> EffortTables:
+    """Effort tables of a build (computed in process for builds that predate them)."""
+    global _effort, _effort_store
+    with _lock:
+        if _effort is None or _effort_store is not store:
+            _effort = EffortTables.load(os.path.join(store.path, EFFORT_DIR), store.categories)
+            if _effort is None:
+                _effort = build_effort_tables(store)
+            _effort_store = store
+        return _effort
+
+
+def species_index(store, species: str, bbox=None, year_min: Optional[int] = None, year_max: Optional[int] = None,
+                  precision: int = EFFORT_PRECISION, min_checklists: int = 0) -> List[Dict]:
+    """
+    Effort-normalized indices for one species per (cell, year), computed on
+    demand. min_checklists counts all checklists in the cell, as in table().
+    """
+    code = store.categories["species"].find(species)
+    if code < 0:
+        return []
+    rows = store.select(bbox=bbox, year_min=year_min, year_max=year_max)
+    r = _Rows(store, precision, rows)
+    marker = np.where(r.species == code, 0, -1)
+    table = _index_table(r, marker, "species")
+    keep = np.flatnonzero(table[EFFORT_COLUMN["index"]] >= min_checklists)
+    table["species"] = np.full(len(table["cell"]), code)
+    return _records(table, keep, TABLES["index"][:2] + ("species",), MEASURES["index"], precision, store.categories)
+
+
+if __name__ == "__main__":
+    from observation_store import open_store
+
+    if len(sys.argv) < 2:
+        print("Usage: observer_effort.py STORE_DIR")
+        sys.exit(1)
+    store = open_store(sys.argv[1])
+    if store is None:
+        print(f"No published build under {sys.argv[1]}")
+        sys.exit(1)
+    print(f"{build_effort(store):,} checklists -> {os.path.join(store.path, EFFORT_DIR)}")
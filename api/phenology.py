@@ -0,0 +1,324 @@
+"""
+Phenology
+=========
+Smoothed day-of-year activity curves per species and per iconic taxon,
+pooled over all years and split by elevation band. They are
+precomputed for each observation store build:
+
+    phenology/meta.json
+    phenology/curves.npy     (groups, 365) float32, scaled so the peak is 1
+    phenology/<col>.npy      kind, code, band, taxon, n, peak, onset, end per group
+
+Counts per (group, day) come from one bincount. The circular KDE (a von
+Mises kernel, so Dec 31 and Jan 1 are neighbours) is one FFT
+convolution over every group at once.
+
+Effort correction: presence-only counts rise and fall with how many
+people are out looking. Each species curve is divided by the smoothed
+curve of its iconic taxon in the same band, and each taxon curve by all
+observations in that band. What is left is when something is seen
+relative to its peers, not when people go outside.
+
+    build_phenology(store)                          # at build time
+    pheno = get_phenology(store)
+    pheno.curve("Showy Milkweed", band="valley")
+    pheno.calendar("Plantae")                       # month -> species active
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from elevation import get_elevation_cache
+
+DAYS = 365
+BANDWIDTH_DAYS = 7.0
+MIN_OBSERVATIONS = 20       # groups with fewer dated observations get no curve
+EFFORT_FLOOR = 0.05         # effort below this fraction of its mean is clamped
+ACTIVE_FRACTION = 0.5       # a month is "active" when its mean curve is >= half the peak
+ONSET_QUANTILE = 0.1
+END_QUANTILE = 0.9
+CALENDAR_LIMIT = 8
+PHENOLOGY_DIR = "phenology"
+
+BAND_EDGES_M = (1600, 2100, 2700)
+BAND_NAMES = ("valley", "foothill", "montane", "subalpine")
+ALL_BANDS = "all"
+BANDS = BAND_NAMES + (ALL_BANDS,)   # band index len(BAND_NAMES) pools every band
+
+KIND_SPECIES = 0
+KIND_TAXON = 1
+GROUP_COLUMNS = ("kind", "code", "band", "taxon", "n", "peak", "onset", "end")
+
+_MONTH_DAYS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+_MONTH_START = np.concatenate([[0], np.cumsum(_MONTH_DAYS)[:-1]])
+_DAY_MONTH = np.repeat(np.arange(12), _MONTH_DAYS)   # day index -> month index
+
+
+# ============ DAYS AND BANDS ============
+
+def day_index(month, day) -> np.ndarray:
+    """0-based day of a 365-day year (Feb 29 folds into Mar 1); -1 if month or day is unknown."""
+    month = np.asarray(month, dtype=np.int64)
+    day = np.asarray(day, dtype=np.int64)
+    valid = (month >= 1) & (month <= 12) & (day >= 1)
+    idx = _MONTH_START[np.clip(month - 1, 0, 11)] + day - 1
+    return np.where(valid, np.clip(idx, 0, DAYS - 1), -1)
+
+
+def day_label(idx: int) -> str:
+    """Day index -> 'MM-DD'."""
+    month = int(_DAY_MONTH[idx])
+    return f"{month + 1:02d}-{idx - _MONTH_START[month] + 1:02d}"
+
+
+def elevation_band(meters) -> np.ndarray:
+    """Band index into BAND_NAMES per elevation; -1 where unknown."""
+    meters = np.asarray(meters, dtype=np.float64)
+    return np.where(np.isnan(meters), -1, np.digitize(np.nan_to_num(meters), BAND_EDGES_M))
+
+
+# ============ SMOOTHING ============
+
+def von_mises_kernel(bandwidth_days: float = BANDWIDTH_DAYS) -> np.ndarray:
+    """Kernel over day offsets 0..364, sd ~ bandwidth_days, summing to 1."""
+    theta = 2 * np.pi * np.arange(DAYS) / DAYS
+    kappa = 1 / (2 * np.pi * bandwidth_days / DAYS) ** 2
+    k = np.exp(kappa * (np.cos(theta) - 1))
+    return k / k.sum()
+
+
+def circular_smooth(hist: np.ndarray, bandwidth_days: float = BANDWIDTH_DAYS) -> np.ndarray:
+    """Circular KDE of day histograms shaped (..., 365)."""
+    spectrum = np.fft.rfft(np.asarray(hist, dtype=np.float64), axis=-1) * np.fft.rfft(von_mises_kernel(bandwidth_days))
+    return np.maximum(np.fft.irfft(spectrum, n=DAYS, axis=-1), 0.0)
+
+
+def correct_effort(curves: np.ndarray, effort: np.ndarray) -> np.ndarray:
+    """Divide smoothed curves by their (smoothed) effort curves, relative to mean effort."""
+    relative = effort / np.maximum(effort.mean(axis=-1, keepdims=True), 1e-12)
+    return curves / np.maximum(relative, EFFORT_FLOOR)
+
+
+def curve_timing(curves: np.ndarray):
+    """
+    (peak, onset, end) day indices per curve. Onset and end are the
+    ONSET/END_QUANTILE points of the curve's mass, counted from its
+    lowest day so seasons spanning New Year stay in one piece.
+    """
+    peak = curves.argmax(axis=-1)
+    start = curves.argmin(axis=-1)
+    order = (start[:, None] + np.arange(DAYS)) % DAYS
+    mass = np.cumsum(np.take_along_axis(curves, order, axis=-1), axis=-1)
+    mass /= np.maximum(mass[:, -1:], 1e-12)
+    onset = order[np.arange(len(curves)), (mass >= ONSET_QUANTILE).argmax(axis=-1)]
+    end = order[np.arange(len(curves)), (mass >= END_QUANTILE).argmax(axis=-1)]
+    return peak, onset, end
+
+
+# ============ BUILD ============
+
+def _group_histograms(keys: np.ndarray, days: np.ndarray):
+    """Distinct group keys and their (groups, 365) day histograms."""
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    hist = np.bincount(inverse * DAYS + days, minlength=len(uniq) * DAYS).reshape(len(uniq), DAYS)
+    return uniq, hist
+
+
+def build_curves(store, elevations: Optional[np.ndarray] = None, bandwidth_days: float = BANDWIDTH_DAYS,
+                 min_observations: int = MIN_OBSERVATIONS) -> "Phenology":
+    """Curves for every species and iconic taxon with enough dated observations."""
+    days = day_index(store.column("month"), store.column("day"))
+    dated = np.flatnonzero(days >= 0)
+    days = days[dated]
+    species = np.asarray(store.column("species"))[dated].astype(np.int64)
+    taxon = np.asarray(store.column("iconic_taxon"))[dated].astype(np.int64)
+    if elevations is None:
+        band = np.full(len(dated), -1)
+    else:
+        band = elevation_band(np.asarray(elevations)[dated])
+
+    # Every dated row counts in its band (if known) and in the pooled band
+    pooled = len(BAND_NAMES)
+    nb = len(BANDS)
+    in_band = band >= 0
+    day2 = np.concatenate([days[in_band], days])
+    band2 = np.concatenate([band[in_band], np.full(len(days), pooled)])
+    species2 = np.concatenate([species[in_band], species])
+    taxon2 = np.concatenate([taxon[in_band], taxon])
+
+    # Effort: all observations per band, and per (taxon, band)
+    bands_all, band_hist = _group_histograms(band2, day2)
+    band_effort = np.zeros((nb, DAYS))
+    band_effort[bands_all] = circular_smooth(band_hist, bandwidth_days)
+
+    has_taxon = taxon2 >= 0
+    n_taxa = max(len(store.categories["iconic_taxon"]), 1)
+    taxon_keys, taxon_hist = _group_histograms(taxon2[has_taxon] * nb + band2[has_taxon], day2[has_taxon])
+    taxon_smooth = circular_smooth(taxon_hist, bandwidth_days)
+    taxon_effort = np.zeros((n_taxa * nb, DAYS))
+    taxon_effort[taxon_keys] = taxon_smooth
+
+    has_species = species2 >= 0
+    species_keys, species_hist = _group_histograms(species2[has_species] * nb + band2[has_species], day2[has_species])
+    # A species' taxon is the one it is most often recorded under
+    pair_keys, pair_counts = np.unique(species2[has_species] * (n_taxa + 1) + (taxon2[has_species] + 1), return_counts=True)
+    order = np.lexsort((-pair_counts, pair_keys // (n_taxa + 1)))
+    first = np.r_[True, np.diff(pair_keys[order] // (n_taxa + 1)) != 0]
+    species_taxon = dict(zip((pair_keys[order][first] // (n_taxa + 1)).tolist(),
+                             (pair_keys[order][first] % (n_taxa + 1) - 1).tolist()))
+
+    keep_t = taxon_hist.sum(axis=1) >= min_observations
+    keep_s = species_hist.sum(axis=1) >= min_observations
+    t_keys, s_keys = taxon_keys[keep_t], species_keys[keep_s]
+    s_code, s_band = s_keys // nb, s_keys % nb
+    s_taxon = np.array([species_taxon.get(int(c), -1) for c in s_code], dtype=np.int64)
+
+    t_curves = correct_effort(taxon_smooth[keep_t], band_effort[t_keys % nb])
+    s_smooth = circular_smooth(species_hist[keep_s], bandwidth_days)
+    s_effort = np.where((s_taxon >= 0)[:, None], taxon_effort[np.maximum(s_taxon, 0) * nb + s_band], band_effort[s_band])
+    s_curves = correct_effort(s_smooth, s_effort)
+
+    curves = np.concatenate([s_curves, t_curves]).reshape(-1, DAYS)
+    curves /= np.maximum(curves.max(axis=1, keepdims=True), 1e-12)
+    peak, onset, end = curve_timing(curves)
+    groups = {
+        "kind": np.concatenate([np.full(len(s_keys), KIND_SPECIES), np.full(len(t_keys), KIND_TAXON)]).astype(np.int8),
+        "code": np.concatenate([s_code, t_keys // nb]).astype(np.int32),
+        "band": np.concatenate([s_band, t_keys % nb]).astype(np.int8),
+        "taxon": np.concatenate([s_taxon, t_keys // nb]).astype(np.int32),
+        "n": np.concatenate([species_hist[keep_s].sum(axis=1), taxon_hist[keep_t].sum(axis=1)]).astype(np.int32),
+        "peak": peak.astype(np.int16),
+        "onset": onset.astype(np.int16),
+        "end": end.astype(np.int16),
+    }
+    meta = {
+        "bandwidth_days": bandwidth_days,
+        "min_observations": min_observations,
+        "band_edges_m": list(BAND_EDGES_M),
+        "bands": list(BANDS),
+        "elevation": elevations is not None and bool(in_band.any()),
+        "dated_observations": int(len(dated)),
+    }
+    return Phenology(curves.astype(np.float32), groups, store.categories, meta)
+
+
+def build_phenology(store, fetch_elevation: bool = True) -> int:
+    """Precompute curves into the build directory. Returns the number of curves."""
+    elevations = get_elevation_cache().lookup(store.column("lat"), store.column("lng"), fetch=fetch_elevation)
+    pheno = build_curves(store, elevations)
+    pheno.save(os.path.join(store.path, PHENOLOGY_DIR))
+    return len(pheno)
+
+
+# ============ QUERIES ============
+
+class Phenology:
+    """Curves of one store build, decoded with the build's string tables."""
+
+    def __init__(self, curves: np.ndarray, groups: Dict[str, np.ndarray], categories: Dict, meta: Dict):
+        self.curves = curves
+        self.groups = groups
+        self.categories = categories
+        self.meta = meta
+        self._index = {
+            (int(k), int(c), int(b)): i
+            for i, (k, c, b) in enumerate(zip(groups["kind"], groups["code"], groups["band"]))
+        }
+
+    def __len__(self):
+        return len(self.curves)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "curves.npy"), self.curves)
+        for col, values in self.groups.items():
+            np.save(os.path.join(directory, f"{col}.npy"), values)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(dict(self.meta, groups=len(self)), f)
+
+    @classmethod
+    def load(cls, directory: str, categories: Dict) -> Optional["Phenology"]:
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        curves = np.load(os.path.join(directory, "curves.npy"), mmap_mode="r")
+        groups = {c: np.load(os.path.join(directory, f"{c}.npy")) for c in GROUP_COLUMNS}
+        return cls(curves, groups, categories, meta)
+
+    def _band(self, band: str) -> int:
+        if band not in BANDS:
+            raise ValueError(f"band must be one of {', '.join(BANDS)}")
+        return BANDS.index(band)
+
+    def _describe(self, i: int, with_curve: bool = False) -> Dict:
+        g = {c: int(v[i]) for c, v in self.groups.items()}
+        column = "species" if g["kind"] == KIND_SPECIES else "iconic_taxon"
+        out = {
+            "name": self.categories[column][g["code"]],
+            "kind": column,
+            "band": BANDS[g["band"]],
+            "observations": g["n"],
+            "peak": day_label(g["peak"]),
+            "onset": day_label(g["onset"]),
+            "end": day_label(g["end"]),
+        }
+        if g["kind"] == KIND_SPECIES and g["taxon"] >= 0:
+            out["iconic_taxon"] = self.categories["iconic_taxon"][g["taxon"]]
+        if with_curve:
+            out["curve"] = np.round(np.asarray(self.curves[i], dtype=np.float64), 3).tolist()
+        return out
+
+    def curve(self, name: str, band: str = ALL_BANDS, kind: str = "species") -> Optional[Dict]:
+        """Curve and timing for a species (or iconic taxon with kind='iconic_taxon'), None if too few records."""
+        column, k = ("species", KIND_SPECIES) if kind == "species" else ("iconic_taxon", KIND_TAXON)
+        code = self.categories[column].find(name)
+        i = self._index.get((k, code, self._band(band))) if code >= 0 else None
+        return self._describe(i, with_curve=True) if i is not None else None
+
+    def monthly_activity(self) -> np.ndarray:
+        """(groups, 12) mean curve value per month."""
+        sums = np.add.reduceat(np.asarray(self.curves, dtype=np.float64), _MONTH_START, axis=1)
+        return sums / _MONTH_DAYS
+
+    def calendar(self, iconic_taxon: str = "Plantae", band: str = ALL_BANDS,
+                 limit: int = CALENDAR_LIMIT) -> Dict[int, List[Dict]]:
+        """Month (1-12) -> the best-recorded species of a taxon active that month."""
+        b = self._band(band)
+        taxon = self.categories["iconic_taxon"].find(iconic_taxon)
+        sel = np.flatnonzero((self.groups["kind"] == KIND_SPECIES) & (self.groups["band"] == b) & (self.groups["taxon"] == taxon))
+        activity = self.monthly_activity()[sel] if len(sel) else np.zeros((0, 12))
+        n = self.groups["n"][sel].astype(np.float64)
+        out = {}
+        for m in range(12):
+            active = np.flatnonzero(activity[:, m] >= ACTIVE_FRACTION)
+            ranked = active[np.argsort(-(n[active] * activity[active, m]), kind="stable")][:limit]
+            out[m + 1] = [dict(self._describe(sel[i]), activity=round(float(activity[i, m]), 2)) for i in ranked]
+        return out
+
+
+_pheno = None
+_pheno_store = None
+_lock = threading.Lock()
+
+
+def get_phenology(store) -> Phenology:
+    """
+    Curves of a store build: the precomputed ones, or (for builds made
+    before phenology existed) computed once in process with whatever
+    elevations are already cached, without fetching.
+    """
+    global _pheno, _pheno_store
+    with _lock:
+        if _pheno is None or _pheno_store is not store:
+            pheno = Phenology.load(os.path.join(store.path, PHENOLOGY_DIR), store.categories)
+            if pheno is None:
+                elevations = get_elevation_cache().lookup(store.column("lat"), store.column("lng"), fetch=False)
+                pheno = build_curves(store, elevations)
+            _pheno, _pheno_store = pheno, store
+        return _pheno
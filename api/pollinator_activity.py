@@ -0,0 +1,192 @@
+"""
+Pollinator Activity
+===================
+Vectorized pollinator activity scoring.
+
+The rules are the ones /api/climate/current and pollinator-forecast have
+always used, written as threshold tables so NumPy can evaluate them over
+whole arrays. A single point or a (cells x hours) forecast grid go
+through the same code:
+
+    score, level = score_conditions(temp_f, humidity, wind_mph, precip_in)
+    grid = run_sync(activity_grid(WASATCH_FRONT, hours=24))
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from async_runtime import get_session
+
+OPEN_METEO_FORECAST = "https://api.open-meteo.com/v1/forecast"
+
+WASATCH_FRONT = {"south": 39.9, "west": -112.2, "north": 41.7, "east": -111.6}
+GRID_STEP = 0.1           # matches the climate archive grid
+MAX_GRID_CELLS = 2000
+BATCH_SIZE = 100          # locations per Open-Meteo request
+FORECAST_HOURS = 48
+
+LEVELS = ["Low", "Moderate", "High"]
+
+# Each factor: (condition thresholds checked in order, penalties, notes,
+# note when nothing matched). Conditions are (op, threshold).
+TEMP_RULES = (
+    [("<", 50), ("<", 60), (">", 95), (">", 85)],
+    [40, 20, 30, 10],
+    ["Too cold for most pollinators", "Cool - reduced activity",
+     "Too hot - pollinators seeking shade", "Warm - peak afternoon activity reduced"],
+    "Ideal temperature for pollinators",
+)
+WIND_RULES = (
+    [(">", 20), (">", 15), (">", 10)],
+    [30, 15, 5],
+    ["High winds - bees grounded", "Windy - reduced flight activity", None],
+    None,
+)
+PRECIP_RULES = ([(">", 0)], [25], ["Rain - pollinators sheltering"], None)
+HUMIDITY_RULES = ([(">", 85), ("<", 20)], [10, 10], ["High humidity", "Very dry conditions"], None)
+
+
+def _rule_index(values: np.ndarray, rules) -> np.ndarray:
+    """Index of the first matching condition per element (len(conditions) if none)."""
+    conditions = [values < t if op == "<" else values > t for op, t in rules[0]]
+    return np.select(conditions, np.arange(len(conditions)), default=len(conditions))
+
+
+def _penalty(values, rules):
+    idx = _rule_index(np.nan_to_num(np.asarray(values, dtype=float)), rules)
+    return np.append(np.asarray(rules[1], dtype=np.int16), 0)[idx], idx
+
+
+def score_conditions(temp, humidity, wind, precip):
+    """
+    Activity score 0-100 and level index into LEVELS, elementwise.
+    Inputs broadcast against each other; missing values count as 0.
+    """
+    score = np.full(np.broadcast(temp, humidity, wind, precip).shape, 100, dtype=np.int16)
+    for values, rules in ((temp, TEMP_RULES), (wind, WIND_RULES), (precip, PRECIP_RULES), (humidity, HUMIDITY_RULES)):
+        score -= _penalty(values, rules)[0]
+    score = np.maximum(score, 0)
+    level = np.where(score >= 80, 2, np.where(score >= 50, 1, 0)).astype(np.int8)
+    return score, level
+
+
+def condition_notes(temp, humidity, wind, precip) -> List[str]:
+    """Notes explaining a single point's score."""
+    notes = []
+    for value, rules in ((temp, TEMP_RULES), (wind, WIND_RULES), (precip, PRECIP_RULES), (humidity, HUMIDITY_RULES)):
+        idx = int(_rule_index(np.asarray(float(value or 0)), rules))
+        note = rules[2][idx] if idx < len(rules[2]) else rules[3]
+        if note:
+            notes.append(note)
+    return notes
+
+
+# Daily forecast rules: (activity level, reason) by precip and mean temp
+DAILY_REASONS = ["Rain expected", "Too cool", "Hot - morning/evening best", "Ideal conditions", "Fair conditions"]
+DAILY_LEVELS = np.array([0, 0, 1, 2, 1], dtype=np.int8)
+
+
+def daily_activity(tmax, tmin, precip):
+    """(level index, reason index) per day from daily highs, lows and precipitation."""
+    tmax = np.asarray(tmax, dtype=float)
+    tmin = np.asarray(tmin, dtype=float)
+    avg = (tmax + tmin) / 2
+    precip = np.nan_to_num(np.asarray(precip, dtype=float))
+    reason = np.select(
+        [precip > 0.1, avg < 55, avg > 90, (avg >= 65) & (avg <= 85)],
+        [0, 1, 2, 3],
+        default=4,
+    )
+    return DAILY_LEVELS[reason], reason
+
+
+# ============ FORECAST GRID ============
+
+def grid_points(bbox: Dict, step: float = GRID_STEP):
+    """Cell-center latitudes and longitudes covering bbox."""
+    lats = np.round(np.arange(bbox["south"], bbox["north"] + step / 2, step), 4)
+    lngs = np.round(np.arange(bbox["west"], bbox["east"] + step / 2, step), 4)
+    return lats, lngs
+
+
+async def _fetch_hourly(lats: List[float], lngs: List[float], hours: int) -> Optional[List[Dict]]:
+    """Hourly forecast for many points in one Open-Meteo call (it takes coordinate lists)."""
+    params = {
+        "latitude": ",".join(str(v) for v in lats),
+        "longitude": ",".join(str(v) for v in lngs),
+        "hourly": "temperature_2m,relative_humidity_2m,wind_speed_10m,precipitation",
+        "temperature_unit": "fahrenheit",
+        "wind_speed_unit": "mph",
+        "precipitation_unit": "inch",
+        "timezone": "America/Denver",
+        "forecast_hours": hours,
+    }
+    try:
+        session = get_session("open_meteo")
+        async with session.get(OPEN_METEO_FORECAST, params=params, timeout=30) as resp:
+            if resp.status == 200:
+                data = await resp.json()
+                return data if isinstance(data, list) else [data]
+            print(f"Activity grid fetch: HTTP {resp.status}")
+    except Exception as e:
+        print(f"Activity grid fetch error: {e}")
+    return None
+
+
+async def activity_grid(bbox: Dict = WASATCH_FRONT, hours: int = 24, step: float = GRID_STEP) -> Optional[Dict]:
+    """
+    Hourly activity raster over bbox: scores[hour][row][col] with rows
+    south to north and columns west to east.
+    """
+    lats, lngs = grid_points(bbox, step)
+    if len(lats) * len(lngs) > MAX_GRID_CELLS:
+        raise ValueError(f"Grid too large ({len(lats)}x{len(lngs)} cells)")
+    flat_lat, flat_lng = (a.ravel() for a in np.meshgrid(lats, lngs, indexing="ij"))
+
+    results = []
+    for i in range(0, len(flat_lat), BATCH_SIZE):
+        batch = await _fetch_hourly(flat_lat[i:i + BATCH_SIZE].tolist(), flat_lng[i:i + BATCH_SIZE].tolist(), hours)
+        if not batch:
+            return None
+        results.extend(batch)
+
+    times = results[0]["hourly"]["time"][:hours]
+
+    def stack(var):
+        out = np.full((len(results), len(times)), np.nan)
+        for i, r in enumerate(results):
+            values = [np.nan if v is None else v for v in r["hourly"].get(var, [])[:len(times)]]
+            out[i, :len(values)] = values
+        return out
+
+    score, level = score_conditions(
+        stack("temperature_2m"), stack("relative_humidity_2m"), stack("wind_speed_10m"), stack("precipitation"),
+    )
+    # (cells, hours) -> (hours, rows, cols)
+    score = score.T.reshape(len(times), len(lats), len(lngs))
+    return {
+        "bbox": bbox,
+        "step": step,
+        "lats": lats.tolist(),
+        "lngs": lngs.tolist(),
+        "times": times,
+        "scores": score.tolist(),
+        "levels": LEVELS,
+        "mean_score_by_hour": np.round(score.reshape(len(times), -1).mean(axis=1), 1).tolist(),
+    }
+
+
+def grid_geojson(grid: Dict, hour: int = 0) -> Dict:
+    """One hour of the raster as points weighted by score (for a heatmap layer)."""
+    scores = grid["scores"][hour]
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lng, lat]},
+            "properties": {"score": scores[r][c]},
+        }
+        for r, lat in enumerate(grid["lats"])
+        for c, lng in enumerate(grid["lngs"])
+    ]
+    return {"type": "FeatureCollection", "time": grid["times"][hour], "features": features}
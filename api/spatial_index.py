@@ -0,0 +1,88 @@
+"""
+Spatial Index
+=============
+Uniform grid index for point features, used to answer map bbox queries
+without scanning every feature.
+"""
+
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+BBox = Tuple[float, float, float, float]  # min_lng, min_lat, max_lng, max_lat
+
+# ~5 km cells at Utah latitudes - a city-zoom viewport touches a handful
+DEFAULT_CELL_SIZE = 0.05
+
+
+def parse_bbox(value: Optional[str]) -> Optional[BBox]:
+    """
+    Parse "minLng,minLat,maxLng,maxLat".
+    Returns None for a missing value, raises ValueError for a bad one.
+    """
+    if not value:
+        return None
+    try:
+        parts = [float(v) for v in value.split(",")]
+    except ValueError:
+        raise ValueError("bounds must be minLng,minLat,maxLng,maxLat")
+    if len(parts) != 4:
+        raise ValueError("bounds must be minLng,minLat,maxLng,maxLat")
+    if not all(math.isfinite(v) for v in parts):
+        raise ValueError("bounds must be finite numbers")
+    min_lng, min_lat, max_lng, max_lat = parts
+    if min_lng > max_lng or min_lat > max_lat:
+        raise ValueError("bounds min must not exceed max")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+class GridIndex:
+    """Bucket points into fixed-size lat/lng cells."""
+
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], List] = defaultdict(list)
+        self._count = 0
+
+    @classmethod
+    def from_features(cls, features: Iterable[Dict], cell_size: float = DEFAULT_CELL_SIZE) -> "GridIndex":
+        """Index GeoJSON point features by their coordinates."""
+        index = cls(cell_size)
+        for feat in features:
+            coords = (feat.get("geometry") or {}).get("coordinates") or []
+            if len(coords) >= 2 and coords[0] is not None and coords[1] is not None:
+                index.insert(feat, coords[0], coords[1])
+        return index
+
+    def __len__(self):
+        return self._count
+
+    def _cell(self, lng: float, lat: float) -> Tuple[int, int]:
+        return math.floor(lng / self.cell_size), math.floor(lat / self.cell_size)
+
+    def insert(self, item, lng: float, lat: float):
+        # seq keeps query results in insertion order
+        self._cells[self._cell(lng, lat)].append((self._count, lng, lat, item))
+        self._count += 1
+
+    def query(self, bbox: Optional[BBox] = None) -> List:
+        """Items inside bbox (inclusive), in insertion order. None = all."""
+        if bbox is None:
+            hits = [entry for cell in self._cells.values() for entry in cell]
+        else:
+            min_lng, min_lat, max_lng, max_lat = bbox
+            x0, y0 = self._cell(min_lng, min_lat)
+            x1, y1 = self._cell(max_lng, max_lat)
+            if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(self._cells):
+                cells = (self._cells.get((x, y)) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+            else:
+                # Viewport wider than the data - walk occupied cells only
+                cells = (c for (x, y), c in self._cells.items() if x0 <= x <= x1 and y0 <= y <= y1)
+            hits = [
+                entry
+                for cell in cells if cell
+                for entry in cell
+                if min_lng <= entry[1] <= max_lng and min_lat <= entry[2] <= max_lat
+            ]
+        hits.sort(key=lambda e: e[0])
+        return [entry[3] for entry in hits]
@@ -10,6 +10,8 @@ from species_db import (
     validate_species, get_planting_recommendations,
     BloomSeason, SunRequirement, WaterNeed
 )
+from species_autocomplete import MAX_SUGGESTIONS, PRECOMPUTED_TOP, get_autocomplete
+from wildlife_data_api import get_observation_store
 
 
 def register_species_routes(app):
@@ -167,35 +169,20 @@ def register_species_routes(app):
         
         GET /api/species/autocomplete?q=mon
         GET /api/species/autocomplete?q=milk&type=plant
+        
+        Matches word starts of common and scientific names, including
+        species seen in the observation store, ranked by observation count.
+        Falls back to one-typo matches when there are few prefix hits.
         """
         q = request.args.get('q', '').lower()
-        species_type = request.args.get('type')  # plant, pollinator, or None for both
+        species_type = request.args.get('type')  # plant, pollinator, observed, or None for all
+        limit = max(1, min(request.args.get('limit', MAX_SUGGESTIONS, type=int), PRECOMPUTED_TOP))
         
         if len(q) < 2:
             return jsonify({"suggestions": []})
         
-        suggestions = []
-        
-        if species_type in [None, 'plant']:
-            for plant in PLANTS.values():
-                if q in plant.common_name.lower() or q in plant.scientific_name.lower():
-                    suggestions.append({
-                        "type": "plant",
-                        "name": plant.common_name,
-                        "scientific": plant.scientific_name,
-                        "monarch_value": plant.monarch_value,
-                    })
-        
-        if species_type in [None, 'pollinator']:
-            for poll in POLLINATORS.values():
-                if q in poll.common_name.lower() or q in poll.scientific_name.lower():
-                    suggestions.append({
-                        "type": "pollinator",
-                        "name": poll.common_name,
-                        "scientific": poll.scientific_name,
-                    })
-        
-        return jsonify({"suggestions": suggestions[:10]})
+        index = get_autocomplete(PLANTS, POLLINATORS, get_observation_store())
+        return jsonify({"suggestions": index.suggest(q, limit=limit, kind=species_type)})
     
     @app.route('/api/species/recommend', methods=['POST'])
     def recommend_plants():
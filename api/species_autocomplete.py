@@ -0,0 +1,269 @@
+"""
+Species Autocomplete
+====================
+Prefix index over plant, pollinator and observed species names for
+/api/species/autocomplete.
+
+Every word start of every common and scientific name is a key ("showy
+milkweed", "milkweed", "asclepias speciosa", "speciosa"), kept in one
+sorted list, so a prefix is a bisect range. Results are ranked by how often
+the species appears in the observation store. Top results for short
+prefixes (where ranges are large) are precomputed. When a query has too
+few prefix matches, prefixes within one edit of it are tried too
+("milkwed" -> "milkweed").
+
+    index = SpeciesAutocomplete.build(PLANTS, POLLINATORS, get_observation_store())
+    index.suggest("milk", limit=10)
+"""
+
+import bisect
+import heapq
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+MAX_SUGGESTIONS = 10
+PRECOMPUTED_PREFIX_LEN = 3   # prefixes up to this length get a stored top list
+PRECOMPUTED_TOP = 25
+MAX_EDITS = 1                # fuzzy fallback edit distance
+MIN_FUZZY_LEN = 3
+FUZZY_BELOW = 3              # try fuzzy matches when prefix matching finds fewer than this
+MEMO_SIZE = 4096
+FUZZY_ALPHABET = "abcdefghijklmnopqrstuvwxyz -"
+KINDS = ("plant", "pollinator", "observed")
+
+
+def _word_starts(name: str) -> List[str]:
+    """'Showy Milkweed' -> ['showy milkweed', 'milkweed']"""
+    name = " ".join(name.lower().split())
+    return [name[i:] for i in range(len(name)) if name[i] != " " and (i == 0 or name[i - 1] in " -/(")]
+
+
+def _edits1(word: str, last: int) -> set:
+    """Strings one edit from word, editing positions 0..last only."""
+    splits = [(word[:i], word[i:]) for i in range(min(last, len(word)) + 1)]
+    deletes = [a + b[1:] for a, b in splits if b]
+    transposes = [a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1]
+    replaces = [a + c + b[1:] for a, b in splits if b for c in FUZZY_ALPHABET]
+    inserts = [a + c + b for a, b in splits for c in FUZZY_ALPHABET]
+    return set(deletes + transposes + replaces + inserts) - {word}
+
+
+def _observed_species(store) -> List[Dict]:
+    """
+    One group per observed species: {"name", "scientific_names" (most
+    observed first), "observations"}. Rows are grouped by common name;
+    rows with only a scientific name join the species most often
+    observed under it.
+    """
+    species = np.asarray(store.column("species"), dtype=np.int64)
+    scientific = np.asarray(store.column("scientific_name"), dtype=np.int64)
+    species_names, scientific_names = store.categories["species"], store.categories["scientific_name"]
+    pairs, counts = np.unique(np.stack([species, scientific]), axis=1, return_counts=True)
+
+    groups: Dict[str, Dict] = {}
+    orphans = []
+    for (sp, sci), n in zip(pairs.T.tolist(), counts.tolist()):
+        sci_name = scientific_names[sci] if sci >= 0 else None
+        if sp < 0:
+            if sci_name:
+                orphans.append((sci_name, n))
+            continue
+        name = species_names[sp]
+        group = groups.setdefault(name.lower(), {"name": name, "scientific": {}, "observations": 0})
+        group["observations"] += n
+        if sci_name:
+            group["scientific"][sci_name] = group["scientific"].get(sci_name, 0) + n
+
+    owner: Dict[str, tuple] = {}  # scientific name -> (observations, group key)
+    for key, group in groups.items():
+        for sci_name, n in group["scientific"].items():
+            owner[sci_name.lower()] = max(owner.get(sci_name.lower(), (0, "")), (n, key))
+    for sci_name, n in orphans:
+        key = owner[sci_name.lower()][1] if sci_name.lower() in owner else sci_name.lower()
+        group = groups.setdefault(key, {"name": sci_name, "scientific": {}, "observations": 0})
+        group["observations"] += n
+        group["scientific"][sci_name] = group["scientific"].get(sci_name, 0) + n
+
+    return [
+        {"name": g["name"], "observations": g["observations"],
+         "scientific_names": sorted(g["scientific"], key=lambda s: -g["scientific"][s])}
+        for g in groups.values()
+    ]
+
+
+class PrefixIndex:
+    """Sorted keys -> entry ids, ranked by entry weight."""
+
+    def __init__(self, keyed: Iterable, weights: List[int]):
+        pairs = sorted(set(keyed))
+        self.keys = [k for k, _ in pairs]
+        self.ids = [i for _, i in pairs]
+        self.weights = weights
+        self.top: Dict[str, List[int]] = {}
+
+        buckets: Dict[str, set] = {}
+        for key, i in pairs:
+            for n in range(1, min(PRECOMPUTED_PREFIX_LEN, len(key)) + 1):
+                buckets.setdefault(key[:n], set()).add(i)
+        for prefix, ids in buckets.items():
+            self.top[prefix] = heapq.nlargest(PRECOMPUTED_TOP, ids, key=self._rank)
+
+    def _rank(self, i):
+        return self.weights[i], -i
+
+    def ranked(self, prefix: str, limit: int) -> List[int]:
+        """Best `limit` entry ids with a key starting with prefix."""
+        top = self.top.get(prefix[:PRECOMPUTED_PREFIX_LEN])
+        if top is None:
+            return []
+        if len(prefix) <= PRECOMPUTED_PREFIX_LEN and limit <= PRECOMPUTED_TOP:
+            return top[:limit]
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + "\uffff", lo)
+        return heapq.nlargest(limit, set(self.ids[lo:hi]), key=self._rank)
+
+
+class SpeciesAutocomplete:
+    """One PrefixIndex per kind so ?type= filters cost nothing."""
+
+    def __init__(self, entries: List[Dict], weights: List[int], keys: List[List[str]]):
+        self.entries = entries
+        self.weights = weights
+        self.indexes = {
+            kind: PrefixIndex(((k, i) for i, e in enumerate(entries) if e["type"] == kind for k in keys[i]), weights)
+            for kind in KINDS
+        }
+        # All kinds' keys in one list: a single bisect tells whether a fuzzy
+        # variant can match anything before asking the per-kind indexes
+        self.all_keys = sorted({k for idx in self.indexes.values() for k in idx.keys})
+        self._memo: Dict[tuple, List[Dict]] = {}
+
+    @classmethod
+    def build(cls, plants: Dict, pollinators: Dict, store=None) -> "SpeciesAutocomplete":
+        groups = _observed_species(store) if store is not None else []
+        by_name: Dict[str, List[int]] = {}
+        for g, group in enumerate(groups):
+            for name in {group["name"].lower(), *(s.lower() for s in group["scientific_names"])}:
+                by_name.setdefault(name, []).append(g)
+
+        entries, weights, keys = [], [], []
+        matched = set()
+        for kind, records in (("plant", plants), ("pollinator", pollinators)):
+            for r in records.values():
+                entry = {"type": kind, "name": r.common_name, "scientific": r.scientific_name}
+                if kind == "plant":
+                    entry["monarch_value"] = r.monarch_value
+                # Each observed species counts once, whichever of its names matched
+                mine = set(by_name.get(r.common_name.lower(), [])) | set(by_name.get(r.scientific_name.lower(), []))
+                matched |= mine
+                weight = sum(groups[g]["observations"] for g in mine)
+                entries.append(dict(entry, observations=weight))
+                weights.append(weight)
+                keys.append(_word_starts(r.common_name) + _word_starts(r.scientific_name))
+
+        for g, group in enumerate(groups):
+            if g in matched:
+                continue
+            scientific = group["scientific_names"][0] if group["scientific_names"] else None
+            entries.append({"type": "observed", "name": group["name"], "scientific": scientific,
+                            "observations": group["observations"]})
+            weights.append(group["observations"])
+            keys.append(_word_starts(group["name"]) + (_word_starts(scientific) if scientific else []))
+        return cls(entries, weights, keys)
+
+    def _best(self, ids: Iterable[int], limit: int) -> List[int]:
+        return heapq.nlargest(limit, set(ids), key=lambda i: (self.weights[i], -i))
+
+    def _has_prefix(self, prefix: str) -> bool:
+        i = bisect.bisect_left(self.all_keys, prefix)
+        return i < len(self.all_keys) and self.all_keys[i].startswith(prefix)
+
+    def _matched_prefix_len(self, q: str) -> int:
+        """Length of the longest prefix of q that some key starts with."""
+        lo, hi = 0, len(q)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._has_prefix(q[:mid]):
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def suggest(self, q: str, limit: int = MAX_SUGGESTIONS, kind: Optional[str] = None) -> List[Dict]:
+        q = " ".join(q.lower().split())
+        memo_key = (q, limit, kind)
+        if memo_key in self._memo:
+            return self._memo[memo_key]
+
+        indexes = [self.indexes[kind]] if kind in self.indexes else list(self.indexes.values())
+        found = self._best((i for idx in indexes for i in idx.ranked(q, limit)), limit)
+        results = [dict(self.entries[i], match="prefix") for i in found]
+
+        if len(results) < min(FUZZY_BELOW, limit) and len(q) >= MIN_FUZZY_LEN and MAX_EDITS:
+            # An edit after the longest matching prefix (+1) can't produce a match
+            last = self._matched_prefix_len(q) + 1
+            variants = [v for v in _edits1(q, last) if self._has_prefix(v)]
+            seen = set(found)
+            fuzzy = self._best(
+                (i for v in variants for idx in indexes for i in idx.ranked(v, limit) if i not in seen),
+                limit - len(results),
+            )
+            results += [dict(self.entries[i], match="fuzzy") for i in fuzzy]
+
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.clear()
+        self._memo[memo_key] = results
+        return results
+
+
+_index = None
+_index_source = None
+_building = None          # source of the index being built in the background
+_lock = threading.Lock()
+_first_build = threading.Lock()
+
+
+def _same(a, b) -> bool:
+    return a is not None and b is not None and a[0] is b[0] and a[1:] == b[1:]
+
+
+def _rebuild(plants: Dict, pollinators: Dict, source):
+    global _index, _index_source, _building
+    try:
+        index = SpeciesAutocomplete.build(plants, pollinators, source[0])
+    except Exception as e:
+        print(f"Autocomplete rebuild failed: {e}")
+        index = None
+    with _lock:
+        # A newer source may have started its own build meanwhile
+        if _building is source:
+            _building = None
+            if index is not None:
+                _index, _index_source = index, source
+
+
+def get_autocomplete(plants: Dict, pollinators: Dict, store=None) -> SpeciesAutocomplete:
+    """
+    Shared index. When a new store build is published or more species are
+    loaded, the next index is built on a background thread and the current
+    one keeps serving until it is ready. Only the first call builds inline.
+    """
+    global _index, _index_source, _building
+    source = (store, len(plants), len(pollinators))
+    with _lock:
+        if _index is not None:
+            if not _same(source, _index_source) and not _same(source, _building):
+                _building = source
+                threading.Thread(target=_rebuild, args=(plants, pollinators, source),
+                                 name="autocomplete-build", daemon=True).start()
+            return _index
+
+    with _first_build:
+        if _index is None:
+            index = SpeciesAutocomplete.build(plants, pollinators, store)
+            with _lock:
+                if _index is None:
+                    _index, _index_source = index, source
+    return _index
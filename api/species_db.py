@@ -4,7 +4,11 @@ Utah Pollinator Species Database
 Native plants and pollinators with scoring and metadata.
 """
 
-from typing import Dict, List, Optional
+import bisect
+import json
+import os
+import re
+from typing import Callable, Dict, Iterable, List, Optional
 from dataclasses import dataclass
 from enum import Enum
 
@@ -344,6 +348,238 @@ POLLINATORS: Dict[str, Pollinator] = {
 }
 
 
+# =============================================================================
+# SEARCH INDEXES
+# =============================================================================
+# Built once at import (and again by rebuild_indexes() after loading more
+# taxa). Result sets are Python ints used as bitsets over the dict's
+# insertion order, so filters are ANDs/ORs and results keep dict order.
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _bit_positions(bits: int) -> Iterable[int]:
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class BitsetIndex:
+    """
+    Token and facet index over a dict of records.
+
+    `text(record)` supplies searchable text; each facet function returns
+    the value(s) a record is filed under.
+    """
+
+    def __init__(self, records: Dict[str, object], text: Callable, facets: Dict[str, Callable]):
+        self.keys = list(records)
+        self.records = list(records.values())
+        self.all = (1 << len(self.records)) - 1
+        self.postings: Dict[str, int] = {}
+        self.facets: Dict[str, Dict[object, int]] = {name: {} for name in facets}
+        for i, record in enumerate(self.records):
+            bit = 1 << i
+            for token in set(_tokens(text(record))):
+                self.postings[token] = self.postings.get(token, 0) | bit
+            for name, values in facets.items():
+                value = values(record)
+                for v in (value if isinstance(value, (list, tuple, set)) else [value]):
+                    self.facets[name][v] = self.facets[name].get(v, 0) | bit
+        # Every suffix of every token, so a prefix search here finds words
+        # containing the query anywhere ("bee" -> "bumblebee")
+        self.suffixes = sorted({(token[i:], token) for token in self.postings for i in range(len(token))})
+
+    def containing(self, fragment: str) -> int:
+        """Records with a word containing `fragment`."""
+        bits = 0
+        i = bisect.bisect_left(self.suffixes, (fragment,))
+        while i < len(self.suffixes) and self.suffixes[i][0].startswith(fragment):
+            bits |= self.postings[self.suffixes[i][1]]
+            i += 1
+        return bits
+
+    def match(self, query: str) -> int:
+        """Records with a word containing each word of the query (none if it has no words)."""
+        tokens = _tokens(query)
+        if not tokens:
+            return 0
+        bits = self.all
+        for token in tokens:
+            bits &= self.containing(token)
+            if not bits:
+                break
+        return bits
+
+    def phrase(self, query: str, fields: Callable, bits: int = None) -> int:
+        """
+        Records (of `bits`, default all) with `query` as a substring of one
+        of fields(record). match() only narrows the candidates: each query
+        word sits inside some indexed word, but the phrase is checked as is.
+        """
+        query = query.lower()
+        candidates = self.all if bits is None else bits
+        if _tokens(query):
+            candidates &= self.match(query)
+        out = 0
+        for i in _bit_positions(candidates):
+            if any(query in f.lower() for f in fields(self.records[i])):
+                out |= 1 << i
+        return out
+
+    def facet(self, name: str, *values) -> int:
+        """Records filed under any of `values` for facet `name`."""
+        bits = 0
+        for v in values:
+            bits |= self.facets[name].get(v, 0)
+        return bits
+
+    def select(self, bits: int) -> List:
+        return [self.records[i] for i in _bit_positions(bits)]
+
+    def first(self, bits: int):
+        """(key, record) of the first match in dict order, or None."""
+        if not bits:
+            return None
+        i = (bits & -bits).bit_length() - 1
+        return self.keys[i], self.records[i]
+
+
+def _plant_index() -> BitsetIndex:
+    return BitsetIndex(
+        PLANTS,
+        text=lambda p: " ".join([p.common_name, p.scientific_name, p.description, " ".join(p.tags)]),
+        facets={
+            "season": lambda p: p.bloom_seasons,
+            "sun": lambda p: p.sun,
+            "water": lambda p: p.water,
+            "native": lambda p: p.native_to_utah,
+            "monarch": lambda p: p.monarch_value,
+            "tag": lambda p: p.tags,
+        },
+    )
+
+
+def _pollinator_index() -> BitsetIndex:
+    return BitsetIndex(
+        POLLINATORS,
+        text=lambda p: f"{p.common_name} {p.scientific_name}",
+        facets={
+            "category": lambda p: p.category,
+            "month": lambda p: p.active_months,
+        },
+    )
+
+
+def _name_index() -> Dict[str, tuple]:
+    """Exact lowercase common/scientific name -> (type, key)."""
+    names = {}
+    for kind, records in (("pollinator", POLLINATORS), ("plant", PLANTS)):
+        for key, r in records.items():
+            names[r.common_name.lower()] = (kind, key)
+            names[r.scientific_name.lower()] = (kind, key)
+    return names
+
+
+# Name-only indexes for validate_species (it never matched descriptions)
+_plant_names = _pollinator_names = None
+_plant_idx = _pollinator_idx = None
+_names: Dict[str, tuple] = {}
+
+
+def rebuild_indexes():
+    """Rebuild the search indexes after PLANTS or POLLINATORS change."""
+    global _plant_idx, _pollinator_idx, _plant_names, _pollinator_names, _names
+    _plant_idx = _plant_index()
+    _pollinator_idx = _pollinator_index()
+    _plant_names = BitsetIndex(PLANTS, text=lambda p: f"{p.common_name} {p.scientific_name}", facets={})
+    _pollinator_names = _pollinator_idx
+    _names = _name_index()
+
+
+# =============================================================================
+# EXPANDED FLORA
+# =============================================================================
+
+_SUN_FROM_TEMPLATE = {
+    "full": SunRequirement.FULL_SUN, "full-partial": SunRequirement.FULL_SUN,
+    "partial": SunRequirement.PARTIAL_SHADE, "partial-shade": SunRequirement.PARTIAL_SHADE,
+    "shade": SunRequirement.FULL_SHADE,
+}
+_WATER_FROM_TEMPLATE = {
+    "very-low": WaterNeed.LOW, "low": WaterNeed.LOW, "medium": WaterNeed.MODERATE, "high": WaterNeed.HIGH,
+}
+_SEASONS_BY_MONTH = {
+    3: [BloomSeason.EARLY_SPRING], 4: [BloomSeason.EARLY_SPRING],
+    5: [BloomSeason.LATE_SPRING], 6: [BloomSeason.LATE_SPRING, BloomSeason.EARLY_SUMMER],
+    7: [BloomSeason.EARLY_SUMMER, BloomSeason.LATE_SUMMER], 8: [BloomSeason.LATE_SUMMER, BloomSeason.EARLY_FALL],
+    9: [BloomSeason.EARLY_FALL, BloomSeason.LATE_FALL], 10: [BloomSeason.LATE_FALL],
+}
+
+
+def plant_from_template(entry: Dict) -> Plant:
+    """Convert a research/plant_data_template.ts entry into a Plant."""
+    seasons = []
+    for month in entry.get("bloomMonths", []):
+        for season in _SEASONS_BY_MONTH.get(month, []):
+            if season not in seasons:
+                seasons.append(season)
+    hosts = " ".join(entry.get("hostPlant") or []).lower()
+    visitors = " ".join(entry.get("specificPollinators") or []).lower()
+    nectar = entry.get("nectarValue", 1)
+    monarch = 10 if "monarch" in hosts else min(10, nectar * 2) if "monarch" in visitors else nectar
+
+    tags = list(entry.get("landscapeUses") or [])
+    if entry.get("category"):
+        tags.append(entry["category"])
+    if entry.get("droughtTolerant"):
+        tags.append("drought_tolerant")
+    if "monarch" in hosts:
+        tags.append("host_plant")
+    if 9 in entry.get("bloomMonths", []):
+        tags.append("september_critical")
+
+    return Plant(
+        common_name=entry["commonName"],
+        scientific_name=entry["scientificName"],
+        bloom_seasons=seasons,
+        monarch_value=monarch,
+        pollinator_value=min(10, nectar + entry.get("pollenValue", 0)),
+        native_to_utah=bool(entry.get("utahNative")),
+        sun=_SUN_FROM_TEMPLATE.get(entry.get("sunNeeds"), SunRequirement.FULL_SUN),
+        water=_WATER_FROM_TEMPLATE.get(entry.get("waterNeeds"), WaterNeed.MODERATE),
+        description=entry.get("notes") or entry.get("nativeRange") or "",
+        planting_tips=entry.get("wateringNotes") or "",
+        tags=tags,
+    )
+
+
+def load_plants_json(path: str) -> int:
+    """Add plants from a plants_expanded JSON file; returns how many were added."""
+    with open(path) as f:
+        entries = json.load(f).get("plants", [])
+    added = 0
+    for entry in entries:
+        key = entry.get("id", "").replace("-", "_")
+        if key and key not in PLANTS:
+            PLANTS[key] = plant_from_template(entry)
+            added += 1
+    if added:
+        rebuild_indexes()
+    return added
+
+
+rebuild_indexes()
+
+if os.environ.get("SPECIES_PLANTS_JSON"):
+    load_plants_json(os.environ["SPECIES_PLANTS_JSON"])
+
+
 # =============================================================================
 # SEARCH & QUERY FUNCTIONS
 # =============================================================================
@@ -357,35 +593,33 @@ def search_plants(
     water: WaterNeed = None,
     tags: List[str] = None,
 ) -> List[Plant]:
-    """Search plants with filters."""
-    results = list(PLANTS.values())
-    
-    if query:
-        query = query.lower()
-        results = [p for p in results if 
-                   query in p.common_name.lower() or 
-                   query in p.scientific_name.lower() or
-                   query in p.description.lower()]
+    """Search plants with filters. The query must appear in the name, scientific name or description."""
+    idx = _plant_idx
+    bits = idx.all
     
     if bloom_season:
-        results = [p for p in results if bloom_season in p.bloom_seasons]
+        bits &= idx.facet("season", bloom_season)
     
     if min_monarch_value:
-        results = [p for p in results if p.monarch_value >= min_monarch_value]
+        bits &= idx.facet("monarch", *range(min_monarch_value, 11))
     
     if native_only:
-        results = [p for p in results if p.native_to_utah]
+        bits &= idx.facet("native", True)
     
     if sun:
-        results = [p for p in results if p.sun == sun]
+        bits &= idx.facet("sun", sun)
     
     if water:
-        results = [p for p in results if p.water == water]
+        bits &= idx.facet("water", water)
     
     if tags:
-        results = [p for p in results if any(t in p.tags for t in tags)]
+        bits &= idx.facet("tag", *tags)
+    
+    # Last, so the phrase check only scans what the facets left
+    if query:
+        bits = idx.phrase(query, lambda p: (p.common_name, p.scientific_name, p.description), bits)
     
-    return results
+    return idx.select(bits)
 
 
 def get_september_critical_plants() -> List[Plant]:
@@ -400,21 +634,19 @@ def get_milkweeds() -> List[Plant]:
 
 def search_pollinators(query: str = None, category: str = None, month: int = None) -> List[Pollinator]:
     """Search pollinators."""
-    results = list(POLLINATORS.values())
-    
-    if query:
-        query = query.lower()
-        results = [p for p in results if
-                   query in p.common_name.lower() or
-                   query in p.scientific_name.lower()]
+    idx = _pollinator_idx
+    bits = idx.all
     
     if category:
-        results = [p for p in results if p.category == category]
+        bits &= idx.facet("category", category)
     
     if month:
-        results = [p for p in results if month in p.active_months]
+        bits &= idx.facet("month", month)
     
-    return results
+    if query:
+        bits = idx.phrase(query, lambda p: (p.common_name, p.scientific_name), bits)
+    
+    return idx.select(bits)
 
 
 def validate_species(name: str) -> Optional[Dict]:
@@ -422,32 +654,36 @@ def validate_species(name: str) -> Optional[Dict]:
     Check if a species name is valid.
     Returns match info or None.
     """
-    name_lower = name.lower()
-    
-    # Check plants
-    for key, plant in PLANTS.items():
-        if (name_lower in plant.common_name.lower() or 
-            name_lower in plant.scientific_name.lower()):
-            return {
-                "type": "plant",
-                "key": key,
-                "common_name": plant.common_name,
-                "scientific_name": plant.scientific_name,
-                "monarch_value": plant.monarch_value,
-            }
-    
-    # Check pollinators
-    for key, pollinator in POLLINATORS.items():
-        if (name_lower in pollinator.common_name.lower() or
-            name_lower in pollinator.scientific_name.lower()):
-            return {
-                "type": "pollinator",
-                "key": key,
-                "common_name": pollinator.common_name,
-                "scientific_name": pollinator.scientific_name,
-            }
-    
-    return None
+    name_lower = name.lower().strip()
+    
+    # Exact name first, then the first plant / pollinator whose name contains it
+    hit = _names.get(name_lower)
+    if hit is None and name_lower:
+        for kind, idx in (("plant", _plant_names), ("pollinator", _pollinator_names)):
+            found = idx.first(idx.phrase(name_lower, lambda r: (r.common_name, r.scientific_name)))
+            if found:
+                hit = (kind, found[0])
+                break
+    if hit is None:
+        return None
+    
+    kind, key = hit
+    if kind == "plant":
+        plant = PLANTS[key]
+        return {
+            "type": "plant",
+            "key": key,
+            "common_name": plant.common_name,
+            "scientific_name": plant.scientific_name,
+            "monarch_value": plant.monarch_value,
+        }
+    pollinator = POLLINATORS[key]
+    return {
+        "type": "pollinator",
+        "key": key,
+        "common_name": pollinator.common_name,
+        "scientific_name": pollinator.scientific_name,
+    }
 
 
 def get_planting_recommendations(
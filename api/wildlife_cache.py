@@ -1,34 +1,200 @@
 """
 Wildlife Data Cache - In-memory caching for faster responses
+
+Bounded LRU cache with per-key TTLs:
+- evicts least-recently-used entries past max_entries or max_bytes
+  (approximate payload size)
+- expired entries are purged periodically, not only when read
+- get_or_set() is single-flight: concurrent misses on one key run the
+  upstream fetch once and share the result
 """
 
+import sys
+import threading
 import time
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import Future
+
+DEFAULT_TTL = 3600          # 1 hour
+MAX_ENTRIES = 512
+MAX_BYTES = 256 * 1024 * 1024
+PURGE_INTERVAL = 30         # seconds between expired-entry sweeps
+
+
+def approx_size(value, _sample=100):
+    """
+    Rough in-memory size of a JSON-like value in bytes.
+    Long lists are estimated from a sample of their items.
+    """
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        n = len(value)
+        if n > _sample:
+            sample = sum(approx_size(v) for v in value[:_sample])
+            return sys.getsizeof(value) + sample * n // _sample
+        return sys.getsizeof(value) + sum(approx_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-safe TTL + LRU cache bounded by entry count and bytes."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, default_ttl=DEFAULT_TTL, sizer=approx_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.sizer = sizer
+        self._data = OrderedDict()   # key -> (value, expires_at, size)
+        self._inflight = {}          # key -> Future
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._last_purge = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def get(self, key, default=None):
+        """Value for key if present and not expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Store value for `ttl` seconds (default_ttl if None)."""
+        size = self.sizer(value)
+        now = time.monotonic()
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if size > self.max_bytes:
+                return  # would evict everything else; don't cache
+            self._data[key] = (value, now + (self.default_ttl if ttl is None else ttl), size)
+            self._bytes += size
+            if now - self._last_purge > PURGE_INTERVAL:
+                self._purge_expired(now)
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_set(self, key, compute, ttl=None):
+        """
+        Cached value for key, computing it with compute() on a miss.
+
+        Only one caller computes a given key at a time; others block on
+        its result. `ttl` may be a number or a callable taking the value
+        (e.g. shorter TTLs for empty results).
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            # Checked under the lock: a leader may have stored the value
+            # and left _inflight since our get() missed
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._data.move_to_end(key)
+                return entry[0]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.set(key, value, ttl(value) if callable(ttl) else ttl)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _purge_expired(self, now):
+        expired = [k for k, (_, expires_at, _) in self._data.items() if expires_at <= now]
+        for k in expired:
+            self._remove(k)
+        self.expirations += len(expired)
+        self._last_purge = now
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "approx_bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "coalesced": self.coalesced,
+                "inflight": len(self._inflight),
+            }
+
+
+_MISSING = object()
+
+# Shared cache for fetch_all_wildlife results
+_cache = ResultCache()
 
-# Simple in-memory cache
-_cache = {}
-_cache_ttl = 3600  # 1 hour
 
 def get_cached(key):
     """Get value from cache if not expired."""
-    if key in _cache:
-        value, timestamp = _cache[key]
-        if time.time() - timestamp < _cache_ttl:
-            return value
-        del _cache[key]
-    return None
+    return _cache.get(key)
 
-def set_cached(key, value):
+
+def set_cached(key, value, ttl=None):
     """Store value in cache."""
-    _cache[key] = (value, time.time())
+    _cache.set(key, value, ttl)
+
+
+def get_or_set(key, compute, ttl=None):
+    """Single-flight cached fetch (see ResultCache.get_or_set)."""
+    return _cache.get_or_set(key, compute, ttl)
+
 
 def cache_key(lat, lng, radius, days):
     """Generate cache key from params."""
     return f"{lat:.2f},{lng:.2f},{radius},{days}"
 
+
 def get_cache_stats():
     """Return cache statistics."""
-    return {
-        "entries": len(_cache),
-        "keys": list(_cache.keys())[:20],
-    }
+    return _cache.stats()
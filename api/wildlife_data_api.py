@@ -2,16 +2,36 @@
 Wildlife Data API - Maximum Data Collection
 """
 
-import aiohttp
 import asyncio
-import ssl
-import certifi
-from flask import request, jsonify
+import gzip
+import json
+import os
+from flask import Response, request, jsonify
 from datetime import datetime, timedelta
+from async_runtime import get_limiter, get_session, iter_sync, run_sync
+import biodiversity
+import observer_effort
+import phenology
+import richness_sketch
+import wildlife_cache
+from observation_store import StoreWatcher
+from observation_tiles import TileServer
+from spatial_index import parse_bbox
 
 INAT_BASE = "https://api.inaturalist.org/v1"
 GBIF_BASE = "https://api.gbif.org/v1"
 
+# Columnar cache written by the collectors (see scrapers/build_cache.py)
+OBSERVATION_STORE_DIR = os.environ.get("OBSERVATION_STORE_DIR", "static/observation_store")
+
+_store_watcher = StoreWatcher(OBSERVATION_STORE_DIR)
+_tile_server = None
+
+# Live results are cached per (lat, lng, radius, days); an empty result
+# usually means an upstream failed, so it is retried sooner.
+WILDLIFE_CACHE_TTL = 3600
+EMPTY_RESULT_TTL = 60
+
 TAXON_QUERIES = [
     {"id": 3, "name": "Birds", "gbif": 212},
     {"id": 47158, "name": "Insects", "gbif": 216},
@@ -24,7 +44,7 @@ TAXON_QUERIES = [
 ]
 
 
-async def fetch_inat_page(session, ssl_ctx, lat, lng, radius, taxon_id, days_back, page=1):
+async def fetch_inat_page(session, lat, lng, radius, taxon_id, days_back, page=1):
     """Fetch a page of iNaturalist observations."""
     url = f"{INAT_BASE}/observations"
     d1 = (datetime.utcnow() - timedelta(days=days_back)).strftime("%Y-%m-%d")
@@ -37,7 +57,8 @@ async def fetch_inat_page(session, ssl_ctx, lat, lng, radius, taxon_id, days_bac
     }
     
     try:
-        async with session.get(url, params=params, ssl=ssl_ctx, timeout=25) as resp:
+        await get_limiter("inaturalist").acquire()
+        async with session.get(url, params=params, timeout=25) as resp:
             if resp.status == 200:
                 data = await resp.json()
                 observations = []
@@ -65,7 +86,7 @@ async def fetch_inat_page(session, ssl_ctx, lat, lng, radius, taxon_id, days_bac
     return [], 0
 
 
-async def fetch_gbif_records(session, ssl_ctx, lat, lng, radius_km, taxon_key=None, limit=300):
+async def fetch_gbif_records(session, lat, lng, radius_km, taxon_key=None, limit=300):
     """Fetch GBIF occurrence records - includes historical museum data."""
     url = f"{GBIF_BASE}/occurrence/search"
     deg = radius_km / 111
@@ -81,7 +102,8 @@ async def fetch_gbif_records(session, ssl_ctx, lat, lng, radius_km, taxon_key=No
         params["taxonKey"] = taxon_key
     
     try:
-        async with session.get(url, params=params, ssl=ssl_ctx, timeout=25) as resp:
+        await get_limiter("gbif").acquire()
+        async with session.get(url, params=params, timeout=25) as resp:
             if resp.status == 200:
                 data = await resp.json()
                 records = []
@@ -118,43 +140,148 @@ async def fetch_gbif_records(session, ssl_ctx, lat, lng, radius_km, taxon_key=No
     return []
 
 
-async def fetch_all_wildlife(lat, lng, radius_km=30, days_back=365):
-    """Fetch from all sources for maximum data."""
-    ssl_ctx = ssl.create_default_context(cafile=certifi.where())
-    all_obs = []
+async def iter_wildlife(lat, lng, radius_km=30, days_back=365):
+    """
+    Yield deduplicated observations from all sources as pages arrive.
+    
+    Every iNaturalist taxon and the GBIF query run concurrently; the
+    per-upstream token buckets keep the fan-out within rate limits.
+    """
     seen_ids = set()
+    inat = get_session("inaturalist")
+    gbif = get_session("gbif")
+    pages = asyncio.Queue()
     
-    async with aiohttp.ClientSession() as session:
-        # iNaturalist - fetch each taxon
-        for taxon in TAXON_QUERIES:
-            try:
-                obs, total = await fetch_inat_page(session, ssl_ctx, lat, lng, radius_km, taxon["id"], days_back)
-                for o in obs:
-                    if o["id"] not in seen_ids:
-                        seen_ids.add(o["id"])
-                        all_obs.append(o)
-                
-                # If there are more results, fetch page 2
-                if total > 200:
-                    obs2, _ = await fetch_inat_page(session, ssl_ctx, lat, lng, radius_km, taxon["id"], days_back, page=2)
-                    for o in obs2:
-                        if o["id"] not in seen_ids:
-                            seen_ids.add(o["id"])
-                            all_obs.append(o)
-            except Exception as e:
-                print(f"Taxon {taxon['name']} error: {e}")
-        
+    async def taxon_pages(taxon):
+        try:
+            obs, total = await fetch_inat_page(inat, lat, lng, radius_km, taxon["id"], days_back)
+            await pages.put(obs)
+            
+            # If there are more results, fetch page 2
+            if total > 200:
+                obs2, _ = await fetch_inat_page(inat, lat, lng, radius_km, taxon["id"], days_back, page=2)
+                await pages.put(obs2)
+        except Exception as e:
+            print(f"Taxon {taxon['name']} error: {e}")
+    
+    async def gbif_pages():
         # GBIF - historical records
         try:
-            gbif_records = await fetch_gbif_records(session, ssl_ctx, lat, lng, radius_km)
-            for r in gbif_records:
-                if r["id"] not in seen_ids:
-                    seen_ids.add(r["id"])
-                    all_obs.append(r)
+            await pages.put(await fetch_gbif_records(gbif, lat, lng, radius_km))
         except Exception as e:
             print(f"GBIF error: {e}")
     
-    return all_obs
+    tasks = [asyncio.create_task(taxon_pages(t)) for t in TAXON_QUERIES]
+    tasks.append(asyncio.create_task(gbif_pages()))
+    
+    async def finish():
+        await asyncio.gather(*tasks)
+        await pages.put(None)
+    
+    closer = asyncio.create_task(finish())
+    try:
+        while True:
+            page = await pages.get()
+            if page is None:
+                break
+            for o in page:
+                if o["id"] not in seen_ids:
+                    seen_ids.add(o["id"])
+                    yield o
+    finally:
+        # Consumer stopped early (e.g. client disconnected)
+        for task in tasks + [closer]:
+            task.cancel()
+
+
+async def fetch_all_wildlife(lat, lng, radius_km=30, days_back=365):
+    """Fetch from all sources for maximum data."""
+    return [o async for o in iter_wildlife(lat, lng, radius_km, days_back)]
+
+
+def _to_feature(obs):
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [obs["lng"], obs["lat"]]},
+        "properties": obs
+    }
+
+
+def _ndjson_response(features, headers=None):
+    """Stream one GeoJSON feature per line."""
+    def generate():
+        for feat in features:
+            yield json.dumps(feat, separators=(",", ":")) + "\n"
+    return Response(generate(), mimetype="application/x-ndjson", headers=headers)
+
+
+def _geojson_stream_response(features, head=None, tail=None, headers=None):
+    """
+    Stream a FeatureCollection without building it in memory.
+    
+    `head` members are written before the features; `tail` is a callable
+    returning members written after them (for stats that are only known
+    once every feature has been seen).
+    """
+    def generate():
+        members = {"type": "FeatureCollection", **(head or {})}
+        yield json.dumps(members)[:-1] + ', "features": ['
+        for i, feat in enumerate(features):
+            yield ("," if i else "") + json.dumps(feat, separators=(",", ":"))
+        yield "]"
+        for key, value in (tail() if tail else {}).items():
+            yield f", {json.dumps(key)}: {json.dumps(value)}"
+        yield "}"
+    return Response(generate(), mimetype="application/geo+json", headers=headers)
+
+
+def _result_ttl(observations):
+    return WILDLIFE_CACHE_TTL if observations else EMPTY_RESULT_TTL
+
+
+def _stream_format():
+    """Requested response mode: None (plain JSON), 'ndjson' or 'stream'."""
+    fmt = request.args.get('format', '').lower()
+    if fmt == 'ndjson':
+        return 'ndjson'
+    if fmt == 'stream' or request.args.get('stream', '').lower() in ('1', 'true'):
+        return 'stream'
+    return None
+
+
+def get_observation_store():
+    """
+    Latest published observation store (None if not built yet).
+
+    Columns are mmap'd, so every worker shares one page-cache copy; a new
+    build published by a collector is picked up within a few seconds.
+    """
+    return _store_watcher.get()
+
+
+def get_tile_server():
+    """Tile server bound to the currently open observation store."""
+    global _tile_server
+    store = get_observation_store()
+    if store is None:
+        return None
+    if _tile_server is None or _tile_server.store is not store:
+        _tile_server = TileServer(store)
+    return _tile_server
+
+
+def _store_filters():
+    """Parse cached-data filters from the query string (ValueError for bad bounds)."""
+    filters = {
+        "year_min": request.args.get('year_min', type=int),
+        "year_max": request.args.get('year_max', type=int),
+        "iconic_taxon": [t for t in request.args.get('taxon', '').split(',') if t] or None,
+        "source": [s for s in request.args.get('source', '').split(',') if s] or None,
+    }
+    bbox = parse_bbox(request.args.get('bounds'))
+    if bbox:
+        filters["bbox"] = bbox
+    return filters
 
 
 def register_wildlife_routes(app):
@@ -170,7 +297,39 @@ def register_wildlife_routes(app):
         radius = request.args.get('radius', 30, type=int)
         days = request.args.get('days', 365, type=int)
         
-        observations = asyncio.run(fetch_all_wildlife(lat, lng, radius, days))
+        key = wildlife_cache.cache_key(lat, lng, radius, days)
+        
+        fmt = _stream_format()
+        if fmt:
+            # Features go out as upstream pages arrive (or straight from
+            # the cache); a fully streamed result is cached for next time.
+            year_counts = {}
+            cached = wildlife_cache.get_cached(key)
+            
+            def features():
+                collected = []
+                source = cached if cached is not None else iter_sync(iter_wildlife(lat, lng, radius, days))
+                for obs in source:
+                    if obs.get("year"):
+                        year_counts[obs["year"]] = year_counts.get(obs["year"], 0) + 1
+                    if cached is None:
+                        collected.append(obs)
+                    yield _to_feature(obs)
+                if cached is None:
+                    wildlife_cache.set_cached(key, collected, _result_ttl(collected))
+            
+            if fmt == 'ndjson':
+                return _ndjson_response(features())
+            return _geojson_stream_response(features(), tail=lambda: {
+                "total_observations": sum(year_counts.values()),
+                "year_distribution": year_counts,
+            })
+        
+        observations = wildlife_cache.get_or_set(
+            key,
+            lambda: run_sync(fetch_all_wildlife(lat, lng, radius, days), timeout=120),
+            ttl=_result_ttl,
+        )
         
         # Add year stats
         year_counts = {}
@@ -183,16 +342,250 @@ def register_wildlife_routes(app):
             "type": "FeatureCollection",
             "total_observations": len(observations),
             "year_distribution": year_counts,
-            "features": [
-                {
-                    "type": "Feature",
-                    "geometry": {"type": "Point", "coordinates": [obs["lng"], obs["lat"]]},
-                    "properties": obs
-                }
-                for obs in observations
-            ],
+            "features": [_to_feature(obs) for obs in observations],
+        })
+    
+    @app.route('/api/wildlife/cached', methods=['GET'])
+    def cached_wildlife():
+        """
+        Observations from the prebuilt observation store.
+        
+        Query params (all optional):
+        - year_min, year_max: inclusive year range
+        - taxon: comma-separated iconic taxa (e.g. Aves,Insecta)
+        - source: comma-separated sources (e.g. inaturalist,gbif)
+        - bounds: bbox as minLng,minLat,maxLng,maxLat
+        - format=ndjson: one feature per line, streamed
+        - format=stream: same FeatureCollection, streamed
+        """
+        store = get_observation_store()
+        if store is None:
+            return jsonify({"error": "Observation cache not built"}), 503
+        
+        try:
+            rows = store.select(**_store_filters())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        fmt = _stream_format()
+        if fmt == 'ndjson':
+            return _ndjson_response(store.iter_features(rows), headers={"X-Total-Count": str(len(rows))})
+        if fmt == 'stream':
+            return _geojson_stream_response(store.iter_features(rows), head={
+                "generated": store.stats.get("generated"),
+                "total": int(len(rows)),
+                "year_distribution": store.distribution("year", rows),
+                "taxon_distribution": store.distribution("iconic_taxon", rows),
+            })
+        
+        return jsonify({
+            "type": "FeatureCollection",
+            "generated": store.stats.get("generated"),
+            "total": int(len(rows)),
+            "year_distribution": store.distribution("year", rows),
+            "taxon_distribution": store.distribution("iconic_taxon", rows),
+            "features": list(store.iter_features(rows)),
         })
     
+    @app.route('/api/wildlife/cube', methods=['GET'])
+    def wildlife_cube():
+        """
+        Rollups from the store's aggregate cube (see observation_cube.py).
+        
+        Accepts the same filters as /api/wildlife/cached (bounds match
+        whole cells by their center), plus:
+        - by: comma-separated dimensions from cell, year, month, iconic_taxon, source (default year)
+        - measure: count (observations, default) or species (distinct species)
+        - precision: geohash precision of cells (default 6)
+        """
+        store = get_observation_store()
+        if store is None:
+            return jsonify({"error": "Observation cache not built"}), 503
+        
+        by = [d for d in request.args.get('by', 'year').split(',') if d]
+        try:
+            rows = store.cube().rollup(
+                by,
+                measure=request.args.get('measure', 'count'),
+                precision=request.args.get('precision', type=int),
+                **_store_filters(),
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({
+            "generated": store.stats.get("generated"),
+            "by": by,
+            "groups": len(rows),
+            "rows": rows,
+        })
+    
+    @app.route('/api/wildlife/richness', methods=['GET'])
+    def wildlife_richness():
+        """
+        Distinct species for a selection (see richness_sketch.py).
+        
+        Accepts the same filters as /api/wildlife/cached, plus:
+        - by: cell, year or iconic_taxon for a breakdown
+        - exact=1 / exact=0: force an exact recount or the sketch estimate
+          (default: exact for small selections)
+        """
+        store = get_observation_store()
+        if store is None:
+            return jsonify({"error": "Observation cache not built"}), 503
+        
+        exact = request.args.get('exact')
+        try:
+            result = richness_sketch.species_richness(
+                store,
+                by=request.args.get('by') or None,
+                exact=None if exact is None else exact.lower() in ('1', 'true'),
+                **_store_filters(),
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(dict(result, generated=store.stats.get("generated")))
+    
+    @app.route('/api/wildlife/phenology', methods=['GET'])
+    def wildlife_phenology():
+        """
+        Day-of-year activity curve (see phenology.py).
+        
+        Query params:
+        - species: species name, or taxon: iconic taxon (one required)
+        - band: elevation band (valley, foothill, montane, subalpine, all)
+        """
+        store = get_observation_store()
+        if store is None:
+            return jsonify({"error": "Observation cache not built"}), 503
+        
+        species = request.args.get('species')
+        taxon = request.args.get('taxon')
+        if not species and not taxon:
+            return jsonify({"error": "species or taxon required"}), 400
+        try:
+            pheno = phenology.get_phenology(store)
+            curve = pheno.curve(species or taxon, request.args.get('band', phenology.ALL_BANDS),
+                                kind="species" if species else "iconic_taxon")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if curve is None:
+            return jsonify({"error": f"Fewer than {pheno.meta['min_observations']} dated observations"}), 404
+        return jsonify(dict(curve, bandwidth_days=pheno.meta["bandwidth_days"]))
+    
+    @app.route('/api/wildlife/effort', methods=['GET'])
+    def wildlife_effort():
+        """
+        Observer effort and effort-normalized indices (see observer_effort.py).
+        
+        Query params (all optional):
+        - table: year (default), month, or index (per iconic taxon)
+        - species: effort-normalized index for one species instead
+        - bounds, year_min, year_max, taxon: as for /api/wildlife/cached
+        - min_checklists: drop rows whose cell has fewer checklists (of any
+          taxon) in the row's period, for every table and for species
+        """
+        store = get_observation_store()
+        if store is None:
+            return jsonify({"error": "Observation cache not built"}), 503
+        
+        try:
+            filters = _store_filters()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        min_checklists = request.args.get('min_checklists', 0, type=int)
+        species = request.args.get('species')
+        if species:
+            key = json.dumps(["effort", store.path, species, filters, min_checklists], sort_keys=True, default=list)
+            rows = wildlife_cache.get_or_set(key, lambda: observer_effort.species_index(
+                store, species, filters.get("bbox"), filters["year_min"], filters["year_max"],
+                min_checklists=min_checklists,
+            ), ttl=WILDLIFE_CACHE_TTL)
+            table = "species"
+        else:
+            table = request.args.get('table', 'year')
+            try:
+                rows = observer_effort.get_effort(store).table(
+                    table, filters.get("bbox"), filters["year_min"], filters["year_max"],
+                    filters["iconic_taxon"], min_checklists,
+                )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        return jsonify({
+            "generated": store.stats.get("generated"),
+            "table": table,
+            "precision": observer_effort.EFFORT_PRECISION,
+            "total": len(rows),
+            "rows": rows,
+        })
+    
+    @app.route('/api/wildlife/biodiversity', methods=['GET'])
+    def wildlife_biodiversity():
+        """
+        Diversity indices for a store selection (see biodiversity.py).
+        
+        Accepts the same filters as /api/wildlife/cached, plus:
+        - bootstrap: replicates for confidence intervals (default 200, 0 = off)
+        - seed: bootstrap RNG seed (default 0), for reproducible intervals
+        - points: rarefaction/extrapolation curve points (default 40)
+        """
+        store = get_observation_store()
+        if store is None:
+            return jsonify({"error": "Observation cache not built"}), 503
+        
+        try:
+            filters = _store_filters()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        replicates = max(0, min(request.args.get('bootstrap', biodiversity.DEFAULT_BOOTSTRAP, type=int), biodiversity.MAX_BOOTSTRAP))
+        seed = max(0, request.args.get('seed', 0, type=int))  # numpy rejects negative seeds
+        points = max(2, min(request.args.get('points', biodiversity.CURVE_POINTS, type=int), 200))
+        
+        # Keyed by build path, so a newly published store never serves old numbers
+        key = json.dumps(["biodiversity", store.path, filters, replicates, seed, points], sort_keys=True, default=list)
+        report = wildlife_cache.get_or_set(
+            key,
+            lambda: biodiversity.analyze(store, store.select(**filters), replicates, seed, points),
+            ttl=WILDLIFE_CACHE_TTL,
+        )
+        return jsonify(dict(report, generated=store.stats.get("generated"), filters=filters))
+    
+    @app.route('/api/wildlife/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+    def wildlife_tile(z, x, y):
+        """
+        Clustered observation tile (XYZ scheme, see observation_tiles.py).
+        
+        Accepts the same year_min, year_max, taxon and source filters as
+        /api/wildlife/cached.
+        """
+        if not (0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return jsonify({"error": "invalid tile"}), 400
+        
+        server = get_tile_server()
+        if server is None:
+            return jsonify({"error": "Observation cache not built"}), 503
+        
+        try:
+            filters = _store_filters()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        body = server.tile(
+            z, x, y,
+            filters["year_min"], filters["year_max"],
+            tuple(sorted(filters["iconic_taxon"] or ())),
+            tuple(sorted(filters["source"] or ())),
+        )
+        
+        headers = {"Cache-Control": "public, max-age=3600", "Vary": "Accept-Encoding"}
+        if "gzip" in request.accept_encodings:
+            headers["Content-Encoding"] = "gzip"
+        else:
+            body = gzip.decompress(body)
+        return Response(body, mimetype="application/json", headers=headers)
+    
+    @app.route('/api/wildlife/cache/stats', methods=['GET'])
+    def wildlife_cache_stats():
+        return jsonify(wildlife_cache.get_cache_stats())
+    
     @app.route('/api/wildlife/sources', methods=['GET'])
     def wildlife_sources():
         return jsonify({
@@ -8,6 +8,11 @@ import ssl
 import certifi
 import json
 from datetime import datetime, timedelta, timezone
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from observation_store import build_derived, write_features
 
 INAT_BASE = "https://api.inaturalist.org/v1"
 
@@ -217,13 +222,16 @@ async def main():
     cache = await build_cache()
     elapsed = datetime.now() - start
     
-    import os
     os.makedirs("static", exist_ok=True)
     output_file = "static/wildlife_cache.json"
+    store_dir = "static/observation_store"
     
     with open(output_file, "w") as f:
         json.dump(cache, f)
     
+    # Columnar store served by /api/wildlife/cached
+    write_features(cache["features"], store_dir, stats={"generated": cache["generated"]}, derive=build_derived)
+    
     print(f"\n{'='*50}")
     print(f"✅ Cache built in {elapsed.total_seconds()/60:.1f} minutes!")
     print(f"   Total observations: {cache['total_observations']:,}")
@@ -233,6 +241,7 @@ async def main():
         print(f"      {t}: {c:,}")
     print(f"   File: {output_file}")
     print(f"   Size: {os.path.getsize(output_file) / 1024 / 1024:.1f} MB")
+    print(f"   Store: {store_dir}")
 
 if __name__ == "__main__":
     asyncio.run(main())
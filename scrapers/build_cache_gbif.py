@@ -7,8 +7,14 @@ import aiohttp
 import ssl
 import certifi
 import json
+import os
+import sys
 from datetime import datetime, timezone
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from observation_dedup import deduplicate
+from observation_store import build_derived, write_features
+
 GBIF_BASE = "https://api.gbif.org/v1"
 
 # Utah bounding box
@@ -154,8 +160,9 @@ async def main():
     # Fetch GBIF data
     gbif_records = await build_gbif_cache()
     
-    # Add new records
-    new_count = 0
+    # Add new records, then drop GBIF mirrors of observations already
+    # in the cache (matched by place, date and species, not just id)
+    existing_count = len(cache["features"])
     for record in gbif_records:
         if record["id"] not in existing_ids:
             existing_ids.add(record["id"])
@@ -164,14 +171,19 @@ async def main():
                 "geometry": {"type": "Point", "coordinates": [record["lng"], record["lat"]]},
                 "properties": record
             })
-            new_count += 1
-            
-            # Update stats
-            y = record.get("year")
-            t = record.get("iconic_taxon", "Other")
-            if y:
-                cache["year_distribution"][str(y)] = cache["year_distribution"].get(str(y), 0) + 1
-            cache["taxon_distribution"][t] = cache["taxon_distribution"].get(t, 0) + 1
+    cache["features"] = deduplicate(cache["features"])
+    new_count = len(cache["features"]) - existing_count
+    
+    year_dist = {}
+    taxon_dist = {}
+    for feat in cache["features"]:
+        y = feat["properties"].get("year")
+        t = feat["properties"].get("iconic_taxon", "Other")
+        if y:
+            year_dist[str(y)] = year_dist.get(str(y), 0) + 1
+        taxon_dist[t] = taxon_dist.get(t, 0) + 1
+    cache["year_distribution"] = year_dist
+    cache["taxon_distribution"] = taxon_dist
     
     cache["total_observations"] = len(cache["features"])
     cache["generated"] = datetime.now(timezone.utc).isoformat()
@@ -180,7 +192,9 @@ async def main():
     with open("static/wildlife_cache.json", "w") as f:
         json.dump(cache, f)
     
-    import os
+    store_dir = "static/observation_store"
+    write_features(cache["features"], store_dir, stats={"generated": cache["generated"]}, derive=build_derived)
+    
     print(f"\n{'='*50}")
     print(f"✅ Added {new_count:,} GBIF records!")
     print(f"   Total observations: {cache['total_observations']:,}")
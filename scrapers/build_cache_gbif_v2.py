@@ -9,6 +9,10 @@ import certifi
 import json
 from datetime import datetime, timezone
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from observation_store import build_derived, write_features
 
 GBIF_BASE = "https://api.gbif.org/v1"
 
@@ -197,7 +201,19 @@ async def main():
     with open(cache_path, "w") as f:
         json.dump({"type": "FeatureCollection", "features": final_features}, f)
     
+    store_dir = "../data/gbif_observation_store"
+    write_features(final_features, store_dir, stats={"generated": datetime.now(timezone.utc).isoformat()}, derive=build_derived)
+    
     print(f"\n✅ Complete! {len(final_features):,} total records saved")
+    print(f"   Store: {store_dir}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # With a GBIF download zip (see gbif_download.py) build the store from
+    # the archive instead of paging /occurrence/search, which stops at 100k
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    archive = args[0] if args else os.environ.get("GBIF_DOWNLOAD_ZIP")
+    if archive:
+        from gbif_download import ingest
+        ingest(archive, "../data/gbif_observation_store", dedup="--dedup" in sys.argv)
+    else:
+        asyncio.run(main())
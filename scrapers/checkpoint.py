@@ -0,0 +1,214 @@
+"""
+Append-only checkpoints for resumable collectors.
+
+Replaces the old save_progress() pattern that re-serialized every
+collected feature after each chunk. A checkpoint directory holds:
+
+    manifest.jsonl           one line per finished chunk: key, segment, count
+    segments/000001.jsonl    the features of that chunk, one JSON per line
+
+Checkpointing a chunk writes only that chunk's segment and appends one
+manifest line, so an overnight run is O(total) in bytes written instead
+of O(n^2). Resume reads the manifest and streams segments back lazily.
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+
+MANIFEST = "manifest.jsonl"
+SEGMENTS = "segments"
+
+
+def _feature_id(feature):
+    props = feature.get("properties") if "properties" in feature else feature
+    return props.get("id")
+
+
+class CheckpointLog:
+    """Segment log plus manifest of completed chunk keys."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.segment_dir = os.path.join(directory, SEGMENTS)
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        os.makedirs(self.segment_dir, exist_ok=True)
+
+        self.entries = []     # manifest lines, in append order
+        self.completed = {}   # key -> manifest entry (complete chunks only)
+        self._next_seq = 1
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn final line from a crash mid-append; the chunk
+                    # is simply redone on resume.
+                    continue
+                self._track(entry)
+
+    def _track(self, entry):
+        self.entries.append(entry)
+        if entry.get("complete", True):
+            self.completed[entry["key"]] = entry
+        seq = entry.get("seq", 0)
+        self._next_seq = max(self._next_seq, seq + 1)
+
+    def __contains__(self, key):
+        return key in self.completed
+
+    def __len__(self):
+        """Total features across all segments (before dedup)."""
+        return sum(e.get("count", 0) for e in self.entries)
+
+    def last(self, key_prefix=None):
+        """Most recent manifest entry, optionally restricted to a key prefix."""
+        for entry in reversed(self.entries):
+            if key_prefix is None or entry["key"].startswith(key_prefix):
+                return entry
+        return None
+
+    def append(self, key, features, complete=True, **info):
+        """
+        Record one finished chunk.
+
+        The segment is written to a temp file and renamed before the
+        manifest line is appended, so a crash can never leave a manifest
+        entry pointing at a partial segment.
+        """
+        seq = self._next_seq
+        segment = f"{seq:06d}.jsonl"
+        path = os.path.join(self.segment_dir, segment)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            for feat in features:
+                f.write(json.dumps(feat))
+                f.write("\n")
+        os.replace(tmp, path)
+
+        entry = {
+            "key": key,
+            "seq": seq,
+            "segment": segment,
+            "count": len(features),
+            "complete": complete,
+            "at": datetime.now().isoformat(timespec="seconds"),
+        }
+        entry.update(info)
+        with open(self.manifest_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._track(entry)
+        return entry
+
+    def segments(self):
+        """Distinct segment files in manifest order."""
+        seen = set()
+        for entry in self.entries:
+            seg = entry["segment"]
+            if seg not in seen:
+                seen.add(seg)
+                yield seg
+
+    def iter_features(self):
+        """Stream every checkpointed feature back, segment by segment."""
+        for seg in self.segments():
+            path = os.path.join(self.segment_dir, seg)
+            if not os.path.exists(path):
+                continue
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    def iter_unique(self):
+        """Like iter_features(), skipping repeated ids."""
+        seen = set()
+        for feat in self.iter_features():
+            fid = _feature_id(feat)
+            if fid is not None:
+                if fid in seen:
+                    continue
+                seen.add(fid)
+            yield feat
+
+    def compact(self):
+        """
+        Merge all segments into one deduplicated segment.
+
+        The manifest is rewritten to point every key at the merged
+        segment. Old segments are removed only after the new manifest is
+        in place.
+        """
+        if len(list(self.segments())) <= 1:
+            return
+
+        seq = self._next_seq
+        merged = f"{seq:06d}.jsonl"
+        merged_path = os.path.join(self.segment_dir, merged)
+        count = 0
+        with open(f"{merged_path}.tmp", "w") as f:
+            for feat in self.iter_unique():
+                f.write(json.dumps(feat))
+                f.write("\n")
+                count += 1
+        os.replace(f"{merged_path}.tmp", merged_path)
+
+        old_segments = set(self.segments())
+        entries = []
+        for i, entry in enumerate(self.entries):
+            entry = dict(entry, segment=merged, count=count if i == 0 else 0, seq=seq)
+            entries.append(entry)
+
+        tmp_manifest = f"{self.manifest_path}.tmp"
+        with open(tmp_manifest, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_manifest, self.manifest_path)
+
+        self.entries, self.completed = [], {}
+        self._next_seq = seq + 1
+        for entry in entries:
+            self._track(entry)
+
+        for seg in old_segments:
+            try:
+                os.remove(os.path.join(self.segment_dir, seg))
+            except FileNotFoundError:
+                pass
+
+    def import_legacy(self, progress_file, keys=lambda p: [], extra=lambda p: {}):
+        """
+        One-time import of an old monolithic progress.json.
+
+        Its features become a single segment covering `keys(progress)`,
+        so runs started before the checkpoint log existed resume where
+        they were. `extra(progress)` adds fields (e.g. offsets) to the
+        imported manifest entry.
+        """
+        if self.entries or not os.path.exists(progress_file):
+            return False
+        with open(progress_file) as f:
+            legacy = json.load(f)
+        features = legacy.get("features", [])
+        entry = self.append("legacy", features, complete=False, **extra(legacy))
+        for key in keys(legacy):
+            self._add_alias(key, entry)
+        shutil.move(progress_file, f"{progress_file}.imported")
+        return True
+
+    def _add_alias(self, key, entry):
+        alias = {"key": key, "seq": entry["seq"], "segment": entry["segment"], "count": 0, "complete": True}
+        with open(self.manifest_path, "a") as f:
+            f.write(json.dumps(alias) + "\n")
+        self._track(alias)
@@ -1,17 +1,21 @@
 #!/usr/bin/env python3
 """
 EXPANDED Collection v2 - by month, resumes, loops incomplete
+
+Months are planned with the iNat planner, so full calendar months are
+fetched (the old fixed d2 of the 28th/30th dropped day 31 and Feb 29)
+and busy months are split instead of truncated at 10,000.
 """
 
-import requests
-import json
-import time
+import asyncio
 import os
 from datetime import datetime
+from collector_runtime import CollectorSpec, collect
+from inat_planner import InatPlanner, month_windows, plan_all
 
 OUTPUT_DIR = "../data/expanded_cache"
-PROGRESS_FILE = f"{OUTPUT_DIR}/progress.json"
-RATE_LIMIT_DELAY = 0.8
+PROGRESS_FILE = f"{OUTPUT_DIR}/progress.json"  # legacy, imported once
+CHECKPOINT_DIR = f"{OUTPUT_DIR}/checkpoints_v2"
 
 BOUNDS = {"swlat": 36.9, "swlng": -114.1, "nelat": 42.0, "nelng": -109.0}
 
@@ -31,102 +35,47 @@ def log(msg):
     with open(f"{OUTPUT_DIR}/v2.log", "a") as f:
         f.write(f"[{ts}] {msg}\n")
 
-def load_progress():
-    if os.path.exists(PROGRESS_FILE):
-        with open(PROGRESS_FILE) as f:
-            return json.load(f)
-    return {"completed": {}, "features": []}
-
-def save_progress(data):
-    with open(PROGRESS_FILE, 'w') as f:
-        json.dump(data, f)
+def parse_observation(obs, taxon_name):
+    if not obs.get("location"):
+        return None
+    try:
+        lat, lng = map(float, obs["location"].split(","))
+    except ValueError:
+        return None
+    observed = obs.get("observed_on") or ""
+    return {
+        "id": f"inat_{obs['id']}",
+        "species": obs.get("taxon", {}).get("name", ""),
+        "taxon": taxon_name,
+        "lat": lat, "lng": lng,
+        "year": int(observed[:4]) if observed[:4].isdigit() else None,
+        "month": int(observed[5:7]) if observed[5:7].isdigit() else None,
+        "source": "inat"
+    }
 
-def collect_month(taxon_id, taxon_name, year, month):
-    """Collect one month. Returns (features, is_complete)."""
-    features = []
-    page = 1
-    
-    while page <= 50:
-        params = {
-            "taxon_id": taxon_id,
-            "swlat": BOUNDS["swlat"], "swlng": BOUNDS["swlng"],
-            "nelat": BOUNDS["nelat"], "nelng": BOUNDS["nelng"],
-            "per_page": 200, "page": page,
-            "d1": f"{year}-{month:02d}-01",
-            "d2": f"{year}-{month:02d}-28" if month == 2 else f"{year}-{month:02d}-30",
-            "order_by": "observed_on"
-        }
-        
-        try:
-            resp = requests.get("https://api.inaturalist.org/v1/observations", 
-                              params=params, timeout=60)
-            data = resp.json()
-            results = data.get("results", [])
-            total = data.get("total_results", 0)
-            
-            if not results:
-                break
-            
-            for obs in results:
-                if obs.get("location"):
-                    try:
-                        lat, lng = map(float, obs["location"].split(","))
-                        features.append({
-                            "id": f"inat_{obs['id']}",
-                            "species": obs.get("taxon", {}).get("name", ""),
-                            "taxon": taxon_name,
-                            "lat": lat, "lng": lng,
-                            "year": year, "month": month,
-                            "source": "inat"
-                        })
-                    except:
-                        pass
-            
-            if len(results) < 200:
-                return features, True
-            
-            page += 1
-            time.sleep(RATE_LIMIT_DELAY)
-            
-        except Exception as e:
-            log(f"  Error: {e}")
-            time.sleep(5)
-    
-    is_complete = len(features) < 10000
-    return features, is_complete
+def month_collected(taxon_id):
+    """Months finished by the old fixed-page loop (their day 31 / Feb 29 come from collect_missing_days)."""
+    return lambda checkpoints, w: f"{taxon_id}-{w.d1.year}-{w.d1.month}" in checkpoints
 
 def main():
-    progress = load_progress()
-    completed = progress.get("completed", {})
-    all_features = progress.get("features", [])
-    
-    log(f"Resuming: {len(all_features):,} records, {len(completed)} months done")
-    
-    incomplete = []
-    
-    for taxon in TAXONS:
-        for year in range(2008, 2027):
-            for month in range(1, 13):
-                key = f"{taxon['id']}-{year}-{month}"
-                
-                if key in completed:
-                    continue
-                
-                features, is_complete = collect_month(taxon['id'], taxon['name'], year, month)
-                all_features.extend(features)
-                
-                status = "✓" if is_complete else "⚠"
-                log(f"{taxon['name']} {year}-{month:02d}: +{len(features):,} {status} (total: {len(all_features):,})")
-                
-                if is_complete:
-                    completed[key] = len(features)
-                else:
-                    incomplete.append(key)
-                
-                progress = {"completed": completed, "features": all_features}
-                save_progress(progress)
+    spec = CollectorSpec(
+        name="iNat expanded v2",
+        output_dir=OUTPUT_DIR,
+        output_file="utah_expanded_v2.json",
+        queries=[],
+        parse=lambda obs: parse_observation(obs, None),
+        legacy_progress=(PROGRESS_FILE, lambda p: p.get("completed", {}).keys(), lambda p: {}),
+        checkpoint_dir=CHECKPOINT_DIR,
+        planner=plan_all([
+            InatPlanner(str(taxon["id"]), {"taxon_id": taxon["id"], **BOUNDS},
+                        month_windows(2008, 2026, BOUNDS), skip=month_collected(taxon["id"]),
+                        parse=lambda obs, name=taxon["name"]: parse_observation(obs, name))
+            for taxon in TAXONS
+        ]),
+    )
     
-    log(f"\nDone! {len(all_features):,} total, {len(incomplete)} incomplete months")
+    checkpoints = asyncio.run(collect(spec))
+    log(f"\nDone! {len(checkpoints):,} total")
 
 if __name__ == "__main__":
     main()
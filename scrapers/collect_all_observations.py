@@ -8,15 +8,25 @@ Run with: caffeinate -i python3 collect_all_observations.py
 Estimated: 500k-2M observations over 8-12 hours
 """
 
+import asyncio
 import requests
 import json
 import time
 import os
+import sys
 from datetime import datetime
 
+from collector_runtime import CollectorSpec, collect
+from inat_planner import InatPlanner, year_windows
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from observation_dedup import deduplicate
+from observation_store import build_derived, write_features
+
 # Configuration
 OUTPUT_DIR = "data/full_cache"
 RATE_LIMIT_DELAY = 1.0  # seconds between requests
+INAT_FIRST_YEAR = 2000  # earlier records share one planner window
 
 # Utah bounding box (expanded)
 BOUNDS = {
@@ -59,29 +69,6 @@ def log(msg):
     with open(f"{OUTPUT_DIR}/collection.log", "a") as f:
         f.write(f"[{timestamp}] {msg}\n")
 
-def fetch_inat_page(taxon_id, page, per_page=200):
-    """Fetch a page of iNaturalist observations."""
-    url = "https://api.inaturalist.org/v1/observations"
-    params = {
-        "taxon_id": taxon_id,
-        "swlat": BOUNDS["swlat"],
-        "swlng": BOUNDS["swlng"],
-        "nelat": BOUNDS["nelat"],
-        "nelng": BOUNDS["nelng"],
-        "quality_grade": "research,needs_id",
-        "per_page": per_page,
-        "page": page,
-        "order_by": "observed_on"
-    }
-    
-    try:
-        resp = requests.get(url, params=params, timeout=30)
-        resp.raise_for_status()
-        return resp.json()
-    except Exception as e:
-        log(f"  Error fetching page {page}: {e}")
-        return None
-
 def fetch_gbif_page(taxon_key, offset, limit=300):
     """Fetch a page of GBIF observations."""
     url = "https://api.gbif.org/v1/occurrence/search"
@@ -102,58 +89,48 @@ def fetch_gbif_page(taxon_key, offset, limit=300):
         log(f"  Error fetching GBIF offset {offset}: {e}")
         return None
 
+def parse_inat_observation(obs, taxon_name):
+    if not obs.get("geojson"):
+        return None
+    return {
+        "type": "Feature",
+        "geometry": obs["geojson"],
+        "properties": {
+            "id": obs.get("id"),
+            "species": obs.get("species_guess"),
+            "scientific_name": obs.get("taxon", {}).get("name"),
+            "iconic_taxon": taxon_name,
+            "observed_on": obs.get("observed_on"),
+            "year": int(obs["observed_on"][:4]) if obs.get("observed_on") else None,
+            "month": int(obs["observed_on"][5:7]) if obs.get("observed_on") and len(obs["observed_on"]) >= 7 else None,
+            "photo_url": obs.get("photos", [{}])[0].get("url", "").replace("square", "medium") if obs.get("photos") else None,
+            "source": "inaturalist"
+        }
+    }
+
 def collect_inat_taxon(taxon_id, taxon_name):
-    """Collect all observations for a taxon from iNaturalist."""
+    """
+    Collect all observations for a taxon from iNaturalist.
+    The planner splits by year (and further) so nothing is cut off at
+    the API's 10,000-result paging limit.
+    """
     log(f"Collecting iNaturalist: {taxon_name}")
     
-    all_obs = []
-    page = 1
-    total_available = None
-    
-    while True:
-        data = fetch_inat_page(taxon_id, page)
-        if not data:
-            time.sleep(5)  # Wait and retry
-            data = fetch_inat_page(taxon_id, page)
-            if not data:
-                break
-        
-        if total_available is None:
-            total_available = data.get("total_results", 0)
-            log(f"  Total available: {total_available:,}")
-        
-        results = data.get("results", [])
-        if not results:
-            break
-            
-        for obs in results:
-            if obs.get("geojson"):
-                all_obs.append({
-                    "type": "Feature",
-                    "geometry": obs["geojson"],
-                    "properties": {
-                        "id": obs.get("id"),
-                        "species": obs.get("species_guess"),
-                        "scientific_name": obs.get("taxon", {}).get("name"),
-                        "iconic_taxon": taxon_name,
-                        "observed_on": obs.get("observed_on"),
-                        "year": int(obs["observed_on"][:4]) if obs.get("observed_on") else None,
-                        "month": int(obs["observed_on"][5:7]) if obs.get("observed_on") and len(obs["observed_on"]) >= 7 else None,
-                        "photo_url": obs.get("photos", [{}])[0].get("url", "").replace("square", "medium") if obs.get("photos") else None,
-                        "source": "inaturalist"
-                    }
-                })
-        
-        log(f"  Page {page}: {len(results)} obs, total collected: {len(all_obs):,}")
-        
-        # iNaturalist limits to 10,000 results per query
-        if page * 200 >= min(total_available, 10000):
-            break
-            
-        page += 1
-        time.sleep(RATE_LIMIT_DELAY)
-    
-    return all_obs
+    spec = CollectorSpec(
+        name=f"iNaturalist {taxon_name}",
+        output_dir=OUTPUT_DIR,
+        output_file=f"checkpoint_inat_{taxon_name.lower()}.json",
+        queries=[],
+        parse=lambda obs: parse_inat_observation(obs, taxon_name),
+        checkpoint_dir=f"{OUTPUT_DIR}/checkpoints_inat_{taxon_name.lower()}",
+        planner=InatPlanner(
+            str(taxon_id),
+            {"taxon_id": taxon_id, "quality_grade": "research,needs_id", **BOUNDS},
+            year_windows(INAT_FIRST_YEAR, datetime.now().year, BOUNDS),
+        ),
+    )
+    checkpoints = asyncio.run(collect(spec))
+    return list(checkpoints.iter_unique())
 
 def collect_gbif_taxon(taxon_key, taxon_name):
     """Collect all observations for a taxon from GBIF."""
@@ -250,17 +227,9 @@ def main():
         log(f"  Saved checkpoint: {len(obs):,} {taxon_name}")
         time.sleep(2)
     
-    # Deduplicate by coordinates + date
+    # Deduplicate across sources (iNat records mirrored in GBIF, etc.)
     log("\n--- Deduplicating ---")
-    seen = set()
-    unique_features = []
-    for f in all_features:
-        coords = tuple(f["geometry"]["coordinates"])
-        date = f["properties"].get("observed_on", "")
-        key = (coords, date)
-        if key not in seen:
-            seen.add(key)
-            unique_features.append(f)
+    unique_features = deduplicate(all_features, work_dir=OUTPUT_DIR)
     
     log(f"Before dedup: {len(all_features):,}")
     log(f"After dedup: {len(unique_features):,}")
@@ -292,11 +261,15 @@ def main():
     
     file_size = os.path.getsize(output_file) / (1024 * 1024)
     
+    store_dir = f"{OUTPUT_DIR}/observation_store"
+    write_features(unique_features, store_dir, stats={"generated": cache["generated"], "stats": stats}, derive=build_derived)
+    
     log("\n" + "=" * 60)
     log("COLLECTION COMPLETE")
     log(f"Total observations: {len(unique_features):,}")
     log(f"File size: {file_size:.1f} MB")
     log(f"Output: {output_file}")
+    log(f"Store: {store_dir}")
     log("=" * 60)
     
     # Print summary
@@ -1,19 +1,25 @@
 #!/usr/bin/env python3
 """
 Expanded Utah Wildlife Collector - Research Grade
-Chunks by year+month, resumable, matches existing GeoJSON structure.
+Plans each taxon by month with the iNat planner (no 10k/50-page cap),
+resumable, matches existing GeoJSON structure.
 Run: nohup caffeinate -i python3 collect_expanded.py &
 """
 
-import requests
+import asyncio
 import json
-import time
 import os
+import sys
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from observation_store import build_derived, write_features
+from collector_runtime import CollectorSpec, collect
+from inat_planner import InatPlanner, month_windows, plan_all
+
 OUTPUT_DIR = "data/expanded_cache"
-PROGRESS_FILE = f"{OUTPUT_DIR}/progress.json"
-RATE_LIMIT = 1.0
+PROGRESS_FILE = f"{OUTPUT_DIR}/progress.json"  # legacy, imported once
+CHECKPOINT_DIR = f"{OUTPUT_DIR}/checkpoints"
 
 BOUNDS = {"swlat": 36.9, "swlng": -114.1, "nelat": 42.0, "nelng": -109.0}
 
@@ -23,18 +29,7 @@ INAT_TAXA = [
     (26036, "Reptilia"), (20978, "Amphibia"),
 ]
 
-YEARS = range(2015, 2026)
-MONTHS = range(1, 13)
-
-def load_progress():
-    if os.path.exists(PROGRESS_FILE):
-        with open(PROGRESS_FILE) as f:
-            return json.load(f)
-    return {"completed": [], "features": []}
-
-def save_progress(progress):
-    with open(PROGRESS_FILE, "w") as f:
-        json.dump(progress, f)
+FIRST_YEAR, LAST_YEAR = 2015, 2025
 
 def log(msg):
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -113,79 +108,39 @@ def parse_observation(o):
         }
     }
 
-def fetch_chunk(taxon_id, year, month):
-    """Fetch all observations for taxon/year/month"""
-    features = []
-    page = 1
-    d1 = f"{year}-{month:02d}-01"
-    d2 = f"{year}-{month+1:02d}-01" if month < 12 else f"{year+1}-01-01"
-    
-    while page <= 50:
-        params = {
-            "taxon_id": taxon_id, "d1": d1, "d2": d2,
-            "swlat": BOUNDS["swlat"], "swlng": BOUNDS["swlng"],
-            "nelat": BOUNDS["nelat"], "nelng": BOUNDS["nelng"],
-            "quality_grade": "research,needs_id",
-            "per_page": 200, "page": page
-        }
-        try:
-            r = requests.get("https://api.inaturalist.org/v1/observations", 
-                           params=params, timeout=30)
-            r.raise_for_status()
-            results = r.json().get("results", [])
-            if not results:
-                break
-            for o in results:
-                feat = parse_observation(o)
-                if feat:
-                    features.append(feat)
-            page += 1
-            time.sleep(RATE_LIMIT)
-        except Exception as e:
-            log(f"  Error page {page}: {e}")
-            time.sleep(5)
-            break
-    return features
+def build_spec():
+    windows = month_windows(FIRST_YEAR, LAST_YEAR, BOUNDS)
+    return CollectorSpec(
+        name="iNat expanded",
+        output_dir=OUTPUT_DIR,
+        output_file="utah_expanded.json",
+        queries=[],
+        parse=parse_observation,
+        # The old loop marked a month done even when it hit its 50-page cap
+        # or broke off on an error, and never kept the raw total_results,
+        # so legacy months are re-probed; their features are kept
+        legacy_progress=(PROGRESS_FILE, lambda p: [], lambda p: {}),
+        checkpoint_dir=CHECKPOINT_DIR,
+        planner=plan_all([
+            InatPlanner(
+                str(taxon_id),
+                {"taxon_id": taxon_id, "quality_grade": "research,needs_id", **BOUNDS},
+                windows,
+            )
+            for taxon_id, _ in INAT_TAXA
+        ]),
+    )
 
 def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-    progress = load_progress()
     
     log("="*60)
     log("EXPANDED COLLECTION - RESUMABLE")
-    log(f"Existing features: {len(progress['features']):,}")
-    log(f"Completed chunks: {len(progress['completed'])}")
     log("="*60)
     
-    total_chunks = len(INAT_TAXA) * len(YEARS) * len(MONTHS)
-    
-    for taxon_id, taxon_name in INAT_TAXA:
-        for year in YEARS:
-            for month in MONTHS:
-                key = f"{taxon_id}_{year}_{month}"
-                if key in progress["completed"]:
-                    continue
-                
-                log(f"{taxon_name} {year}-{month:02d} ({len(progress['completed'])}/{total_chunks})")
-                features = fetch_chunk(taxon_id, year, month)
-                progress["features"].extend(features)
-                progress["completed"].append(key)
-                save_progress(progress)
-                
-                if features:
-                    log(f"  +{len(features)} (total: {len(progress['features']):,})")
-    
-    # Final export
-    log("\nBuilding final GeoJSON...")
-    
-    # Deduplicate
-    seen = set()
-    unique = []
-    for f in progress["features"]:
-        k = f["properties"]["id"]
-        if k not in seen:
-            seen.add(k)
-            unique.append(f)
+    # Collection compacts the log, which drops repeated ids
+    checkpoints = asyncio.run(collect(build_spec()))
+    unique = list(checkpoints.iter_unique())
     
     # Build stats
     taxon_dist = {}
@@ -212,9 +167,13 @@ def main():
     
     size_mb = os.path.getsize(outpath) / (1024*1024)
     
+    store_dir = f"{OUTPUT_DIR}/observation_store"
+    write_features(unique, store_dir, stats={"generated": output["generated"]}, derive=build_derived)
+    
     log("="*60)
     log(f"COMPLETE: {len(unique):,} observations")
     log(f"File: {outpath} ({size_mb:.1f} MB)")
+    log(f"Store: {store_dir}")
     log("="*60)
 
 if __name__ == "__main__":
@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
-"""Collect observations from day 31 (and Feb 29) that were missed."""
+"""
+Collect observations from day 31 (and Feb 29) that were missed.
+
+Only needed for months collected before collect_all_expanded_v2 used the
+iNat planner; planned months already cover full calendar months.
+"""
 
 import requests
 import json
 import time
 from datetime import datetime
+from checkpoint import CheckpointLog
 
 OUTPUT_DIR = "../data/expanded_cache"
 PROGRESS_FILE = f"{OUTPUT_DIR}/progress.json"
-MISSING_DAYS_FILE = f"{OUTPUT_DIR}/missing_days_progress.json"
+MISSING_DAYS_FILE = f"{OUTPUT_DIR}/missing_days_progress.json"  # legacy, imported once
+CHECKPOINT_DIR = f"{OUTPUT_DIR}/checkpoints_missing_days"
 RATE_LIMIT_DELAY = 1.1
 
 BOUNDS = {
@@ -38,15 +45,9 @@ def log(msg):
         f.write(f"[{timestamp}] {msg}\n")
 
 def load_missing_progress():
-    try:
-        with open(MISSING_DAYS_FILE) as f:
-            return json.load(f)
-    except:
-        return {"completed": {}, "features": []}
-
-def save_missing_progress(data):
-    with open(MISSING_DAYS_FILE, 'w') as f:
-        json.dump(data, f)
+    checkpoints = CheckpointLog(CHECKPOINT_DIR)
+    checkpoints.import_legacy(MISSING_DAYS_FILE, keys=lambda p: p.get("completed", {}).keys())
+    return checkpoints
 
 def collect_day(taxon_id, taxon_name, year, month, day):
     """Collect one specific day."""
@@ -103,12 +104,10 @@ def collect_day(taxon_id, taxon_name, year, month, day):
     return features
 
 def main():
-    progress = load_missing_progress()
-    completed = progress.get("completed", {})
-    all_features = progress.get("features", [])
+    checkpoints = load_missing_progress()
     
     log(f"=== COLLECTING MISSING DAYS (31st + Feb 29) ===")
-    log(f"Resuming: {len(all_features):,} records, {len(completed)} day-keys done")
+    log(f"Resuming: {len(checkpoints):,} records, {len(checkpoints.completed)} day-keys done")
     
     # Build list of all missing days
     missing_days = []
@@ -129,19 +128,16 @@ def main():
         for year, month, day in missing_days:
             key = f"{taxon['id']}-{year}-{month}-{day}"
             
-            if key in completed:
+            if key in checkpoints:
                 continue
             
             features = collect_day(taxon['id'], taxon['name'], year, month, day)
-            all_features.extend(features)
-            
-            log(f"{taxon['name']} {year}-{month:02d}-{day:02d}: +{len(features):,} (total: {len(all_features):,})")
+            checkpoints.append(key, features)
             
-            completed[key] = len(features)
-            progress = {"completed": completed, "features": all_features}
-            save_missing_progress(progress)
+            log(f"{taxon['name']} {year}-{month:02d}-{day:02d}: +{len(features):,} (total: {len(checkpoints):,})")
     
-    log(f"\nDone! {len(all_features):,} additional observations from missing days")
+    checkpoints.compact()
+    log(f"\nDone! {len(checkpoints):,} additional observations from missing days")
 
 if __name__ == "__main__":
     main()
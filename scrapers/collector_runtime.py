@@ -0,0 +1,375 @@
+"""
+Shared runtime for collectors.
+
+Collectors used to each loop over requests.get() + time.sleep(), with
+their own log() and progress file, so an overnight run spent most of its
+time asleep with one request in flight. Here a collector is a spec:
+
+    spec = CollectorSpec(
+        name="iDigBio",
+        output_dir="data/idigbio_cache",
+        output_file="utah_idigbio.json",
+        queries=[Query("offset", URL, params, OffsetPaginator(...))],
+        parse=parse_item,          # one API record -> GeoJSON feature or None
+    )
+    run_collector(spec)
+
+and the runtime supplies:
+- an aiohttp client with a token bucket per host (rates from
+  data_sources.py, e.g. iNat 1/s, GBIF 3/s) and a cap on requests in flight
+- retries with jittered exponential backoff on 429/5xx and timeouts,
+  honouring Retry-After
+- page / offset / cursor paginators; page and offset queries fetch
+  every remaining page concurrently once the total is known
+- a CheckpointLog per collector, one entry per page, so reruns skip
+  pages that are already done
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from checkpoint import CheckpointLog
+from data_sources import DATA_SOURCES
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from async_runtime import TokenBucket, ssl_context
+
+DEFAULT_RATE = 2.0              # requests/sec for hosts without a known limit
+MAX_IN_FLIGHT = 4               # concurrent requests per host
+REQUEST_TIMEOUT = 60
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 2.0
+BACKOFF_CAP = 120.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Hosts missing from data_sources.py
+HOST_RATES = {
+    "search.idigbio.org": 3.0,
+}
+
+_RATE_UNITS = {"sec": 1, "s": 1, "min": 60, "hour": 3600, "day": 86400}
+
+
+def log(msg):
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{ts}] {msg}", flush=True)
+
+
+def _parse_rate(text: str) -> Optional[float]:
+    """"3/sec" -> 3.0, "100/hour" -> 0.0278"""
+    m = re.match(r"\s*([\d.]+)\s*/\s*([a-z]+)", text or "")
+    if not m or m.group(2) not in _RATE_UNITS:
+        return None
+    return float(m.group(1)) / _RATE_UNITS[m.group(2)]
+
+
+def host_rates() -> Dict[str, float]:
+    """Requests/sec per host from DATA_SOURCES, plus HOST_RATES."""
+    rates = {}
+    for source in DATA_SOURCES.values():
+        rate = _parse_rate(source.get("rate_limit", ""))
+        host = urlparse(source.get("url", "")).hostname
+        if rate and host:
+            rates[host] = rate
+    rates.update(HOST_RATES)
+    return rates
+
+
+class CollectorError(Exception):
+    """A request that failed for good (non-retryable or out of attempts)."""
+
+
+# ============ HTTP CLIENT ============
+
+class CollectorClient:
+    """
+    Async HTTP client shared by every query of a run.
+
+        async with CollectorClient() as client:
+            data = await client.get_json(url, params)
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, max_in_flight: int = MAX_IN_FLIGHT,
+                 headers: Optional[Dict] = None):
+        self.rates = host_rates() if rates is None else rates
+        self.max_in_flight = max_in_flight
+        self.headers = headers or {"User-Agent": "UtahPollinatorPath/1.0"}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self.session = None
+        self.requests = 0
+        self.retries = 0
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(ssl=ssl_context(), limit_per_host=self.max_in_flight)
+        self.session = aiohttp.ClientSession(connector=connector, headers=self.headers)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    def _limits(self, host: str):
+        if host not in self._buckets:
+            rate = self.rates.get(host, DEFAULT_RATE)
+            self._buckets[host] = TokenBucket(rate, max(1, round(rate)))
+            self._slots[host] = asyncio.Semaphore(self.max_in_flight)
+        return self._buckets[host], self._slots[host]
+
+    async def get_json(self, url: str, params: Optional[Dict] = None) -> Any:
+        """GET and decode JSON, retrying transient failures."""
+        bucket, slot = self._limits(urlparse(url).hostname)
+        for attempt in range(MAX_ATTEMPTS):
+            retry_after = None
+            async with slot:
+                await bucket.acquire()
+                self.requests += 1
+                try:
+                    async with self.session.get(
+                        url, params=params, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+                    ) as resp:
+                        if resp.status == 200:
+                            return await resp.json(content_type=None)
+                        if resp.status not in RETRY_STATUSES:
+                            raise CollectorError(f"HTTP {resp.status} for {url}")
+                        error = f"HTTP {resp.status}"
+                        header = resp.headers.get("Retry-After", "")
+                        retry_after = float(header) if header.isdigit() else None
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = type(e).__name__
+                except ValueError:
+                    # Truncated body or an HTML error page served with 200
+                    error = "invalid JSON"
+            if attempt + 1 < MAX_ATTEMPTS:
+                # Full jitter keeps concurrent retries from stampeding
+                delay = retry_after or random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                self.retries += 1
+                log(f"  {error} from {urlparse(url).hostname}, retry {attempt + 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        raise CollectorError(f"{error} for {url} after {MAX_ATTEMPTS} attempts")
+
+
+# ============ PAGINATION ============
+
+class PagePaginator:
+    """?page=N&per_page=M, with the total in the response (iNaturalist)."""
+
+    sequential = False
+
+    def __init__(self, per_page: int = 200, results_key: str = "results", total_key: str = "total_results",
+                 page_param: str = "page", per_page_param: str = "per_page", max_results: Optional[int] = None):
+        self.per_page = per_page
+        self.results_key = results_key
+        self.total_key = total_key
+        self.page_param = page_param
+        self.per_page_param = per_page_param
+        self.max_results = max_results
+
+    def first(self):
+        return 1
+
+    def params(self, position) -> Dict:
+        return {self.page_param: position, self.per_page_param: self.per_page}
+
+    def results(self, data) -> List:
+        return data.get(self.results_key) or []
+
+    def total(self, data) -> int:
+        return int(data.get(self.total_key) or 0)
+
+    def positions(self, total: int) -> List:
+        """Every page position for `total` results."""
+        if self.max_results:
+            total = min(total, self.max_results)
+        return list(range(1, -(-total // self.per_page) + 1))
+
+
+class OffsetPaginator(PagePaginator):
+    """?offset=N&limit=M (GBIF, iDigBio)."""
+
+    def __init__(self, limit: int = 300, results_key: str = "results", total_key: str = "count",
+                 offset_param: str = "offset", limit_param: str = "limit", max_results: Optional[int] = None):
+        super().__init__(limit, results_key, total_key, offset_param, limit_param, max_results)
+
+    def first(self):
+        return 0
+
+    def positions(self, total: int) -> List:
+        if self.max_results:
+            total = min(total, self.max_results)
+        return list(range(0, total, self.per_page))
+
+
+class CursorPaginator:
+    """
+    Opaque continuation token taken from each response.
+    `next_cursor(data, results)` returns None when there are no more pages.
+    Pages are fetched one at a time.
+    """
+
+    sequential = True
+
+    def __init__(self, cursor_param: str, next_cursor: Callable[[Dict, List], Any],
+                 results_key: str = "results", start=None, extra_params: Optional[Dict] = None):
+        self.cursor_param = cursor_param
+        self.next_cursor = next_cursor
+        self.results_key = results_key
+        self.start = start
+        self.extra_params = extra_params or {}
+
+    def first(self):
+        return self.start
+
+    def params(self, position) -> Dict:
+        params = dict(self.extra_params)
+        if position is not None:
+            params[self.cursor_param] = position
+        return params
+
+    def results(self, data) -> List:
+        return data.get(self.results_key) or []
+
+
+# ============ COLLECTOR SPECS ============
+
+@dataclass
+class Query:
+    """One paginated request stream; `key` prefixes its checkpoint keys."""
+    key: str
+    url: str
+    params: Dict
+    paginator: Any
+    parse: Optional[Callable[[Dict], Optional[Dict]]] = None   # overrides spec.parse
+
+
+@dataclass
+class CollectorSpec:
+    name: str
+    output_dir: str
+    output_file: str
+    queries: List[Query]
+    parse: Callable[[Dict], Optional[Dict]]
+    metadata: Dict = field(default_factory=dict)
+    # Old progress.json to import once: (path, keys(progress), extra(progress))
+    legacy_progress: Optional[tuple] = None
+    # Defaults to <output_dir>/checkpoints
+    checkpoint_dir: Optional[str] = None
+    # async (client, spec, checkpoints) -> more Queries, e.g. inat_planner
+    planner: Optional[Callable] = None
+
+
+async def _fetch_page(client, spec, checkpoints, query, position, total=None):
+    """Fetch, parse and checkpoint one page; returns the total it reports."""
+    paginator = query.paginator
+    data = await client.get_json(query.url, dict(query.params, **paginator.params(position)))
+    if total is None:
+        total = paginator.total(data)
+    parse = query.parse or spec.parse
+    features = [f for f in (parse(r) for r in paginator.results(data)) if f]
+    checkpoints.append(f"{query.key}-{position}", features, total=total)
+    return total
+
+
+async def _run_query(client, spec, checkpoints, query):
+    paginator = query.paginator
+
+    if paginator.sequential:
+        last = checkpoints.last(f"{query.key}-")
+        position = last.get("next_cursor") if last else paginator.first()
+        if last and position is None:
+            return  # finished on a previous run
+        n = 0
+        while True:
+            try:
+                params = dict(query.params, **paginator.params(position))
+                data = await client.get_json(query.url, params)
+            except CollectorError as e:
+                log(f"  {query.key}: {e}")
+                return
+            results = paginator.results(data)
+            cursor = paginator.next_cursor(data, results) if results else None
+            parse = query.parse or spec.parse
+            features = [f for f in (parse(r) for r in results) if f]
+            checkpoints.append(f"{query.key}-{position}", features, next_cursor=cursor)
+            n += len(results)
+            if cursor is None:
+                break
+            position = cursor
+        log(f"  {query.key}: {n:,} records")
+        return
+
+    # Page/offset: learn the total from the first page, then fetch the
+    # rest concurrently (the host bucket sets the pace)
+    first = paginator.first()
+    first_key = f"{query.key}-{first}"
+    total = checkpoints.completed[first_key].get("total") if first_key in checkpoints else None
+    if total is None:
+        try:
+            total = await _fetch_page(client, spec, checkpoints, query, first)
+        except CollectorError as e:
+            log(f"  {query.key}: {e}")
+            return
+
+    todo = [p for p in paginator.positions(total) if f"{query.key}-{p}" not in checkpoints]
+    log(f"  {query.key}: {total:,} available, {len(todo)} pages to fetch")
+
+    async def fetch(position):
+        try:
+            await _fetch_page(client, spec, checkpoints, query, position, total=total)
+        except CollectorError as e:
+            log(f"  {query.key}-{position}: {e} (will retry next run)")
+
+    await asyncio.gather(*(fetch(p) for p in todo))
+
+
+async def collect(spec: CollectorSpec, client: Optional[CollectorClient] = None) -> CheckpointLog:
+    """Run every query of a spec concurrently; returns the compacted checkpoint log."""
+    os.makedirs(spec.output_dir, exist_ok=True)
+    checkpoints = CheckpointLog(spec.checkpoint_dir or os.path.join(spec.output_dir, "checkpoints"))
+    if spec.legacy_progress:
+        path, keys, extra = spec.legacy_progress
+        checkpoints.import_legacy(path, keys=keys, extra=extra)
+    log(f"=== {spec.name}: {len(checkpoints):,} records checkpointed ===")
+
+    async def run(client):
+        queries = list(spec.queries)
+        if spec.planner:
+            queries += await spec.planner(client, spec, checkpoints)
+        log(f"  {len(queries)} queries")
+        await asyncio.gather(*(_run_query(client, spec, checkpoints, q) for q in queries))
+
+    if client is None:
+        async with CollectorClient() as client:
+            await run(client)
+    else:
+        await run(client)
+
+    checkpoints.compact()
+    return checkpoints
+
+
+def run_collector(spec: CollectorSpec) -> List[Dict]:
+    """Collect, then write the deduplicated features as a FeatureCollection."""
+    checkpoints = asyncio.run(collect(spec))
+    unique = list(checkpoints.iter_unique())
+
+    output = {
+        "type": "FeatureCollection",
+        "metadata": dict(spec.metadata, collected=datetime.now().isoformat()),
+        "features": unique,
+    }
+    output_file = os.path.join(spec.output_dir, spec.output_file)
+    with open(output_file, "w") as f:
+        json.dump(output, f)
+
+    log(f"=== Done: {len(unique):,} {spec.name} records -> {output_file} ===")
+    return unique
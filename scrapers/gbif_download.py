@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+GBIF bulk download ingestion.
+
+/occurrence/search paging stops at offset 100,000 per query, far short of
+the ~11.6M Utah records GBIF holds. The download API has no such limit: it
+builds a zip (SIMPLE_CSV or Darwin Core Archive) that is streamed here,
+row by row, straight from the zip into the observation store. Nothing is
+extracted to disk and rows are never all in memory.
+
+    # ask GBIF for a download (GBIF_USER / GBIF_PASSWORD / GBIF_EMAIL)
+    python gbif_download.py request data/gbif_utah.zip
+
+    # ingest a downloaded (or fixture) archive
+    python gbif_download.py ingest data/gbif_utah.zip ../data/gbif_observation_store [--dedup]
+"""
+
+import io
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from datetime import datetime, timezone
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from observation_store import ObservationStoreWriter, build_derived
+
+GBIF_BASE = "https://api.gbif.org/v1"
+POLL_INTERVAL = 60  # seconds between download status checks
+
+UTAH_POLYGON = "POLYGON((-114.05 36.99,-109.04 36.99,-109.04 42.0,-114.05 42.0,-114.05 36.99))"
+
+_DWC_NS = "{http://rs.tdwg.org/dwc/text/}"
+
+# GBIF class / kingdom -> iNaturalist iconic taxon, as the search-API
+# collectors label their records. Anything else is left unlabelled.
+ICONIC_CLASSES = {
+    "Aves": "Aves", "Insecta": "Insecta", "Hexapoda": "Insecta", "Mammalia": "Mammalia",
+    "Reptilia": "Reptilia", "Amphibia": "Amphibia", "Arachnida": "Arachnida",
+    "Actinopterygii": "Actinopterygii",
+}
+ICONIC_PHYLA = {"Mollusca": "Mollusca"}
+ICONIC_KINGDOMS = {"Plantae": "Plantae", "Fungi": "Fungi", "Animalia": "Animalia"}
+
+
+def log(msg):
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{ts}] {msg}", flush=True)
+
+
+# ============ REQUEST / DOWNLOAD ============
+
+def utah_predicate(taxon_keys=None):
+    """Occurrences with clean coordinates inside Utah, optionally for some taxa."""
+    predicates = [
+        {"type": "within", "geometry": UTAH_POLYGON},
+        {"type": "equals", "key": "HAS_COORDINATE", "value": "true"},
+        {"type": "equals", "key": "HAS_GEOSPATIAL_ISSUE", "value": "false"},
+    ]
+    if taxon_keys:
+        predicates.append({"type": "in", "key": "TAXON_KEY", "values": [str(k) for k in taxon_keys]})
+    return {"type": "and", "predicates": predicates}
+
+
+def request_download(predicate, user, password, email, fmt="SIMPLE_CSV"):
+    """Start a GBIF download; returns its key."""
+    body = {
+        "creator": user,
+        "notificationAddresses": [email] if email else [],
+        "sendNotification": bool(email),
+        "format": fmt,
+        "predicate": predicate,
+    }
+    r = requests.post(f"{GBIF_BASE}/occurrence/download/request", json=body, auth=(user, password), timeout=60)
+    r.raise_for_status()
+    return r.text.strip()
+
+
+def wait_for_download(key, poll_interval=POLL_INTERVAL):
+    """Block until GBIF has built the archive; returns its download link."""
+    while True:
+        r = requests.get(f"{GBIF_BASE}/occurrence/download/{key}", timeout=60)
+        r.raise_for_status()
+        info = r.json()
+        status = info.get("status")
+        log(f"Download {key}: {status} ({info.get('totalRecords', 0):,} records)")
+        if status == "SUCCEEDED":
+            return info["downloadLink"]
+        if status in ("KILLED", "CANCELLED", "FAILED", "FILE_ERASED"):
+            raise RuntimeError(f"GBIF download {key} ended with status {status}")
+        time.sleep(poll_interval)
+
+
+def fetch_archive(url, path, chunk_size=1 << 20):
+    """Stream the zip to `path` (via a temp file, so a cut-off transfer is never mistaken for an archive)."""
+    tmp = f"{path}.part"
+    with requests.get(url, stream=True, timeout=300) as r:
+        r.raise_for_status()
+        with open(tmp, "wb") as f:
+            for chunk in r.iter_content(chunk_size):
+                f.write(chunk)
+    os.replace(tmp, path)
+    return path
+
+
+# ============ ARCHIVE PARSING ============
+
+def _core_layout(zf):
+    """
+    (member name, column names, header lines to skip) of the occurrence file.
+    DwC-A describes it in meta.xml; SIMPLE_CSV is a single tab-separated
+    file with a header row.
+    """
+    names = zf.namelist()
+    if "meta.xml" in names:
+        core = ET.fromstring(zf.read("meta.xml")).find(f"{_DWC_NS}core")
+        location = core.find(f"{_DWC_NS}files/{_DWC_NS}location").text.strip()
+        fields = {}
+        for field in core.findall(f"{_DWC_NS}field"):
+            if field.get("index") is not None:
+                fields[int(field.get("index"))] = field.get("term").rstrip("/").rsplit("/", 1)[-1]
+        columns = [fields.get(i, f"col{i}") for i in range(max(fields) + 1)]
+        return location, columns, int(core.get("ignoreHeaderLines", "0"))
+
+    data_files = [n for n in names if n.endswith((".csv", ".txt")) and not n.endswith("/")]
+    if not data_files:
+        raise ValueError("No occurrence file in archive")
+    with zf.open(data_files[0]) as raw:
+        header = io.TextIOWrapper(raw, encoding="utf-8", newline="").readline()
+    return data_files[0], header.rstrip("\r\n").split("\t"), 1
+
+
+def iter_rows(zip_path):
+    """Yield each occurrence as a dict of column -> string, streamed from the zip."""
+    with zipfile.ZipFile(zip_path) as zf:
+        member, columns, skip = _core_layout(zf)
+        with zf.open(member) as raw:
+            # GBIF strips tabs and newlines from values, so no quoting rules apply
+            for n, line in enumerate(io.TextIOWrapper(raw, encoding="utf-8", newline="")):
+                if n < skip:
+                    continue
+                values = line.rstrip("\r\n").split("\t")
+                if len(values) > 1:
+                    yield dict(zip(columns, values))
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def iconic_taxon(row):
+    """iNaturalist-style iconic taxon of a GBIF row (Magnoliopsida -> Plantae)."""
+    return (ICONIC_CLASSES.get(row.get("class"))
+            or ICONIC_PHYLA.get(row.get("phylum"))
+            or ICONIC_KINGDOMS.get(row.get("kingdom")))
+
+
+def record_from_row(row):
+    """Map a GBIF occurrence row onto the record shape the other GBIF collectors write."""
+    try:
+        lat = float(row.get("decimalLatitude") or "")
+        lng = float(row.get("decimalLongitude") or "")
+    except ValueError:
+        return None
+    year, month, day = _int(row.get("year")), _int(row.get("month")), _int(row.get("day"))
+    observed_on = (row.get("eventDate") or "")[:10] or None
+    if not observed_on and year:
+        observed_on = f"{year}" + (f"-{month:02d}" if month else "") + (f"-{day:02d}" if month and day else "")
+    return {
+        "id": f"gbif-{row.get('gbifID')}",
+        "species": row.get("vernacularName") or row.get("species") or row.get("genus") or None,
+        "scientific_name": row.get("scientificName") or None,
+        "iconic_taxon": iconic_taxon(row),
+        "lat": round(lat, 5),
+        "lng": round(lng, 5),
+        "observed_on": observed_on,
+        "year": year,
+        "month": month,
+        "day": day,
+        "source": "gbif",
+        "institution": row.get("institutionCode") or None,
+        "catalog_number": row.get("catalogNumber") or None,
+        "basis": row.get("basisOfRecord") or None,
+        "recorded_by": row.get("recordedBy") or None,
+    }
+
+
+def iter_records(zip_path):
+    for row in iter_rows(zip_path):
+        record = record_from_row(row)
+        if record:
+            yield record
+
+
+def ingest(zip_path, store_dir, dedup=False, tiles=True):
+    """Stream an archive into a new build of the observation store. Returns rows written."""
+    records = iter_records(zip_path)
+    stats = {"generated": datetime.now(timezone.utc).isoformat(), "archive": os.path.basename(zip_path)}
+    if dedup:
+        from observation_dedup import DedupEngine
+        engine = DedupEngine(work_dir=os.path.dirname(os.path.abspath(store_dir)))
+        records = engine.run(records)
+
+    writer = ObservationStoreWriter(store_dir)
+    for n, record in enumerate(records, 1):
+        writer.append(record)
+        if n % 500000 == 0:
+            log(f"  {n:,} rows")
+    if dedup:
+        stats["dedup"] = engine.stats
+    writer.close(stats, derive=build_derived if tiles else None)
+    log(f"Ingested {writer.count:,} records into {store_dir}")
+    return writer.count
+
+
+def main():
+    if len(sys.argv) >= 3 and sys.argv[1] == "request":
+        user, password = os.environ.get("GBIF_USER"), os.environ.get("GBIF_PASSWORD")
+        if not user or not password:
+            print("Set GBIF_USER and GBIF_PASSWORD")
+            sys.exit(1)
+        key = request_download(utah_predicate(), user, password, os.environ.get("GBIF_EMAIL"))
+        log(f"Requested GBIF download {key}")
+        fetch_archive(wait_for_download(key), sys.argv[2])
+        log(f"Saved {sys.argv[2]}")
+    elif len(sys.argv) >= 4 and sys.argv[1] == "ingest":
+        ingest(sys.argv[2], sys.argv[3], dedup="--dedup" in sys.argv)
+    else:
+        print(__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+iNaturalist query planner.
+
+/v1/observations refuses page * per_page beyond 10,000, so a month of
+Insecta in summer, or any un-windowed taxon query, used to be silently
+truncated. The planner probes each date window (the probe is page 1
+ordered by id, so its results are always kept) and from total_results
+decides:
+
+    total <= PAGE_CAP     page through the window; pages run concurrently
+    total <= CURSOR_MAX   id_above cursor paging - no cap, one pass
+    larger                bisect the date range (then the bbox for a
+                          single day) and plan each half
+
+Windows are real calendar ranges with inclusive d1/d2, so month ends and
+Feb 29 are covered. Every decision is checkpointed, so a rerun resumes
+without re-probing.
+
+    planner = InatPlanner("47158", {"taxon_id": 47158}, month_windows(2015, 2025, BOUNDS))
+    spec = CollectorSpec(..., queries=[], planner=planner)
+"""
+
+import asyncio
+import calendar
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+from collector_runtime import CollectorError, CursorPaginator, PagePaginator, Query, log
+
+INAT_OBSERVATIONS = "https://api.inaturalist.org/v1/observations"
+PER_PAGE = 200
+PAGE_CAP = 10000          # iNat refuses deeper page paging
+CURSOR_MAX = 50000        # bigger windows are split so halves run in parallel
+MIN_BBOX_DEG = 0.05       # stop splitting space below this
+
+
+@dataclass(frozen=True)
+class Window:
+    d1: date
+    d2: date
+    bbox: Dict  # swlat, swlng, nelat, nelng
+
+    def params(self) -> Dict:
+        return dict(self.bbox, d1=self.d1.isoformat(), d2=self.d2.isoformat())
+
+    def key(self, prefix: str, root_bbox: Optional[Dict] = None) -> str:
+        key = f"{prefix}:{self.d1}:{self.d2}"
+        if root_bbox is not None and self.bbox != root_bbox:
+            b = self.bbox
+            key += f":{b['swlat']:.4f},{b['swlng']:.4f},{b['nelat']:.4f},{b['nelng']:.4f}"
+        return key
+
+    def split(self) -> List["Window"]:
+        """Two date halves, or four bbox quadrants for a single day."""
+        if self.d1 < self.d2:
+            mid = date.fromordinal((self.d1.toordinal() + self.d2.toordinal()) // 2)
+            return [Window(self.d1, mid, self.bbox), Window(date.fromordinal(mid.toordinal() + 1), self.d2, self.bbox)]
+        b = self.bbox
+        if b["nelat"] - b["swlat"] < MIN_BBOX_DEG:
+            return []
+        mlat, mlng = (b["swlat"] + b["nelat"]) / 2, (b["swlng"] + b["nelng"]) / 2
+        return [
+            Window(self.d1, self.d2, {"swlat": lat0, "swlng": lng0, "nelat": lat1, "nelng": lng1})
+            for lat0, lat1 in ((b["swlat"], mlat), (mlat, b["nelat"]))
+            for lng0, lng1 in ((b["swlng"], mlng), (mlng, b["nelng"]))
+        ]
+
+
+def month_windows(first_year: int, last_year: int, bbox: Dict, months=range(1, 13)) -> List[Window]:
+    """One window per calendar month, last day included."""
+    return [
+        Window(date(y, m, 1), date(y, m, calendar.monthrange(y, m)[1]), bbox)
+        for y in range(first_year, last_year + 1)
+        for m in months
+    ]
+
+
+def year_windows(first_year: int, last_year: int, bbox: Dict, earliest: Optional[date] = date(1800, 1, 1)) -> List[Window]:
+    """
+    One window per calendar year, plus one for everything before
+    first_year. Fixed boundaries keep checkpoint keys stable across runs.
+    """
+    windows = [Window(earliest, date(first_year - 1, 12, 31), bbox)] if earliest else []
+    return windows + [Window(date(y, 1, 1), date(y, 12, 31), bbox) for y in range(first_year, last_year + 1)]
+
+
+def _next_id(data, results):
+    return results[-1]["id"] if len(results) == PER_PAGE else None
+
+
+class InatPlanner:
+    """
+    Planner for one base query (e.g. one taxon) over a list of windows.
+    `skip(checkpoints, window)` lets a collector skip windows it already
+    has from before the planner existed. `parse` overrides spec.parse for
+    this planner's queries.
+    """
+
+    def __init__(self, prefix: str, params: Dict, windows: List[Window], skip: Optional[Callable] = None,
+                 parse: Optional[Callable] = None, cap: int = PAGE_CAP, cursor_max: int = CURSOR_MAX):
+        self.prefix = prefix
+        self.parse = parse
+        self.params = dict(params, order_by="id", order="asc")
+        self.windows = windows
+        self.skip = skip
+        self.cap = cap
+        self.cursor_max = cursor_max
+        self.probes = 0
+
+    async def __call__(self, client, spec, checkpoints) -> List[Query]:
+        windows = [w for w in self.windows if not (self.skip and self.skip(checkpoints, w))]
+        plans = await asyncio.gather(*(self._plan(client, spec, checkpoints, w) for w in windows))
+        queries = [q for plan in plans for q in plan]
+        log(f"  {self.prefix}: {len(windows)} windows -> {len(queries)} queries ({self.probes} probes)")
+        return queries
+
+    def _query(self, key: str, window: Window, cursor: bool) -> Query:
+        params = dict(self.params, **window.params())
+        if cursor:
+            paginator = CursorPaginator("id_above", _next_id, start=0, extra_params={"per_page": PER_PAGE})
+        else:
+            paginator = PagePaginator(per_page=PER_PAGE)
+        return Query(key, INAT_OBSERVATIONS, params, paginator, parse=self.parse)
+
+    async def _split(self, client, spec, checkpoints, children) -> List[Query]:
+        plans = await asyncio.gather(*(self._plan(client, spec, checkpoints, c) for c in children))
+        return [q for plan in plans for q in plan]
+
+    async def _plan(self, client, spec, checkpoints, window: Window) -> List[Query]:
+        root_bbox = self.windows[0].bbox if self.windows else None
+        key = window.key(self.prefix, root_bbox)
+
+        # Already planned on a previous run
+        if f"{key}:split" in checkpoints:
+            return await self._split(client, spec, checkpoints, window.split())
+        if f"{key}-1" in checkpoints:
+            return [self._query(key, window, cursor=False)]
+        if f"{key}-0" in checkpoints:
+            return [self._query(key, window, cursor=True)]
+
+        self.probes += 1
+        try:
+            data = await client.get_json(INAT_OBSERVATIONS, dict(self.params, **window.params(), page=1, per_page=PER_PAGE))
+        except CollectorError as e:
+            log(f"  {key}: {e} (will retry next run)")
+            return []
+        total = int(data.get("total_results") or 0)
+        results = data.get("results") or []
+
+        if total > self.cursor_max:
+            children = window.split()
+            if children:
+                checkpoints.append(f"{key}:split", [], total=total)
+                return await self._split(client, spec, checkpoints, children)
+
+        parse = self.parse or spec.parse
+        features = [f for f in (parse(r) for r in results) if f]
+        if total <= self.cap:
+            checkpoints.append(f"{key}-1", features, total=total)
+            return [self._query(key, window, cursor=False)]
+        checkpoints.append(f"{key}-0", features, next_cursor=_next_id(data, results))
+        return [self._query(key, window, cursor=True)]
+
+
+def plan_all(planners: List[InatPlanner]) -> Callable:
+    """Combine several planners (e.g. one per taxon) into one spec.planner."""
+    async def plan(client, spec, checkpoints):
+        plans = await asyncio.gather(*(p(client, spec, checkpoints) for p in planners))
+        return [q for plan in plans for q in plan]
+    return plan
@@ -0,0 +1,80 @@
+import math
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+import biodiversity as bd
+
+# iNEXT's spider data, Girdled site (Chao et al. 2014). The iNEXT vignette
+# reports n = 168, S.obs = 26, f1 = 12, f2 = 4, SC = 0.9289, Chao1 = 43.893,
+# observed Shannon / Simpson diversity 12.060 / 7.840 and estimated Simpson
+# diversity 8.175.
+GIRDLED = np.array([46, 22, 17, 15, 15, 9, 8, 6, 6, 4, 2, 2, 2, 2] + [1] * 12)
+
+
+def test_indices_match_inext_girdled():
+    assert GIRDLED.sum() == 168
+    assert bd.richness(GIRDLED) == 26
+    assert bd.coverage(GIRDLED) == pytest.approx(0.9289, abs=5e-5)
+    assert bd.chao1(GIRDLED) == pytest.approx(43.893, abs=5e-4)
+    assert math.exp(bd.shannon(GIRDLED)) == pytest.approx(12.060, abs=5e-4)
+    assert 1 / ((GIRDLED / 168) ** 2).sum() == pytest.approx(7.840, abs=5e-4)
+    assert 1 / (1 - bd.simpson(GIRDLED)) == pytest.approx(8.175, abs=5e-4)
+    assert bd.pielou(GIRDLED) == pytest.approx(bd.shannon(GIRDLED) / math.log(26))
+
+
+def test_indices_are_vectorized_over_replicates():
+    batch = np.stack([GIRDLED, GIRDLED[::-1], np.zeros_like(GIRDLED)])
+    for name, fn in bd.INDICES.items():
+        got = fn(batch)
+        assert got.shape == (3,), name
+        assert got[0] == pytest.approx(fn(GIRDLED)), name
+        assert got[1] == pytest.approx(fn(GIRDLED)), name
+    assert bd.chao1(np.array([3, 1, 1])) == pytest.approx(3 + 4 / 5 * 1)  # no doubletons
+
+
+def _rarefied_by_enumeration(x, m):
+    individuals = np.repeat(np.arange(len(x)), x)
+    draws = list(combinations(range(len(individuals)), m))
+    return sum(len(set(individuals[list(d)])) for d in draws) / len(draws)
+
+
+def test_rarefaction_matches_enumeration():
+    x = np.array([4, 2, 1, 1])
+    curve = bd.richness_curve(x, points=8, extrapolate=1)
+    assert curve["m"] == list(range(1, 9))
+    for m, s in zip(curve["m"], curve["richness"]):
+        assert s == pytest.approx(_rarefied_by_enumeration(x, m), abs=0.005)
+    assert curve["method"][-1] == "observed"
+
+
+def test_extrapolation_follows_chao1_asymptote():
+    curve = bd.richness_curve(GIRDLED, points=40)
+    m = np.array(curve["m"])
+    s = np.array(curve["richness"])
+    assert s[m == 168][0] == 26
+    assert curve["method"][curve["m"].index(168)] == "observed"
+    f0 = bd.chao1(GIRDLED) - 26
+    expected = 26 + f0 * (1 - (1 - 12 / (168 * f0 + 12)) ** (336 - 168))
+    assert s[-1] == pytest.approx(expected, abs=0.005)
+    assert np.all(np.diff(s) > 0) and s[-1] < bd.chao1(GIRDLED)
+
+
+def test_bootstrap_assemblage_adds_undetected_species():
+    p = bd._bootstrap_assemblage(GIRDLED)
+    assert len(p) == 26 + math.ceil(bd.chao1(GIRDLED) - 26)
+    assert p.sum() == pytest.approx(1.0)
+    assert p[26:].sum() == pytest.approx(1 - bd.coverage(GIRDLED))
+
+
+def test_bootstrap_is_seeded_and_brackets_the_estimate():
+    ci = bd.bootstrap(GIRDLED, replicates=200, seed=7)
+    assert ci == bd.bootstrap(GIRDLED, replicates=200, seed=7)
+    assert ci != bd.bootstrap(GIRDLED, replicates=200, seed=8)
+    for name, fn in bd.INDICES.items():
+        low, high = ci[name]
+        assert low <= float(fn(GIRDLED)) <= high, name
+    # Resampling the estimated assemblage draws unseen species
+    assert ci["richness"][1] > 26
+    assert bd.bootstrap(np.array([1]), 200) == {}
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from climate_analytics import _t_quantile, annual_stats, cumulative_gdd, frost_dates, linear_trend, trend_direction
+
+# Two-sided 95% and 99% critical values from a standard t table
+T_975 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 8: 2.306, 10: 2.228, 20: 2.086, 30: 2.042}
+T_995 = {1: 63.657, 2: 9.925, 3: 5.841, 5: 4.032, 10: 3.169, 30: 2.750}
+
+
+@pytest.mark.parametrize("p, table", [(0.975, T_975), (0.995, T_995)])
+def test_t_quantile_matches_table(p, table):
+    df = np.array(sorted(table))
+    expected = np.array([table[d] for d in df])
+    np.testing.assert_allclose(_t_quantile(p, df), expected, atol=2e-3)
+    assert _t_quantile(p, 1) == pytest.approx(table[1], abs=2e-3)
+
+
+def test_linear_trend_worked_example():
+    fit = linear_trend(np.arange(1, 6), np.array([2.0, 4.0, 5.0, 4.0, 5.0]))
+    assert fit["slope"] == pytest.approx(0.6)
+    assert fit["intercept"] == pytest.approx(2.2)
+    assert fit["r2"] == pytest.approx(0.6)
+    stderr = np.sqrt(2.4 / 3 / 10)
+    assert fit["stderr"] == pytest.approx(stderr)
+    assert fit["ci_low"] == pytest.approx(0.6 - 3.18245 * stderr, abs=1e-4)
+    assert fit["ci_high"] == pytest.approx(0.6 + 3.18245 * stderr, abs=1e-4)
+
+
+def test_linear_trend_stacked_and_nan():
+    x = np.arange(10.0)
+    y = np.stack([2 * x + 1, -x, np.where(x < 8, np.nan, x)])
+    fit = linear_trend(x, y)
+    np.testing.assert_allclose(fit["slope"][:2], [2.0, -1.0])
+    assert fit["n"].tolist() == [10, 10, 2]
+    assert np.isnan(fit["slope"][2])  # fewer than 3 points
+    assert trend_direction({k: v[2] for k, v in fit.items() if k != "confidence"}) == "insufficient data"
+
+
+def test_short_noisy_series_is_not_a_trend():
+    # df = 1: the exact t quantile (12.7) keeps this from looking significant
+    fit = linear_trend(np.array([2019.0, 2020.0, 2021.0]), np.array([60.0, 61.2, 61.9]))
+    assert trend_direction(fit) == "stable"
+
+
+def _year(frost_days):
+    dates = np.arange(np.datetime64("2020-01-01"), np.datetime64("2021-01-01"))
+    tmin = np.full(len(dates), 50.0)
+    for d in frost_days:
+        tmin[dates == np.datetime64(d)] = 25.0
+    return dates, tmin
+
+
+def test_frost_dates():
+    dates, tmin = _year(["2020-03-10", "2020-05-01", "2020-10-01", "2020-11-15"])
+    frost = frost_dates(dates, tmin)
+    assert frost["years"].tolist() == [2020]
+    assert str(dates[frost["last_spring"][0]]) == "2020-05-01"
+    assert str(dates[frost["first_fall"][0]]) == "2020-10-01"
+    assert frost["frost_free_days"].tolist() == [152]
+
+
+def test_frost_free_days_with_missing_days():
+    dates, tmin = _year(["2020-05-01", "2020-10-01"])
+    keep = (dates < np.datetime64("2020-07-01")) | (dates >= np.datetime64("2020-08-01"))
+    assert frost_dates(dates[keep], tmin[keep])["frost_free_days"].tolist() == [152]
+
+
+def test_frost_free_year_without_frost():
+    dates, tmin = _year([])
+    frost = frost_dates(dates, tmin)
+    assert frost["last_spring"].tolist() == [-1] and frost["frost_free_days"].tolist() == [-1]
+
+
+def test_gdd_and_annual_stats():
+    dates = np.arange(np.datetime64("2019-12-30"), np.datetime64("2020-01-03"))
+    tmax = np.array([60.0, 70.0, np.nan, 80.0])
+    tmin = np.array([40.0, 50.0, 40.0, 60.0])
+    np.testing.assert_allclose(cumulative_gdd(tmax, tmin, bases=(50,))[0], [0.0, 10.0, 10.0, 30.0])
+    years, means = annual_stats(dates, tmax)
+    assert years.tolist() == [2019, 2020]
+    np.testing.assert_allclose(means, [65.0, 80.0])
@@ -0,0 +1,70 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+import climate_archive
+from climate_archive import ArchiveIncomplete, ClimateArchive, _gaps
+
+
+def _fake_daily(first, last):
+    days = range(first.toordinal(), last.toordinal() + 1)
+    daily = {"time": [date.fromordinal(d).isoformat() for d in days]}
+    for var in climate_archive.VARIABLES:
+        daily[var] = [float(d % 50) for d in days]
+    return daily
+
+
+def _archive(tmp_path, fail=()):
+    archive = ClimateArchive(str(tmp_path / "climate.sqlite"))
+    calls = []
+
+    async def fetch(cell, first, last):
+        calls.append((first, last))
+        archive.fetches += 1
+        return None if first in fail else _fake_daily(first, last)
+
+    archive._fetch = fetch
+    return archive, calls
+
+
+def test_gaps_merge_close_ranges():
+    assert _gaps([], 1, 10) == [(1, 10)]
+    assert _gaps([5], 1, 10, merge=0) == [(1, 4), (6, 10)]
+    assert _gaps([5], 1, 10) == [(1, 10)]
+    assert _gaps(list(range(1, 11)), 1, 10) == []
+
+
+def test_get_daily_fetches_only_missing_days(tmp_path):
+    archive, calls = _archive(tmp_path)
+    first = asyncio.run(archive.get_daily(40.0, -111.0, "2010-01-01", "2010-12-31"))
+    assert len(first["time"]) == 365
+    again = asyncio.run(archive.get_daily(40.0, -111.0, "2010-03-01", "2010-03-31"))
+    assert again["time"][0] == "2010-03-01" and len(again["time"]) == 31
+    assert len(calls) == 1
+
+
+def test_failed_gap_raises_but_keeps_the_rest(tmp_path):
+    archive, calls = _archive(tmp_path, fail={date(2012, 11, 1)})
+    asyncio.run(archive.get_daily(40.0, -111.0, "2011-03-01", "2012-10-31"))
+
+    with pytest.raises(ArchiveIncomplete):
+        asyncio.run(archive.get_daily(40.0, -111.0, "2011-01-01", "2012-12-31"))
+    assert calls[1:] == [(date(2011, 1, 1), date(2011, 2, 28)), (date(2012, 11, 1), date(2012, 12, 31))]
+    # The gap that did come back was stored
+    cell = climate_archive.grid_cell(40.0, -111.0)
+    present = archive._days_present(cell, date(2011, 1, 1).toordinal(), date(2012, 12, 31).toordinal())
+    assert present[0] == date(2011, 1, 1).toordinal()
+    assert present[-1] == date(2012, 10, 31).toordinal()
+
+
+def test_trends_need_every_day_of_every_year():
+    from climate_data_api import _complete_years
+
+    daily = _fake_daily(date(2019, 1, 1), date(2020, 12, 31))
+    assert _complete_years(daily, [2019, 2020])
+    assert not _complete_years(daily, [2019, 2020, 2021])
+
+    daily["temperature_2m_max"][400] = None
+    assert not _complete_years(daily, [2019, 2020])
+    assert _complete_years(daily, [2019])
@@ -0,0 +1,56 @@
+import numpy as np
+
+import elevation
+from elevation import BATCH_SIZE, READ_BATCH, ElevationCache
+
+
+def fake_upstream(cache, fail_on=None):
+    calls = []
+
+    async def fetch(cells):
+        calls.append(len(cells))
+        cache.fetches += 1
+        if fail_on is not None and len(calls) == fail_on:
+            return []
+        return [float(c % 1000) for c in cells.tolist()]
+
+    cache._fetch = fetch
+    return calls
+
+
+def points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(40.0, 41.0, n), rng.uniform(-112.0, -111.0, n)
+
+
+def test_lookup_fetches_missing_cells_once(tmp_path):
+    cache = ElevationCache(str(tmp_path / "elev.sqlite"))
+    calls = fake_upstream(cache)
+    lat, lng = points(2 * READ_BATCH)
+    cells = elevation.geohash.encode_array(lat, lng, elevation.CELL_PRECISION)
+    meters = cache.lookup(lat, lng)
+    assert np.array_equal(meters, (cells % 1000).astype(float))
+    assert sum(calls) == len(np.unique(cells))
+
+    calls.clear()
+    assert np.array_equal(cache.lookup(lat, lng), meters)
+    assert calls == []
+
+
+def test_lookup_without_fetch_reads_cache_only(tmp_path):
+    cache = ElevationCache(str(tmp_path / "elev.sqlite"))
+    calls = fake_upstream(cache)
+    lat, lng = points(10)
+    assert np.isnan(cache.lookup(lat, lng, fetch=False)).all()
+    assert calls == []
+
+
+def test_fill_stops_after_a_failed_batch(tmp_path):
+    cache = ElevationCache(str(tmp_path / "elev.sqlite"))
+    calls = fake_upstream(cache, fail_on=2)
+    lat, lng = points(5 * BATCH_SIZE)
+    meters = cache.lookup(lat, lng)
+    assert len(calls) == 2
+    known = ~np.isnan(meters)
+    cells = elevation.geohash.encode_array(lat, lng, elevation.CELL_PRECISION)
+    assert len(np.unique(cells[known])) == BATCH_SIZE
@@ -0,0 +1,99 @@
+import asyncio
+import random
+from datetime import date
+
+from collector_runtime import CollectorError, CollectorSpec, collect
+from inat_planner import PER_PAGE, InatPlanner, Window, month_windows
+
+BBOX = {"swlat": 37.0, "swlng": -114.0, "nelat": 42.0, "nelng": -109.0}
+
+
+class FakeInat:
+    """/v1/observations over an in-memory list, refusing pages past `cap` like iNat."""
+
+    def __init__(self, observations, cap):
+        self.observations = sorted(observations, key=lambda o: o["id"])
+        self.cap = cap
+        self.calls = []
+
+    async def get_json(self, url, params):
+        self.calls.append(dict(params))
+        d1, d2 = date.fromisoformat(params["d1"]), date.fromisoformat(params["d2"])
+        rows = [
+            o for o in self.observations
+            if d1 <= o["date"] <= d2
+            and params["swlat"] <= o["lat"] < params["nelat"] and params["swlng"] <= o["lng"] < params["nelng"]
+        ]
+        per_page = params["per_page"]
+        if "id_above" in params:
+            rows = [o for o in rows if o["id"] > params["id_above"]]
+            return {"total_results": len(rows), "results": rows[:per_page]}
+        page = params["page"]
+        if page * per_page > self.cap:
+            raise CollectorError("HTTP 403")
+        return {"total_results": len(rows), "results": rows[(page - 1) * per_page:page * per_page]}
+
+
+def parse(o):
+    return {"type": "Feature", "properties": {"id": o["id"]}}
+
+
+def observations(spec, seed=0):
+    """spec: [(date, count)] scattered over BBOX; every id is unique."""
+    rng = random.Random(seed)
+    out = []
+    for day, count in spec:
+        for _ in range(count):
+            out.append({"date": day, "lat": rng.uniform(37.0, 42.0), "lng": rng.uniform(-114.0, -109.0)})
+    # Ids are not in date order, as on iNat
+    rng.shuffle(out)
+    for i, o in enumerate(out):
+        o["id"] = i * 3 + 1
+    return out
+
+
+def run(tmp_path, inat, planner):
+    spec = CollectorSpec(name="test", output_dir=str(tmp_path), output_file="out.json",
+                         queries=[], parse=parse, planner=planner)
+    return asyncio.run(collect(spec, client=inat))
+
+
+def test_windows_cover_calendar_ranges():
+    feb = month_windows(2024, 2024, BBOX, months=[2])[0]
+    assert (feb.d1, feb.d2) == (date(2024, 2, 1), date(2024, 2, 29))
+    halves = feb.split()
+    assert [(w.d1, w.d2) for w in halves] == [(date(2024, 2, 1), date(2024, 2, 15)), (date(2024, 2, 16), date(2024, 2, 29))]
+    quads = Window(date(2024, 2, 1), date(2024, 2, 1), BBOX).split()
+    assert len(quads) == 4 and {q.bbox["swlat"] for q in quads} == {37.0, 39.5}
+    tiny = {"swlat": 40.0, "swlng": -111.0, "nelat": 40.01, "nelng": -110.99}
+    assert Window(date(2024, 2, 1), date(2024, 2, 1), tiny).split() == []
+
+
+def test_planner_pages_cursors_and_bisects(tmp_path):
+    # Jan fits page paging, Feb needs a cursor, Mar must be bisected down
+    # to one day and then split by bbox
+    data = observations(
+        [(date(2024, 1, d), 10) for d in range(1, 31)]
+        + [(date(2024, 2, d), 25) for d in range(1, 29)]
+        + [(date(2024, 3, d), 10) for d in range(1, 31)] + [(date(2024, 3, 31), 1500)]
+    )
+    inat = FakeInat(data, cap=2 * PER_PAGE)
+    planner = InatPlanner("t", {"taxon_id": 1}, month_windows(2024, 2024, BBOX, months=[1, 2, 3]),
+                          cap=2 * PER_PAGE, cursor_max=5 * PER_PAGE)
+    checkpoints = run(tmp_path, inat, planner)
+
+    ids = [f["properties"]["id"] for f in checkpoints.iter_unique()]
+    assert sorted(ids) == sorted(o["id"] for o in data)
+    assert not any(c.get("page", 1) * c["per_page"] > inat.cap for c in inat.calls)
+    assert "t:2024-03-01:2024-03-31:split" in checkpoints
+    assert "t:2024-03-31:2024-03-31:split" in checkpoints
+    # The cursor query resumes after the probe page instead of refetching it
+    assert "t:2024-02-01:2024-02-29-0" in checkpoints
+    assert not [c for c in inat.calls if c.get("id_above") == 0]
+
+    # A rerun resumes from the checkpoints without probing or paging again
+    inat.calls.clear()
+    rerun = InatPlanner("t", {"taxon_id": 1}, month_windows(2024, 2024, BBOX, months=[1, 2, 3]),
+                        cap=2 * PER_PAGE, cursor_max=5 * PER_PAGE)
+    run(tmp_path, inat, rerun)
+    assert rerun.probes == 0 and inat.calls == []
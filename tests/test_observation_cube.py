@@ -0,0 +1,117 @@
+import random
+from collections import Counter, defaultdict
+
+import numpy as np
+import pytest
+
+import geohash
+import observation_store
+from observation_cube import BASE_COLUMNS, AggregateCube, _reduce
+from observation_store import open_store, write_features
+
+TAXA = ["Insecta", "Plantae", "Aves", None]
+SOURCES = ["inaturalist", "gbif", "ebird"]
+SPECIES = [f"Species {i}" for i in range(40)] + [None]
+
+
+def records(n, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        year = rng.choice([0, 2018, 2019, 2020, 2021])
+        out.append({
+            "id": f"r{i}",
+            "lat": rng.uniform(40.0, 41.0),
+            "lng": rng.uniform(-112.5, -111.5),
+            "year": year or None,
+            "month": rng.randint(1, 12) if year else None,
+            "species": rng.choice(SPECIES),
+            "iconic_taxon": rng.choice(TAXA),
+            "source": rng.choice(SOURCES),
+        })
+    return out
+
+
+@pytest.fixture(scope="module")
+def built(tmp_path_factory):
+    rows = records(3000)
+    path = str(tmp_path_factory.mktemp("store"))
+    # Small folds, so the cube is built from many chunk runs
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(observation_store, "CHUNK_ROWS", 128)
+        write_features(rows, path)
+    store = open_store(path)
+    # Group on the stored (float32) coordinates, as the cube does
+    for r, lat, lng in zip(rows, store.column("lat").tolist(), store.column("lng").tolist()):
+        r["lat"], r["lng"] = lat, lng
+    return rows, store
+
+
+def raw_groupby(rows, key, precision=6, species=False, keep=lambda r: True):
+    groups = defaultdict(set) if species else Counter()
+    for r in rows:
+        if not keep(r):
+            continue
+        k = key(r, geohash.encode(r["lat"], r["lng"], precision))
+        if species:
+            if r["species"] is not None:
+                groups[k].add(r["species"])
+        else:
+            groups[k] += 1
+    return {k: len(v) for k, v in groups.items()} if species else dict(groups)
+
+
+def test_chunked_build_equals_one_reduce(built):
+    _, store = built
+    cube = store.cube()
+    whole = AggregateCube.from_store(store)
+    for col in BASE_COLUMNS:
+        assert np.array_equal(np.asarray(cube.base[col]), whole.base[col]), col
+    assert cube.total == len(store)
+
+
+def test_rollup_equals_raw_groupby(built):
+    rows, store = built
+    cube = store.cube()
+
+    got = {(r["year"], r["month"]): r["count"] for r in cube.rollup(("year", "month"))}
+    assert got == raw_groupby(rows, lambda r, cell: (r["year"] or 0, r["month"] or 0))
+
+    for precision in (4, 5, 6, 3):
+        got = {(r["cell"], r["year"]): r["count"] for r in cube.rollup(("cell", "year"), precision=precision)}
+        assert got == raw_groupby(rows, lambda r, cell: (cell, r["year"] or 0), precision)
+
+    got = {r["cell"]: r["species"] for r in cube.rollup(("cell",), measure="species", precision=5)}
+    want = raw_groupby(rows, lambda r, cell: cell, 5, species=True)
+    assert got == {k: want.get(k, 0) for k in got} and set(want) <= set(got)
+
+
+def test_filters_and_histograms(built):
+    rows, store = built
+    cube = store.cube()
+    insects = lambda r: r["iconic_taxon"] == "Insecta" and (r["year"] or 0) >= 2019
+    got = cube.histogram("year", iconic_taxon=["Insecta"], year_min=2019)
+    assert got == raw_groupby(rows, lambda r, cell: r["year"], keep=insects)
+    got = cube.histogram("year", measure="species", iconic_taxon=["Insecta"], year_min=2019)
+    assert got == raw_groupby(rows, lambda r, cell: r["year"], species=True, keep=insects)
+    assert cube.histogram("source") == dict(Counter(r["source"] for r in rows))
+
+
+def test_merge_adds_cubes(built):
+    _, store = built
+    half = len(store) // 2
+    a = AggregateCube(categories=store.categories)
+    a.add_rows(store, np.arange(half))
+    b = AggregateCube(categories=store.categories)
+    b.add_rows(store, np.arange(half, len(store)))
+    a.merge(b)
+    whole = store.cube()
+    assert a.rollup(("cell", "month"), precision=4) == whole.rollup(("cell", "month"), precision=4)
+    assert a.total == whole.total
+
+
+def test_unknown_dimension_is_rejected(built):
+    with pytest.raises(ValueError):
+        built[1].cube().rollup(("species",))
+    with pytest.raises(ValueError):
+        built[1].cube().rollup(("year",), precision=9)
@@ -0,0 +1,91 @@
+import pytest
+
+import observation_dedup as od
+from observation_dedup import DedupEngine, canonical_ids, date_key, normalize_name
+
+
+def feature(id, source, lat=40.7600, lng=-111.8900, date="2021-06-05", name="Apis mellifera", **props):
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [lng, lat]},
+        "properties": dict(id=id, source=source, observed_on=date, scientific_name=name, **props),
+    }
+
+
+def candidate(record):
+    props = od._props(record)
+    lat, lng = od._coords(record)
+    return od._Candidate(lat, lng, None, date_key(props), canonical_ids(props),
+                         od.source_family(props), od._specimen_key(props), record)
+
+
+def run(records):
+    engine = DedupEngine(partitions=4)
+    return list(engine.run(records)), engine.stats
+
+
+def test_name_date_and_id_normalization():
+    assert normalize_name("Apis mellifera Linnaeus, 1758") == "apis mellifera"
+    assert normalize_name("Bombus Latreille") == "bombus"
+    assert normalize_name("Salix x sepulcralis") == "salix sepulcralis"
+    assert date_key({"observed_on": "2021-06-05T10:00"}) == "2021-06-05"
+    assert date_key({"year": 2021, "month": 6}) == "2021-06"
+    assert date_key({"observed_on": "unknown"}) is None
+    assert canonical_ids({"id": "gbif-12"}) == canonical_ids({"id": "gbif_12"}) == ["gbif:12"]
+    assert canonical_ids({"id": 99, "source": "inat"}) == ["inaturalist:99"]
+    assert "inaturalist:99" in canonical_ids({"id": "gbif_5", "institution": "iNaturalist", "catalog_number": "99"})
+
+
+def test_pair_scores():
+    inat = candidate(feature(99, "inat"))
+    mirror = candidate(feature("gbif_5", "gbif", institution="iNaturalist", catalog_number="99", lat=41.0))
+    assert od.score(inat, mirror) == 1.0  # shared id wins over distance
+
+    same_source = candidate(feature(100, "inat"))
+    assert od.score(inat, same_source) == 0.0
+
+    near = candidate(feature("gbif_6", "gbif", lat=40.7600 + 50 / 111195))  # ~50 m north
+    assert od.score(inat, near) == pytest.approx(od.DISTANCE_WEIGHT * 0.8 + od.DATE_WEIGHT, abs=1e-3)
+    month_only = candidate(feature("gbif_7", "gbif", date="2021-06"))
+    assert od.score(inat, month_only) == pytest.approx(od.DISTANCE_WEIGHT + od.DATE_WEIGHT / 2)
+    far = candidate(feature("gbif_8", "gbif", lat=40.7600 + 300 / 111195))
+    assert od.score(inat, far) == 0.0
+
+    a = candidate(feature("idigbio-1", "idigbio", institution="BYU", catalog_number="X1"))
+    b = candidate(feature("gbif_9", "gbif", institution="byu", catalog_number="x1", lat=40.9))
+    c = candidate(feature("gbif_10", "gbif", institution="BYU", catalog_number="X2"))
+    assert od.score(a, b) == 1.0
+    assert od.score(a, c) == 0.0  # two different specimens, however close
+
+
+def test_cross_source_duplicates_merge():
+    inat = feature(99, "inat", place="Salt Lake City")
+    gbif = feature("gbif_5", "gbif", lat=40.7601, institution="iNaturalist", catalog_number="99", license="CC-BY")
+    other = feature(100, "inat", name="Bombus huntii")
+    out, stats = run([inat, gbif, other])
+    assert len(out) == 2 and stats["duplicates"] == 1
+    merged = next(f for f in out if f["properties"]["scientific_name"] == "Apis mellifera")
+    assert merged["properties"]["duplicates"]
+    assert merged["properties"]["place"] == "Salt Lake City"
+    assert merged["properties"]["license"] == "CC-BY"
+
+
+def test_fuzzy_matches_do_not_chain_one_source():
+    # Two distinct iNat observations 100 m apart, and a GBIF record
+    # between them that fuzzily matches both
+    a = feature(1, "inat", lat=40.7600)
+    b = feature(2, "inat", lat=40.7600 + 100 / 111195)
+    g = feature("gbif_3", "gbif", lat=40.7600 + 50 / 111195)
+    out, stats = run([a, g, b])
+    assert len(out) == 2
+    ids = sorted(str(f["properties"]["id"]) for f in out)
+    assert ids[0] in ("1", "2") and ids[1] in ("1", "2")
+
+
+def test_unblockable_records_fall_back_to_exact_ids():
+    no_date = feature("gbif-1", "gbif", date=None)
+    same = feature("gbif_1", "gbif_specimen", date=None)
+    other = feature("gbif-2", "gbif", date=None)
+    out, stats = run([no_date, same, other])
+    assert stats["unblocked"] == 3
+    assert len(out) == 2
@@ -0,0 +1,134 @@
+import os
+
+import numpy as np
+import pytest
+
+from observation_store import (
+    CURRENT,
+    KEEP_BUILDS,
+    ObservationStoreWriter,
+    StoreWatcher,
+    current_build,
+    open_store,
+    write_features,
+)
+
+RECORDS = [
+    {"id": "a1", "lat": 40.76, "lng": -111.89, "observed_on": "2019-06-02", "species": "Western Honey Bee",
+     "scientific_name": "Apis mellifera", "iconic_taxon": "Insecta", "source": "inaturalist",
+     "photo_url": "https://example.org/a1.jpg"},
+    {"id": "a2", "lat": 40.25, "lng": -111.65, "year": 2021, "month": 7, "species": "Showy Milkweed",
+     "iconic_taxon": "Plantae", "source": "gbif"},
+    {"id": "a3", "lat": 41.20, "lng": -111.95, "year": 2015, "species": "Western Honey Bee",
+     "taxon": "Insecta", "source": "gbif"},
+    {"id": "a4", "lat": 40.60, "lng": -112.40, "species": None, "iconic_taxon": None, "source": "ebird"},
+    {"id": "bad", "lat": None, "lng": -111.9, "species": "No Coordinates"},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    write_features(RECORDS, str(tmp_path))
+    return open_store(str(tmp_path))
+
+
+def test_write_skips_rows_without_coordinates(tmp_path):
+    assert write_features(RECORDS, str(tmp_path)) == 4
+    assert len(open_store(str(tmp_path))) == 4
+
+
+def test_record_round_trip(store):
+    rec = store.record(0)
+    assert rec == {
+        "id": "a1", "species": "Western Honey Bee", "scientific_name": "Apis mellifera",
+        "iconic_taxon": "Insecta", "lat": 40.76, "lng": -111.89, "observed_on": "2019-06-02",
+        "year": 2019, "month": 6, "day": 2, "photo_url": "https://example.org/a1.jpg", "source": "inaturalist",
+    }
+    partial = store.record(1)
+    assert partial["observed_on"] == "2021-07" and partial["day"] is None and partial["scientific_name"] is None
+    # "taxon" is an alias for iconic_taxon
+    assert store.record(2)["iconic_taxon"] == "Insecta"
+    empty = store.record(3)
+    assert empty["species"] is None and empty["observed_on"] is None and empty["year"] is None
+
+
+def test_geojson_features_round_trip(tmp_path):
+    features = [{"type": "Feature", "geometry": {"type": "Point", "coordinates": [r["lng"], r["lat"]]},
+                 "properties": {k: v for k, v in r.items() if k not in ("lat", "lng")}} for r in RECORDS[:3]]
+    write_features(features, str(tmp_path))
+    store = open_store(str(tmp_path))
+    out = list(store.iter_features())
+    assert [f["properties"]["id"] for f in out] == ["a1", "a2", "a3"]
+    assert out[0]["geometry"]["coordinates"] == [-111.89, 40.76]
+
+
+def test_select_filters(store):
+    assert store.select().tolist() == [0, 1, 2, 3]
+    assert store.select(bbox=(-112.0, 40.5, -111.8, 41.0)).tolist() == [0]
+    assert store.select(year_min=2016).tolist() == [0, 1]
+    # year_max drops unknown years
+    assert store.select(year_max=2019).tolist() == [0, 2]
+    assert store.select(iconic_taxon=["Insecta"]).tolist() == [0, 2]
+    assert store.select(source=["gbif", "ebird"]).tolist() == [1, 2, 3]
+    assert store.select(source=["nowhere"]).tolist() == []
+    assert store.select(iconic_taxon=["Insecta"], source=["gbif"], year_min=2010).tolist() == [2]
+
+
+def test_distribution(store):
+    assert store.distribution("species") == {"Western Honey Bee": 2, "Showy Milkweed": 1, "Other": 1}
+    assert store.distribution("year") == {2015: 1, 2019: 1, 2021: 1}
+    assert store.distribution("source", store.select(year_min=2016)) == {"gbif": 1, "inaturalist": 1}
+
+
+def test_categories_are_sorted(store):
+    names = list(store.categories["species"])
+    assert names == sorted(names)
+    assert store.code("species", "Showy Milkweed") == names.index("Showy Milkweed")
+    assert store.code("species", "Nope") == -2
+
+
+def test_publish_swaps_current_and_prunes(tmp_path):
+    root = str(tmp_path)
+    assert open_store(root) is None
+
+    builds = []
+    for i in range(KEEP_BUILDS + 2):
+        writer = ObservationStoreWriter(root)
+        writer.extend(RECORDS[:i + 1])
+        builds.append(writer.close())
+        with open(os.path.join(root, CURRENT)) as f:
+            assert f.read().strip() == os.path.basename(builds[-1])
+        assert current_build(root) == builds[-1]
+        assert len(open_store(root)) == min(i + 1, 4)
+
+    kept = sorted(d for d in os.listdir(root) if d.startswith("build-"))
+    assert kept == sorted(os.path.basename(b) for b in builds[-KEEP_BUILDS:])
+    assert not [d for d in os.listdir(root) if d.startswith(".tmp-")]
+
+
+def test_derive_runs_before_publish(tmp_path):
+    root = str(tmp_path)
+    seen = {}
+
+    def derive(store):
+        seen["published"] = current_build(root)
+        seen["rows"] = len(store)
+        os.makedirs(os.path.join(store.path, "extra"))
+
+    write_features(RECORDS, root, derive=derive)
+    assert seen == {"published": None, "rows": 4}
+    assert os.path.isdir(os.path.join(current_build(root), "extra"))
+
+
+def test_store_watcher_picks_up_new_build(tmp_path):
+    root = str(tmp_path)
+    watcher = StoreWatcher(root, check_interval=0)
+    assert watcher.get() is None
+    write_features(RECORDS[:1], root)
+    first = watcher.get()
+    assert len(first) == 1 and watcher.get() is first
+    write_features(RECORDS, root)
+    assert len(watcher.get()) == 4
+    # The old store stays readable for requests still holding it
+    assert first.record(0)["id"] == "a1"
+    assert np.isclose(first.column("lat")[0], 40.76)
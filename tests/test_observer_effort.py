@@ -0,0 +1,53 @@
+import pytest
+
+import observer_effort
+from observation_store import open_store, write_features
+
+LAT, LNG = 40.7601, -111.8901   # one geohash-5 cell
+
+
+def visit(i, observer, day, species, taxon="Insecta"):
+    return {"id": f"o{i}", "lat": LAT, "lng": LNG, "observed_on": f"2021-06-{day:02d}",
+            "observer": observer, "species": species, "iconic_taxon": taxon, "source": "inaturalist"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    # Ten checklists (observer x day) in one cell; only one reports the
+    # milkweed, and the bee is on every other one
+    rows = [visit(i, f"u{i % 5}", 1 + i // 5, "Western Honey Bee") for i in range(10) if i % 2 == 0]
+    rows += [visit(100 + i, f"u{i % 5}", 1 + i // 5, "Common Yarrow", "Plantae") for i in range(10) if i % 2]
+    rows.append(visit(200, "u0", 1, "Showy Milkweed", "Plantae"))
+    write_features(rows, str(tmp_path))
+    return open_store(str(tmp_path))
+
+
+def test_effort_and_index_tables(store):
+    effort = observer_effort.build_effort_tables(store)
+    year = effort.table("year")
+    assert len(year) == 1 and year[0]["checklists"] == 10 and year[0]["observers"] == 5
+    index = {r["iconic_taxon"]: r for r in effort.table("index")}
+    assert index["Insecta"]["checklists"] == 5
+    assert index["Plantae"]["checklists"] == 6
+    assert index["Insecta"]["cell_checklists"] == index["Plantae"]["cell_checklists"] == 10
+    assert index["Insecta"]["reporting_rate"] == 0.5
+
+
+def test_min_checklists_means_cell_effort_everywhere(store):
+    effort = observer_effort.build_effort_tables(store)
+    for name in ("year", "month", "index"):
+        assert effort.table(name, min_checklists=10), name
+        assert effort.table(name, min_checklists=11) == [], name
+    # A taxon on one checklist of a well-sampled cell is kept
+    milkweed = observer_effort.species_index(store, "Showy Milkweed", min_checklists=10)
+    assert len(milkweed) == 1 and milkweed[0]["checklists"] == 1 and milkweed[0]["reporting_rate"] == 0.1
+    assert observer_effort.species_index(store, "Showy Milkweed", min_checklists=11) == []
+
+
+def test_tables_without_new_columns_are_recomputed(store, tmp_path):
+    effort = observer_effort.build_effort_tables(store)
+    directory = tmp_path / "effort"
+    effort.save(str(directory))
+    assert observer_effort.EffortTables.load(str(directory), store.categories) is not None
+    (directory / "index.cell_checklists.npy").unlink()
+    assert observer_effort.EffortTables.load(str(directory), store.categories) is None
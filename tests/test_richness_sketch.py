@@ -0,0 +1,75 @@
+import random
+
+import numpy as np
+import pytest
+
+from observation_store import open_store, write_features
+from richness_sketch import M, _clz64, estimate, hash_names, registers_of, species_richness
+
+STD_ERROR = 1.04 / M ** 0.5
+
+
+def dense(names):
+    index, rho = registers_of(hash_names(names))
+    regs = np.zeros(M, dtype=np.uint8)
+    np.maximum.at(regs, index, rho)
+    return regs
+
+
+def test_clz64_matches_bit_length():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.integers(0, 2 ** 63, 1000, dtype=np.uint64) >> rng.integers(0, 64, 1000).astype(np.uint64),
+                             np.array([0, 1, 2 ** 63, 2 ** 64 - 1], dtype=np.uint64)])
+    assert _clz64(values).tolist() == [64 - int(v).bit_length() for v in values]
+
+
+def test_hash_names_is_stable():
+    a = hash_names(["Apis mellifera", "Bombus huntii"])
+    assert a.dtype == np.uint64 and a[0] != a[1]
+    assert np.array_equal(a, hash_names(["Apis mellifera", "Bombus huntii"]))
+
+
+@pytest.mark.parametrize("n", [1, 10, 100, 1000, 5000, 20000, 100000])
+def test_estimate_error_versus_exact(n):
+    names = [f"species {i}" for i in range(n)]
+    est = float(estimate(dense(names + names[: n // 2])))  # repeats don't count
+    # Linear counting is near exact while registers are sparse; past that
+    # stay within four standard errors
+    tolerance = 0.02 if n <= 1000 else 4 * STD_ERROR
+    assert abs(est - n) <= max(1.0, tolerance * n)
+
+
+def test_union_is_register_max():
+    a = [f"a{i}" for i in range(3000)]
+    b = [f"b{i}" for i in range(2000)] + a[:1000]
+    union = np.maximum(dense(a), dense(b))
+    assert np.array_equal(union, dense(a + b))
+    assert abs(float(estimate(union)) - 5000) <= 4 * STD_ERROR * 5000
+
+
+def test_store_richness_hll_tracks_exact(tmp_path):
+    rng = random.Random(1)
+    species = [f"Species {i}" for i in range(4000)]
+    rows = [{
+        "id": f"r{i}", "lat": rng.uniform(40.0, 41.0), "lng": rng.uniform(-112.5, -111.5),
+        "year": rng.choice([2019, 2020, 2021]), "species": rng.choice(species),
+        "iconic_taxon": rng.choice(["Insecta", "Plantae"]), "source": "inaturalist",
+    } for i in range(30000)]
+    write_features(rows, str(tmp_path))
+    store = open_store(str(tmp_path))
+
+    exact = species_richness(store, exact=True)
+    hll = species_richness(store, exact=False)
+    assert exact["method"] == "exact" and hll["method"] == "hll"
+    assert exact["species"] == len({r["species"] for r in rows})
+    assert abs(hll["species"] - exact["species"]) <= 4 * hll["relative_error"] * exact["species"]
+
+    by_year = species_richness(store, by="year", exact=False)["species"]
+    exact_by_year = species_richness(store, by="year", exact=True)["species"]
+    assert set(by_year) == set(exact_by_year) == {2019, 2020, 2021}
+    for year, n in exact_by_year.items():
+        assert abs(by_year[year] - n) <= 4 * STD_ERROR * n
+
+    insects = species_richness(store, iconic_taxon=["Insecta"], year_min=2020, exact=False)["species"]
+    want = len({r["species"] for r in rows if r["iconic_taxon"] == "Insecta" and r["year"] >= 2020})
+    assert abs(insects - want) <= 4 * STD_ERROR * want
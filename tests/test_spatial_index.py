@@ -0,0 +1,29 @@
+import pytest
+
+from spatial_index import GridIndex, parse_bbox
+
+
+def point(lng, lat, name):
+    return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lng, lat]}, "properties": {"name": name}}
+
+
+def test_parse_bbox():
+    assert parse_bbox(None) is None
+    assert parse_bbox("") is None
+    assert parse_bbox("-112,40.5,-111.5,41") == (-112.0, 40.5, -111.5, 41.0)
+
+
+@pytest.mark.parametrize("value", ["nan,0,1,1", "0,0,inf,1", "-inf,0,1,1", "1,2,3", "a,b,c,d", "2,0,1,1", "0,2,1,1"])
+def test_parse_bbox_rejects(value):
+    with pytest.raises(ValueError):
+        parse_bbox(value)
+
+
+def test_grid_query_matches_scan():
+    features = [point(-112 + i * 0.013, 40 + (i * 7 % 50) * 0.011, i) for i in range(200)]
+    index = GridIndex.from_features(features)
+    bbox = (-111.5, 40.1, -110.9, 40.4)
+    expected = [f for f in features
+                if bbox[0] <= f["geometry"]["coordinates"][0] <= bbox[2] and bbox[1] <= f["geometry"]["coordinates"][1] <= bbox[3]]
+    assert index.query(bbox) == expected
+    assert len(index.query(None)) == len(features)
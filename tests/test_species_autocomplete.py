@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+import species_autocomplete as sa
+from species_autocomplete import SpeciesAutocomplete, get_autocomplete
+from species_db import PLANTS, POLLINATORS
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    monkeypatch.setattr(sa, "_index", None)
+    monkeypatch.setattr(sa, "_index_source", None)
+    monkeypatch.setattr(sa, "_building", None)
+
+
+def test_suggest_prefix_and_fuzzy():
+    index = SpeciesAutocomplete.build(PLANTS, POLLINATORS)
+    names = [s["name"] for s in index.suggest("milk")]
+    assert names and all("milkweed" in n.lower() for n in names)
+    assert [s["name"] for s in index.suggest("milkwed")][:1] == names[:1]
+    assert index.suggest("speciosa")
+    assert index.suggest("zzzz") == []
+
+
+def test_rebuild_runs_in_background_and_old_index_keeps_serving(monkeypatch):
+    first = get_autocomplete(PLANTS, POLLINATORS, None)
+    assert get_autocomplete(PLANTS, POLLINATORS, None) is first
+
+    started, release, done = threading.Event(), threading.Event(), threading.Event()
+    real_build = SpeciesAutocomplete.build.__func__
+
+    def slow_build(cls, plants, pollinators, store=None):
+        started.set()
+        release.wait(5)
+        index = real_build(cls, plants, pollinators, store)
+        done.set()
+        return index
+
+    monkeypatch.setattr(SpeciesAutocomplete, "build", classmethod(slow_build))
+    # More species are loaded: requests keep getting the old index
+    plants = dict(PLANTS, extra=next(iter(PLANTS.values())))
+    assert get_autocomplete(plants, POLLINATORS, None) is first
+    assert started.wait(5)
+    assert get_autocomplete(plants, POLLINATORS, None) is first
+
+    release.set()
+    assert done.wait(5)
+    for _ in range(100):
+        current = get_autocomplete(plants, POLLINATORS, None)
+        if current is not first:
+            break
+        time.sleep(0.01)
+    assert current is not first
+    assert sa._index_source[1] == len(plants) and sa._building is None
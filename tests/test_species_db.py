@@ -0,0 +1,34 @@
+import pytest
+
+import species_db
+from species_db import search_plants, search_pollinators, validate_species
+
+
+def _phrase_scan(query):
+    q = query.lower()
+    return [p for p in species_db.PLANTS.values()
+            if q in p.common_name.lower() or q in p.scientific_name.lower() or q in p.description.lower()]
+
+
+@pytest.mark.parametrize("query", ["milkweed", "Milk", "ed mi", "weed milk", "bee", "a", "September", "-", "  "])
+def test_search_plants_matches_a_phrase_scan(query):
+    assert search_plants(query) == _phrase_scan(query)
+
+
+def test_query_is_a_phrase_not_a_bag_of_words():
+    assert search_plants("ed mi") == []
+    assert search_plants("weed milk") == []
+    assert search_plants("milkweed")
+    assert {p.common_name for p in search_pollinators("bee")} >= {"Bumblebee"}
+
+
+def test_query_combines_with_facets():
+    native = search_plants("milkweed", native_only=True)
+    assert native and all(p.native_to_utah and "milkweed" in p.common_name.lower() for p in native)
+
+
+def test_validate_species_is_strict():
+    assert validate_species("milk weed") is None
+    assert validate_species("") is None
+    assert validate_species("Showy Milkweed")["key"] == "showy_milkweed"
+    assert validate_species("monarch")["type"] == "pollinator"